@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2022, Cédric Servais <cedric.servais@outlook.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+
+__metaclass__ = type
+
+import hashlib
+import importlib
+import logging
+import shutil
+import tempfile
+
+from ansible.errors import AnsibleActionFail
+from ansible.module_utils.common.arg_spec import ArgumentSpecValidator
+from ansible.module_utils.common.parameters import remove_values
+from ansible.plugins.action import ActionBase
+from ansible.utils.display import Display
+
+from ansible_collections.community.isva.plugins.module_utils.constants import FILE_CHUNK_SIZE
+from ansible_collections.community.isva.plugins.module_utils.isva_utils import (
+    LOG_FORMAT, MAP_VERBOSITY_TO_LOG_LEVEL, RingBufferLogHandler, create_return_object, create_return_error, update_logging_info
+)
+
+display = Display()
+
+COLLECTION_PREFIX = 'community.isva.'
+MODULES_PACKAGE = 'ansible_collections.community.isva.plugins.modules'
+# All the modules log below this logger, whether they are loaded from plugins/modules or plugins/module_utils.
+COLLECTION_LOGGER = 'ansible_collections.community.isva'
+
+OPERATION_SPEC = dict(
+    module=dict(type='str', required=True),
+    args=dict(type='dict', default={})
+)
+
+
+class BatchModule(object):
+    """ Stand-in for the AnsibleModule handed to the exec_module function of a module run by isva_batch. It only
+    provides what the modules of this collection use.
+    """
+
+    def __init__(self, params, check_mode, diff, socket_path, verbosity, tmpdir):
+        self.params = params
+        self.check_mode = check_mode
+        self._diff = diff
+        self._socket_path = socket_path
+        self._verbosity = verbosity
+        self.tmpdir = tmpdir
+
+    def sha256(self, path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(FILE_CHUNK_SIZE), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+
+class ActionModule(ActionBase):
+    """ Run several modules of this collection in the controller process over the persistent connection of the
+    host, instead of packaging and starting every module on its own.
+    """
+
+    _VALID_ARGS = frozenset(('operations', 'stop_on_error'))
+
+    def run(self, tmp=None, task_vars=None):
+        task_vars = task_vars or {}
+        result = super(ActionModule, self).run(tmp, task_vars)
+
+        _, args = self.validate_argument_spec(argument_spec=dict(
+            operations=dict(type='list', elements='dict', required=True, options=OPERATION_SPEC),
+            stop_on_error=dict(type='bool', default=True)
+        ))
+
+        socket_path = getattr(self._connection, 'socket_path', None) or task_vars.get('ansible_socket')
+        if not socket_path:
+            raise AnsibleActionFail('isva_batch requires a persistent connection, use ansible_connection=httpapi')
+
+        tmpdir = tempfile.mkdtemp(prefix='isva_batch_')
+        results = []
+        try:
+            for operation in args['operations']:
+                op_result = self._run_operation(operation['module'], operation['args'], socket_path, tmpdir)
+                results.append(op_result)
+                if op_result.get('failed') and args['stop_on_error']:
+                    break
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+        ansible_facts = {}
+        for op_result in results:
+            ansible_facts.update(op_result.get('ansible_facts', {}))
+
+        result.update({
+            'changed': any(op_result.get('changed') for op_result in results),
+            'failed': any(op_result.get('failed') for op_result in results),
+            'results': results
+        })
+        if ansible_facts:
+            result['ansible_facts'] = ansible_facts
+        if result['failed']:
+            result['msg'] = 'One or more operations failed'
+
+        return result
+
+    @staticmethod
+    def _load_module(name):
+        if name.startswith(COLLECTION_PREFIX):
+            name = name[len(COLLECTION_PREFIX):]
+        if '.' in name or name == 'isva_batch':
+            raise ValueError('Unsupported module {}, only the modules of the community.isva collection can be batched'.format(name))
+
+        try:
+            module = importlib.import_module('{}.{}'.format(MODULES_PACKAGE, name))
+        except ImportError:
+            raise ValueError('Unknown module {}'.format(name))
+
+        if not hasattr(module, 'ArgumentSpec') or not hasattr(module, 'exec_module'):
+            raise ValueError('Unsupported module {}, it can\'t be batched'.format(name))
+
+        return module
+
+    def _run_operation(self, name, module_args, socket_path, tmpdir):
+        try:
+            module = self._load_module(name)
+        except ValueError as e:
+            return dict(create_return_error(msg=str(e)), module=name, failed=True)
+
+        spec = module.ArgumentSpec()
+        validator = ArgumentSpecValidator(
+            spec.argument_spec,
+            mutually_exclusive=getattr(spec, 'mutually_exclusive', None),
+            required_one_of=getattr(spec, 'required_one_of', None),
+            required_if=getattr(spec, 'required_if', None),
+            required_together=getattr(spec, 'required_together', None)
+        )
+        validation = validator.validate(module_args)
+        if validation.error_messages:
+            return dict(create_return_error(msg=', '.join(validation.error_messages)), module=name, failed=True)
+
+        if self._task.check_mode and not spec.supports_check_mode:
+            return dict(create_return_object(skipped=True), module=name, msg='Check mode is not supported by {}'.format(name))
+
+        verbosity = min(display.verbosity, max(MAP_VERBOSITY_TO_LOG_LEVEL))
+        batch_module = BatchModule(validation.validated_parameters, self._task.check_mode, self._task.diff, socket_path,
+                                   verbosity, tmpdir)
+
+        # The modules configure the root logger when they run on their own, only the logs of the collection are
+        # captured here so that the logging of the controller is left alone.
+        handler = RingBufferLogHandler()
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        log_output = batch_module.params.get('log_output', 'text')
+        collection_logger = logging.getLogger(COLLECTION_LOGGER)
+        previous_level, previous_propagate = collection_logger.level, collection_logger.propagate
+        collection_logger.addHandler(handler)
+        collection_logger.setLevel(MAP_VERBOSITY_TO_LOG_LEVEL[verbosity])
+        collection_logger.propagate = False
+        try:
+            collection_logger.debug('Module parameters {}'.format(remove_values(batch_module.params, validation._no_log_values)))
+            response = module.exec_module(batch_module)
+            return_value = create_return_object()
+            update_logging_info(return_value, handler, log_output=log_output)
+            return_value.update(response)
+        except Exception as e:
+            return_value = create_return_error(msg=str(e), stdout=handler, stderr=str(e), log_output=log_output)
+            return_value['failed'] = True
+        finally:
+            collection_logger.removeHandler(handler)
+            collection_logger.setLevel(previous_level)
+            collection_logger.propagate = previous_propagate
+
+        # The values of the no_log options are masked, the way AnsibleModule.exit_json does.
+        return_value = remove_values(return_value, validation._no_log_values)
+        return_value['module'] = name
+        return return_value
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2022, Cédric Servais <cedric.servais@outlook.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+
+__metaclass__ = type
+
+
+class ModuleDocFragment(object):
+    DOCUMENTATION = r'''
+options:
+  log_output:
+    description:
+      - How the logs of the module are returned.
+      - C(text) returns them in C(stdout), C(lines) also splits them in C(stdout_lines) and C(records) returns them in
+        C(log_records), as a list of dicts with the time, level, logger, function, line and message of each record.
+      - Only the most recent 256 KiB of logs are kept, a record longer than 16 KiB is truncated.
+    type: str
+    choices: ['text', 'lines', 'records']
+    default: text
+'''
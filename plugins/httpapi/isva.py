@@ -15,25 +15,143 @@ description:
   - This HttpApi plugin provides methods to connect to ISVA
     devices over a HTTP(S)-based api.
 version_added: "1.0"
+options:
+  session_auth:
+    type: bool
+    description:
+      - Reuse the LMI session cookies returned by the appliance for the next requests sent over the
+        persistent connection instead of authenticating every request with basic authentication.
+      - The session is dropped and the request is replayed with basic authentication when the appliance
+        answers with a 401.
+    default: false
+    env:
+      - name: ANSIBLE_HTTPAPI_ISVA_SESSION_AUTH
+    vars:
+      - name: ansible_httpapi_isva_session_auth
+  cache_ttl:
+    type: int
+    description:
+      - Number of seconds a successful GET response is kept and served again for the same path and
+        query over the persistent connection.
+      - Any PUT, POST or DELETE drops the cached responses sharing the same URI prefix.
+      - Set to 0 to disable the cache.
+    default: 0
+    env:
+      - name: ANSIBLE_HTTPAPI_ISVA_CACHE_TTL
+    vars:
+      - name: ansible_httpapi_isva_cache_ttl
+  cache_max_entries:
+    type: int
+    description:
+      - Maximum number of responses kept in the cache, the least recently used ones are evicted first.
+    default: 128
+    env:
+      - name: ANSIBLE_HTTPAPI_ISVA_CACHE_MAX_ENTRIES
+    vars:
+      - name: ansible_httpapi_isva_cache_max_entries
+  max_concurrent_requests:
+    type: int
+    description:
+      - Maximum number of requests sent at the same time to the appliance by the methods processing
+        a batch of requests, such as C(send_requests).
+    default: 4
+    env:
+      - name: ANSIBLE_HTTPAPI_ISVA_MAX_CONCURRENT_REQUESTS
+    vars:
+      - name: ansible_httpapi_isva_max_concurrent_requests
 """
+import copy
+import hashlib
 import json
+import os
+import socket
+import threading
+import time
+import uuid
 
-from ansible.module_utils.basic import to_text
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from ansible.errors import AnsibleConnectionFailure
+from ansible.module_utils.basic import to_bytes, to_text
+from ansible.module_utils.compat.version import LooseVersion
+from ansible.module_utils.six import BytesIO
 from ansible.plugins.httpapi import HttpApiBase
-from ansible.module_utils.six.moves.urllib.error import HTTPError
+from ansible.module_utils.six.moves.urllib.error import HTTPError, URLError
+from ansible.module_utils.six.moves.urllib.parse import urlsplit
+from ansible.module_utils.urls import open_url
+from ansible.release import __version__ as ANSIBLE_CORE_VERSION
 
 from ansible_collections.community.isva.plugins.module_utils.constants import (
-    BASE_HEADERS, BASE_DOWNLOAD_FILE_HEADERS
+    BASE_HEADERS, BASE_DOWNLOAD_FILE_HEADERS, BASE_UPLOAD_FILE_HEADERS, CACHE_EXCLUDED_PATHS, CACHE_RELATED_PATHS,
+    FILE_CHUNK_SIZE
 )
 
 from ansible_collections.community.isva.plugins.module_utils.common import ISVAModuleError
 
 
+def _headers_without_range(headers):
+    return dict((key, value) for key, value in headers.items() if key != 'Range')
+
+
+class MultipartFileStream(object):
+    """File-like multipart/form-data body streaming the content of a local file.
+
+    Only one block of the file is held in memory at a time, unless the whole body is read at once. Once the end of
+    the body has been reached, the next read starts over from the beginning so that the request can be replayed,
+    e.g. after a 401.
+    """
+    def __init__(self, src, name, filename, fields=None):
+        self.boundary = uuid.uuid4().hex
+        head = ''
+        for field, value in (fields or {}).items():
+            head += '--{0}\r\nContent-Disposition: form-data; name="{1}"\r\n\r\n{2}\r\n'.format(self.boundary, field, value)
+        head += '--{0}\r\nContent-Disposition: form-data; name="{1}"; filename="{2}"\r\n'.format(self.boundary, name, filename)
+        head += 'Content-Type: application/octet-stream\r\n\r\n'
+
+        self._src = src
+        self._head = to_bytes(head)
+        self._tail = to_bytes('\r\n--{0}--\r\n'.format(self.boundary))
+        self._parts = None
+        self.size = len(self._head) + os.path.getsize(src) + len(self._tail)
+
+    @property
+    def content_type(self):
+        return 'multipart/form-data; boundary={0}'.format(self.boundary)
+
+    def read(self, size=-1):
+        if self._parts is None:
+            self._parts = [BytesIO(self._head), open(self._src, 'rb'), BytesIO(self._tail)]
+
+        if size is None or size < 0:  # Read to the end of the body, the next read returns b''.
+            data = b''.join(part.read() for part in self._parts)
+            self.close()
+            self._parts = [] if data else None
+            return data
+
+        while self._parts:
+            data = self._parts[0].read(size if size > 0 else FILE_CHUNK_SIZE)
+            if data:
+                return data
+            self._parts.pop(0).close()
+
+        self._parts = None
+        return b''
+
+    def close(self):
+        for part in self._parts or []:
+            part.close()
+        self._parts = None
+
+
 class HttpApi(HttpApiBase):
     def __init__(self, connection):
         super(HttpApi, self).__init__(connection)
         self.connection = connection
         self.user = None
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._deploy_requests = []
 
     def handle_httperror(self, exc):
         self._display_message("Handle error: {}".format(str(exc)))
@@ -51,34 +169,265 @@ class HttpApi(HttpApiBase):
     def send_request(self, path, method='GET', payload=None, headers=None):
         headers = headers if headers else BASE_HEADERS
 
+        if method == 'GET':
+            cached = self._get_cached_response(path)
+            if cached is not None:
+                self._display_message('ISVA API Call: {0} to {1} served from cache'.format(method, path))
+                return cached
+
         try:
             self._display_request(method, path, payload)
             response, response_data = self.connection.send(path, payload, method=method, headers=headers)
             response_value = self._get_response_value(response_data)
+            result = dict(
+                code=response.getcode(),
+                contents=self._response_to_json(response_value)
+            )
+        except HTTPError as e:
+            result = dict(code=e.code, contents=json.loads(e.read()))
+        finally:
+            if method != 'GET':
+                self._invalidate_cached_responses(path)
+
+        if method == 'GET' and result['code'] == 200:
+            self._cache_response(path, result)
+
+        return result
+
+    def send_requests(self, batch):
+        """Send a batch of requests concurrently.
+
+        Each item of the batch holds the keyword arguments of send_request, the results are returned in the
+        same order as the batch with their own status code.
+        """
+        return self._run_concurrently(lambda request: self.send_request(**request), batch)
+
+    def upload_file(self, path, src, filename=None, fields=None, headers=None):
+        """Upload a local file as the 'file' field of a multipart/form-data POST request.
+
+        The file is streamed to the appliance, the memory used doesn't depend on its size.
+        """
+        stream = MultipartFileStream(src, 'file', filename or os.path.basename(src), fields)
+        headers = dict(headers if headers is not None else BASE_UPLOAD_FILE_HEADERS)
+        headers.update({'Content-Type': stream.content_type, 'Content-Length': str(stream.size)})
+        method = 'POST'
+
+        try:
+            self._display_request(method, path, src)
+            response, response_data = self.connection.send(path, stream, method=method, headers=headers)
+            response_value = self._get_response_value(response_data)
             return dict(
                 code=response.getcode(),
                 contents=self._response_to_json(response_value)
             )
         except HTTPError as e:
+            self._display_message('HTTPError: {}'.format(str(e)))
             return dict(code=e.code, contents=json.loads(e.read()))
+        finally:
+            stream.close()
+            self._invalidate_cached_responses(path)
+
+    def download_file(self, path, dest, headers=None, resume=False):
+        """Download a file to dest, the content is streamed to disk and hashed on the fly.
 
-    def download_file(self, path, dest, headers=None):
-        headers = headers if headers is not None else BASE_DOWNLOAD_FILE_HEADERS
+        When resume is set and dest already holds the beginning of the file, only the missing bytes are requested.
+        The whole file is downloaded again if the appliance doesn't honour the range.
+
+        Returns the status code with the sha256 digest and the size of the downloaded file.
+        """
+        headers = dict(headers if headers is not None else BASE_DOWNLOAD_FILE_HEADERS)
         method = 'GET'
-        self._display_request(method, path, dest)
+        offset = os.path.getsize(dest) if resume and os.path.isfile(dest) else 0
+        if offset:
+            headers['Range'] = 'bytes={0}-'.format(offset)
 
         try:
-            self._display_request(method, path, None)
-            self.connection.get_file(path=path, dest=dest, data=None, method=method, headers=headers)
+            self._display_request(method, path, dest)
+            response = self._open(path, method=method, headers=headers)
         except HTTPError as e:
             self._display_message('HTTPError: {}'.format(str(e)))
+            if offset and e.code == 416:  # The partial file can't be resumed, e.g. it's bigger than the remote one.
+                return self.download_file(path, dest, headers=_headers_without_range(headers))
             return dict(code=e.code, contents=json.loads(e.read()))
 
-        return True
+        digest = hashlib.sha256()
+        size = 0
+        mode = 'wb'
+        if offset and response.getcode() == 206:
+            if not (response.info().get('Content-Range') or '').startswith('bytes {0}-'.format(offset)):
+                response.close()
+                return self.download_file(path, dest, headers=_headers_without_range(headers))
+
+            self._display_message('Resuming download of {0} at byte {1}'.format(path, offset))
+            mode = 'ab'
+            with open(dest, 'rb') as f:  # The bytes already downloaded are part of the digest.
+                chunk = f.read(FILE_CHUNK_SIZE)
+                while chunk:
+                    digest.update(chunk)
+                    size += len(chunk)
+                    chunk = f.read(FILE_CHUNK_SIZE)
+
+        try:
+            with open(dest, mode) as f:
+                chunk = response.read(FILE_CHUNK_SIZE)
+                while chunk:
+                    f.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+                    chunk = response.read(FILE_CHUNK_SIZE)
+        finally:
+            response.close()
+
+        # A resumed download is reported as a complete one, it covers the whole file.
+        return dict(code=200 if mode == 'ab' else response.getcode(), sha256=digest.hexdigest(), size=size, resumed=mode == 'ab')
+
+    def download_files(self, batch, parallelism=None):
+        """Download a batch of files concurrently.
+
+        Each item of the batch holds the keyword arguments of download_file, the results are returned in the same
+        order as the batch. At most parallelism files are downloaded at once, max_concurrent_requests by default and
+        at most.
+        """
+        return self._run_concurrently(lambda download: self.download_file(**download), batch, parallelism)
+
+    def request_deploy(self, reason):
+        """Remember that a module left pending changes whose deploy has been deferred.
+
+        The requests only live as long as the persistent connection, which is closed once idle for
+        persistent_connect_timeout seconds, they tell why a deploy is run but not whether it is needed.
+        """
+        self._deploy_requests.append(reason)
+
+    def deploy_requests(self):
+        """Return the reasons of the deferred deploys requested and not forgotten yet."""
+        return list(self._deploy_requests)
+
+    def forget_deploy_requests(self, count):
+        """Forget the count oldest deferred deploy requests, once they have been deployed."""
+        self._deploy_requests = self._deploy_requests[count:]
 
     def update_auth(self, response, response_text):
-        return None  # We want to explicitely disable any sort of caching so that authentication happens for every request.
+        if not self.get_option('session_auth'):
+            return None  # Authentication happens for every request unless the session mode has been enabled.
+
+        cookies = self._parse_cookies(self.connection._auth)
+        for header in response.info().get_all('Set-Cookie') or []:
+            name, _, value = header.split(';', 1)[0].strip().partition('=')
+            if name:
+                cookies[name] = value
+
+        if not cookies:
+            return None
+
+        return {'Cookie': '; '.join('{0}={1}'.format(name, value) for name, value in cookies.items())}
+
+    def _open(self, path, method='GET', data=None, headers=None):
+        """Send a request with the connection settings and return the response before reading it, so that
+        large contents can be streamed instead of being buffered by the connection.
+        """
+        auth = self.connection._auth
+        url_kwargs = dict(
+            method=method,
+            headers=dict(headers or {}),
+            timeout=self.connection.get_option('persistent_command_timeout'),
+            validate_certs=self.connection.get_option('validate_certs'),
+            use_proxy=self.connection.get_option('use_proxy'),
+            http_agent=self.connection.get_option('http_agent'),
+            client_cert=self.connection.get_option('client_cert'),
+            client_key=self.connection.get_option('client_key'),
+            ca_path=self.connection.get_option('ca_path')
+        )
+        ciphers = self.connection.get_option('ciphers')
+        if ciphers:
+            if LooseVersion(ANSIBLE_CORE_VERSION) >= LooseVersion('2.14.0'):
+                url_kwargs['ciphers'] = ciphers
+            else:
+                self.connection.queue_message('warning', "'ansible_httpapi_ciphers' option is unavailable on ansible-core<2.14")
+        if auth:
+            url_kwargs['headers'].update(auth)
+        else:
+            url_kwargs['force_basic_auth'] = True
+            url_kwargs['url_username'] = self.connection.get_option('remote_user')
+            url_kwargs['url_password'] = self.connection.get_option('password')
+
+        url = self.connection._url + path
+        try:
+            response = open_url(url, data=data, **url_kwargs)
+        except HTTPError as e:
+            if e.code == 401 and auth and self.handle_httperror(e) is True:
+                return self._open(path, method=method, data=data, headers=headers)
+            raise
+        except URLError as e:
+            raise AnsibleConnectionFailure('Could not connect to {0}: {1}'.format(url, e.reason))
+        except socket.timeout as e:
+            raise AnsibleConnectionFailure('Could not connect to {0}: {1}'.format(url, e))
+
+        self.connection._auth = self.update_auth(response, None) or self.connection._auth
+        return response
 
+    def _run_concurrently(self, func, items, workers=None):
+        if workers is not None and workers < 1:
+            raise ValueError('The number of concurrent requests must be at least 1, got {}'.format(workers))
+        max_workers = max(self.get_option('max_concurrent_requests'), 1)
+        workers = min(workers or max_workers, max_workers, len(items))
+        if workers <= 1:
+            return [func(item) for item in items]
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(func, items))
+
+    def _get_cached_response(self, path):
+        ttl = self.get_option('cache_ttl')
+        if not ttl:
+            return None
+
+        with self._cache_lock:
+            entry = self._cache.get(path)
+            if entry is None:
+                return None
+
+            expires, result = entry
+            if expires < time.time():
+                del self._cache[path]
+                return None
+
+            self._cache.pop(path)
+            self._cache[path] = entry  # Mark the entry as the most recently used one.
+            return copy.deepcopy(result)
+
+    def _cache_response(self, path, result):
+        ttl = self.get_option('cache_ttl')
+        if not ttl or self._is_path_related(self._base_path(path), CACHE_EXCLUDED_PATHS):
+            return
+
+        with self._cache_lock:
+            self._cache.pop(path, None)
+            self._cache[path] = (time.time() + ttl, copy.deepcopy(result))
+            while len(self._cache) > max(self.get_option('cache_max_entries'), 0):
+                self._cache.popitem(last=False)
+
+    def _invalidate_cached_responses(self, path):
+        base_path = self._base_path(path)
+        prefixes = [base_path] + CACHE_RELATED_PATHS.get(base_path, [])
+
+        with self._cache_lock:
+            for cached_path in list(self._cache):
+                cached_base_path = self._base_path(cached_path)
+                if any(self._is_path_related(cached_base_path, [prefix]) or self._is_path_related(prefix, [cached_base_path])
+                       for prefix in prefixes):
+                    del self._cache[cached_path]
+
+    @staticmethod
+    def _base_path(path):
+        return urlsplit(path).path.rstrip('/') or '/'
+
+    @staticmethod
+    def _is_path_related(path, prefixes):  # True when path is one of the prefixes or lives below one of them.
+        for prefix in prefixes:
+            prefix = prefix.rstrip('/')
+            if not prefix or path == prefix or path.startswith(prefix + '/'):
+                return True
+        return False
 
     def _display_request(self, method, url, data=None):
         if data:
@@ -93,6 +442,18 @@ class HttpApi(HttpApiBase):
     def _display_message(self, msg):
         self.connection._log_messages(msg)
 
+    def _parse_cookies(self, auth):
+        cookies = OrderedDict()
+        if not auth or 'Cookie' not in auth:
+            return cookies
+
+        for cookie in auth['Cookie'].split(';'):
+            name, _, value = cookie.strip().partition('=')
+            if name:
+                cookies[name] = value
+
+        return cookies
+
     def _get_response_value(self, response_data):
         return to_text(response_data.getvalue())
 
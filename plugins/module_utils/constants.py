@@ -12,4 +12,26 @@ BASE_HEADERS = {'Accept': 'application/json', 'Content-Type': 'application/json'
 BASE_DOWNLOAD_FILE_HEADERS = {'Accept': 'application/json,application/octet-stream', 'Connection': 'keep-alive'}
 BASE_UPLOAD_FILE_HEADERS = {'Accept': 'application/json,text/html,application/xhtml+xml,application/xml'}
 
+# Size of the blocks read from or written to local files while transferring them.
+FILE_CHUNK_SIZE = 1024 * 1024
+
+# Endpoints whose content changes as a side effect of writes to other endpoints, they are never cached.
+CACHE_EXCLUDED_PATHS = ['/isam/pending_changes', '/lmi']
+# Endpoints whose cached content must be dropped when a write happens on the key endpoint.
+CACHE_RELATED_PATHS = {
+    '/docker/publish': ['/shared_volume'],
+    '/isam/pending_changes': ['/'],
+}
+
+# Bounds of the logs captured by a module and returned with its result.
+LOG_BUFFER_MAX_BYTES = 256 * 1024
+LOG_RECORD_MAX_BYTES = 16 * 1024
+
+# Controller side files used to remember state between module executions.
+LOCAL_STATE_DIR = os.path.join(os.path.expanduser('~'), '.ansible', 'isva')
+DIGEST_CACHE_FILE = os.path.join(LOCAL_STATE_DIR, 'digests.json')
+DIGEST_CACHE_MAX_ENTRIES = 1024
+FACTS_CACHE_FILE = os.path.join(LOCAL_STATE_DIR, 'facts.json')
+PUBLISH_STATE_FILE = os.path.join(LOCAL_STATE_DIR, 'publish.json')
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
@@ -7,7 +7,7 @@ from __future__ import absolute_import, division, print_function
 
 __metaclass__ = type
 
-from ansible_collections.community.isva.plugins.module_utils.isva_utils import parse_fail_message
+from ansible_collections.community.isva.plugins.module_utils.isva_utils import parse_fail_message, appliance_key, invalidate_cached_facts
 from ansible_collections.community.isva.plugins.module_utils.common import ISVAModuleError
 from ansible.module_utils.connection import Connection
 
@@ -34,6 +34,13 @@ def fetch_activation_offerings(module):
     return response['contents']
 
 
+def to_facts(source):
+    """ This function turns the activation offerings fetched from the appliance into ansible facts.
+    """
+    return {'isva_offerings': {offering['id']: {'name': offering['name'], 'enabled': offering['enabled'], 'description': offering['description']}
+                               for offering in source}}
+
+
 def fetch_activation_offering(module, offering):
     """ This function fetch the system activation information from the appliance for the given offering.
 
@@ -62,6 +69,7 @@ def update_activation_offering(module, offering, payload):
     if response['code'] != 200:
         raise ISVAModuleError(parse_fail_message(response['code'], response['contents']))
 
+    invalidate_cached_facts(appliance_key(connection))
     return response['contents']
 
 
@@ -78,6 +86,7 @@ def create_activation_offering(module, payload):
     if response['code'] != 200:
         raise ISVAModuleError(parse_fail_message(response['code'], response['contents']))
 
+    invalidate_cached_facts(appliance_key(connection))
     return response['contents']
 
 
@@ -93,4 +102,5 @@ def delete_activation_offering(module, offering):
     if response['code'] != 204:
         raise ISVAModuleError(parse_fail_message(response['code'], response['contents']))
 
+    invalidate_cached_facts(appliance_key(connection))
     return response['contents']
\ No newline at end of file
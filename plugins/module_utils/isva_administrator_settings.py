@@ -72,6 +72,12 @@ def from_api(source):
     return data
 
 
+def to_facts(source):
+    """ This function turns the administrator settings fetched from the appliance into ansible facts.
+    """
+    return {'isva_administrator_settings': from_api(source)}
+
+
 def fetch_administrator_settings(module):
     """ This function fetch the administrator settings information from the appliance
 
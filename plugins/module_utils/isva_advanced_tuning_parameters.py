@@ -33,6 +33,12 @@ def from_api(source):
     return data
 
 
+def to_facts(source):
+    """ This function turns the advanced tuning parameters fetched from the appliance into ansible facts.
+    """
+    return {'isva_advanced_tuning_parameters': from_api(source)}
+
+
 def fetch_advanced_tuning_parameters(module):
     """ This function fetch the advanced tuning parameters from the appliance
 
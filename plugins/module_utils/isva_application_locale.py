@@ -32,6 +32,12 @@ def from_api(source):
     return data
 
 
+def to_facts(source):
+    """ This function turns the application locale fetched from the appliance into ansible facts.
+    """
+    return {'isva_application_locale': from_api(source)}
+
+
 def fetch_application_locale(module):
     """ This function fetch the application locale from the appliance
 
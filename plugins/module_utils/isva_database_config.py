@@ -33,6 +33,15 @@ MAP_API_ATTRIBUTES = {
     'failover_servers': 'hvdb_failover_servers'
 }
 
+# The failover servers are identified by their address and port, their priority is given by their order attribute
+# rather than by their position in the list.
+DIFF_RULES = {
+    'lists': {'failover_servers': ['address', 'port']},
+    'numeric': ['port', 'db2_alt_port', 'order'],
+    'boolean': ['secure'],
+    'case_insensitive': ['address', 'db2_alt_address', 'db_type']
+}
+
 
 def from_module(source):
     data = {}
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2022, Cédric Servais <cedric.servais@outlook.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# The rules describing how a resource is compared, each config module_utils defines its own:
+#   lists: the lists of dicts compared as sets, with the attributes identifying an item, e.g. {'servers': ['ip']}.
+#   numeric: the attributes holding a number, the appliance may return them as strings, e.g. '443'.
+#   boolean: the attributes holding a boolean, the appliance may return them as strings, e.g. 'true'.
+#   case_insensitive: the attributes whose value is compared regardless of the case and of the surrounding spaces,
+#     e.g. host names.
+# The other strings, e.g. the user names and the passwords, are compared as they are.
+EMPTY_RULES = {'lists': {}, 'numeric': [], 'boolean': [], 'case_insensitive': []}
+
+
+def _is_unset(value):
+    # The module side drops the falsy attributes (see from_module), they are the same as a missing attribute.
+    return value is None or value is False or value == 0 or value == '' or value == [] or value == {}
+
+
+def _normalize(key, value, rules):
+    if not isinstance(value, str):
+        return value
+    if key in rules['boolean'] and value.strip().lower() in ('true', 'false'):
+        return value.strip().lower() == 'true'
+    if key in rules['numeric']:
+        try:
+            return int(value)
+        except ValueError:
+            return value
+    if key in rules['case_insensitive']:
+        return value.strip().lower()
+    return value
+
+
+def _item_key(item, attributes, rules):
+    return tuple(_normalize(attribute, item.get(attribute), rules) for attribute in attributes)
+
+
+def _equal_lists(key, have, want, rules):
+    attributes = rules['lists'].get(key)
+    if attributes and all(isinstance(item, dict) for item in have + want):
+        have_items = dict((_item_key(item, attributes, rules), item) for item in have)
+        want_items = dict((_item_key(item, attributes, rules), item) for item in want)
+        if len(have_items) == len(have) and len(want_items) == len(want):  # Otherwise the attributes aren't a key.
+            return set(have_items) == set(want_items) and all(
+                _diff(have_items[item_key], want_items[item_key], rules) is None for item_key in have_items)
+
+        return sorted(json.dumps(_diff_view(item, rules), sort_keys=True) for item in have) == \
+            sorted(json.dumps(_diff_view(item, rules), sort_keys=True) for item in want)
+
+    return len(have) == len(want) and all(_equal(key, h, w, rules) for h, w in zip(have, want))
+
+
+def _diff_view(item, rules):
+    return dict((key, _normalize(key, value, rules)) for key, value in item.items() if not _is_unset(value))
+
+
+def _equal(key, have, want, rules):
+    if _is_unset(have) and _is_unset(want):
+        return True
+    if isinstance(have, dict) and isinstance(want, dict):
+        return _diff(have, want, rules) is None
+    if isinstance(have, list) and isinstance(want, list):
+        return _equal_lists(key, have, want, rules)
+    return _normalize(key, have, rules) == _normalize(key, want, rules)
+
+
+def _diff(have, want, rules):
+    before = {}
+    after = {}
+    for key in set(have) | set(want):
+        if isinstance(have.get(key), dict) and isinstance(want.get(key), dict):
+            result = _diff(have[key], want[key], rules)
+            if result:
+                before[key], after[key] = result
+        elif not _equal(key, have.get(key), want.get(key), rules):
+            if key in have:
+                before[key] = have[key]
+            if key in want:
+                after[key] = want[key]
+
+    if before or after:
+        return before, after
+    return None
+
+
+def semantic_diff(have, want, rules=None):
+    """ This function compares the configuration of a resource on the appliance with the wanted one, like
+    recursive_diff, but only reports the differences which actually change the resource:
+      - the lists named in the rules are compared as sets of items identified by their key attributes,
+      - the numbers and the booleans named in the rules are compared whatever the appliance returns them as strings
+        or not,
+      - the attributes named in the rules are compared regardless of their case,
+      - the other strings are compared as they are,
+      - a missing attribute is the same as an empty one.
+
+    Returns:
+        tuple: The differing attributes, (before, after), or None when the configurations are the same.
+    """
+    rules = dict(EMPTY_RULES, **(rules or {}))
+    result = _diff(have, want, rules)
+    if result:
+        logger.debug('The configuration differs: {}'.format(result))
+    return result
@@ -7,8 +7,12 @@ from __future__ import absolute_import, division, print_function
 
 __metaclass__ = type
 
-from ansible_collections.community.isva.plugins.module_utils.isva_utils import parse_fail_message
+from ansible_collections.community.isva.plugins.module_utils.isva_utils import (
+    parse_fail_message, load_local_state, save_local_state, appliance_key, FilesystemIndex
+)
+from ansible_collections.community.isva.plugins.module_utils import isva_lmi_status, isva_shared_volumes
 from ansible_collections.community.isva.plugins.module_utils.common import ISVAModuleError
+from ansible_collections.community.isva.plugins.module_utils.constants import PUBLISH_STATE_FILE
 from ansible.module_utils.connection import Connection
 
 import logging
@@ -17,6 +21,10 @@ uri = '/docker/publish'
 
 logger = logging.getLogger(__name__)
 
+PUBLISH_STATE_VERSION = 2
+# The attributes of the appliance state a publish is recorded with, the configuration is published again when one differs.
+PUBLISH_STATE_ATTRIBUTES = ('snapshot', 'sha256', 'start_time')
+
 
 def publish_configuration(module):
     """ This function publish the current configuration to the shared volume.
@@ -31,3 +39,91 @@ def publish_configuration(module):
         raise ISVAModuleError(parse_fail_message(response['code'], response['contents']))
 
     return response['contents']
+
+
+def load_published_configuration(key):
+    """ This function returns what has been recorded about the last publish of an appliance.
+
+    Returns:
+        dict: The snapshot, its sha256, the LMI start time and the fingerprint of the published configuration, None
+        if unknown.
+    """
+    return load_local_state(PUBLISH_STATE_FILE, PUBLISH_STATE_VERSION).get(key)
+
+
+def record_published_configuration(key, state, fingerprint):
+    """ This function records on the controller the snapshot created by a publish and the state of the appliance.
+    """
+    published = load_local_state(PUBLISH_STATE_FILE, PUBLISH_STATE_VERSION)
+    published[key] = dict(state, fingerprint=fingerprint)
+    save_local_state(PUBLISH_STATE_FILE, PUBLISH_STATE_VERSION, published)
+
+
+def forget_published_configuration(key):
+    """ This function drops the record of the last publish of an appliance, it's called when changes are deployed
+    through this collection: the published configuration isn't the deployed one anymore.
+    """
+    published = load_local_state(PUBLISH_STATE_FILE, PUBLISH_STATE_VERSION)
+    if key in published:
+        del published[key]
+        save_local_state(PUBLISH_STATE_FILE, PUBLISH_STATE_VERSION, published)
+
+
+def fetch_publish_state(module, snapshot):
+    """ This function fetches the state of the appliance a publish is compared with: the sha256 of the snapshot on the
+    shared volume, which changes when another publish overwrites it, and the start time of the LMI, which changes
+    when deployed changes restart it. Both are fetched concurrently by the connection.
+
+    Returns:
+        dict: The snapshot, its sha256, None when it isn't on the shared volume, and the LMI start time.
+    """
+    connection = Connection(module._socket_path)
+    responses = connection.send_requests(batch=[
+        {'path': '{}/snapshots?recursive=False'.format(isva_shared_volumes.uri)}, {'path': isva_lmi_status.uri}
+    ])
+
+    for response in responses:
+        if response['code'] != 200:
+            raise ISVAModuleError(parse_fail_message(response['code'], response['contents']))
+
+    entry = FilesystemIndex(responses[0]['contents'], prefix='snapshots').get('snapshots/{}'.format(snapshot))
+    return {
+        'snapshot': snapshot,
+        'sha256': entry.get('sha256') if entry else None,
+        'start_time': isva_lmi_status.from_api(responses[1]['contents']).get('start_time')
+    }
+
+
+def fetch_published_configuration(module, fingerprint):
+    """ This function returns the last publish recorded for the appliance, provided it was made with the same
+    fingerprint, the snapshot it created is still on the shared volume, no changes have been deployed through this
+    collection and the LMI hasn't been restarted since then. A change deployed by other means without restarting the
+    LMI isn't noticed, the fingerprint must identify the whole configuration.
+
+    Returns:
+        dict: The snapshot, its sha256, the LMI start time and the fingerprint of the published configuration, None
+        if it must be published again.
+    """
+    connection = Connection(module._socket_path)
+    published = load_published_configuration(appliance_key(connection))
+    if not published or published['fingerprint'] != fingerprint:
+        return None
+
+    state = fetch_publish_state(module, published['snapshot'])
+    if state['sha256'] is None or any(state[key] != published.get(key) for key in PUBLISH_STATE_ATTRIBUTES):
+        logger.debug('The appliance changed since {} was published: {}'.format(published['snapshot'], state))
+        return None
+
+    return published
+
+
+def remember_published_configuration(module, snapshot, fingerprint):
+    """ This function records the snapshot just created by a publish, with the state of the appliance.
+    """
+    connection = Connection(module._socket_path)
+    state = fetch_publish_state(module, snapshot)
+    if not state['sha256']:
+        logger.debug('The published snapshot {} is not on the shared volume'.format(snapshot))
+        return
+
+    record_published_configuration(appliance_key(connection), state, fingerprint)
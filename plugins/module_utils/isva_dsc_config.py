@@ -34,6 +34,14 @@ MAP_API_SERVER_ATTRIBUTES = {
     'replication_port': 'replication_port'
 }
 
+# The servers are identified by their address, the appliance doesn't keep them in the order they were given.
+DIFF_RULES = {
+    'lists': {'servers': ['ip']},
+    'numeric': ['worker_threads', 'max_session_lifetime', 'client_grace', 'connection_idle_timeout', 'service_port',
+                'replication_port'],
+    'case_insensitive': ['ip']
+}
+
 
 def from_module(source):
     data = {}
@@ -32,3 +32,9 @@ def fetch_extensions(module):
         raise ISVAModuleError(parse_fail_message(response['code'], response['contents']))
 
     return response['contents']
+
+
+def to_facts(source):
+    """ This function turns the extensions fetched from the appliance into ansible facts.
+    """
+    return {'isva_extensions': {ext['id']: {'name': ext['name'], 'desc': ext['desc'], 'date': ext['date']} for ext in source}}
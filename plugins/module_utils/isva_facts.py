@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2022, Cédric Servais <cedric.servais@outlook.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+from ansible_collections.community.isva.plugins.module_utils.isva_utils import (
+    parse_fail_message, load_cached_facts, save_cached_facts, appliance_key
+)
+from ansible_collections.community.isva.plugins.module_utils.common import ISVAModuleError
+from ansible_collections.community.isva.plugins.module_utils import (
+    isva_activations, isva_administrator_settings, isva_advanced_tuning_parameters, isva_application_locale,
+    isva_extensions, isva_fixpacks, isva_fixpacks_fips, isva_licenses, isva_lmi_status, isva_pending_changes,
+    isva_version_facts
+)
+from ansible.module_utils.connection import Connection
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# For each subset, the endpoint to query and how its response is turned into facts, the facts of the matching
+# isva_*_facts module.
+FACT_SUBSETS = {
+    'version': (isva_version_facts.uri, isva_version_facts.to_facts),
+    'license': (isva_licenses.uri, isva_licenses.to_facts),
+    'extension': (isva_extensions.uri, isva_extensions.to_facts),
+    'fixpack': (isva_fixpacks.uri, isva_fixpacks.to_facts),
+    'fixpack_fips': (isva_fixpacks_fips.uri, isva_fixpacks_fips.to_facts),
+    'lmi': (isva_lmi_status.uri, isva_lmi_status.to_facts),
+    'administrator_setting': (isva_administrator_settings.uri, isva_administrator_settings.to_facts),
+    'application_locale': (isva_application_locale.uri, isva_application_locale.to_facts),
+    'activation': (isva_activations.uri.format(''), isva_activations.to_facts),
+    'advanced_tuning_parameter': (isva_advanced_tuning_parameters.uri, isva_advanced_tuning_parameters.to_facts)
+}
+
+
+def resolve_gather_subset(gather_subset):
+    """ This function resolves the requested subsets, 'all' selects every subset and '!name' excludes one.
+
+    Returns:
+        list: The selected subsets, sorted by name.
+    """
+    selected = set()
+    excluded = set()
+    for subset in gather_subset:
+        name = subset[1:] if subset.startswith('!') else subset
+        if name != 'all' and name not in FACT_SUBSETS:
+            raise ISVAModuleError('Invalid subset {} provided, expected one of {}'.format(subset, ['all'] + sorted(FACT_SUBSETS)))
+
+        names = set(FACT_SUBSETS) if name == 'all' else {name}
+        if subset.startswith('!'):
+            excluded.update(names)
+        else:
+            selected.update(names)
+
+    return sorted(selected - excluded)
+
+
+def _send_batch(connection, paths):
+    responses = connection.send_requests(batch=[{'path': path} for path in paths]) if paths else []
+
+    for response in responses:
+        if response['code'] != 200:
+            raise ISVAModuleError(parse_fail_message(response['code'], response['contents']))
+
+    return [response['contents'] for response in responses]
+
+
+def fetch_facts(module, subsets, cache=False):
+    """ This function fetch the facts of the given subsets from the appliance.
+    The endpoints are queried concurrently by the connection, in a single call.
+
+    When cache is set, the facts are remembered on the controller. They are served from there as long as the LMI
+    start time and the pending changes count of the appliance, fetched along with the missing subsets, are unchanged
+    and no changes have been deployed through this collection, which drops them. The lmi subset is always built from
+    the LMI status fetched to validate the cache.
+
+    Returns:
+        dict: The ansible facts of all the subsets.
+    """
+    if not subsets:
+        return {}
+
+    connection = Connection(module._socket_path)
+    if not cache:
+        contents = _send_batch(connection, [FACT_SUBSETS[subset][0] for subset in subsets])
+        return _to_facts(zip(subsets, contents))
+
+    key = appliance_key(connection)
+    entry = load_cached_facts(key)
+    cached = entry.get('subsets', {})
+
+    missing = [subset for subset in subsets if subset not in cached and subset != 'lmi']
+    contents = _send_batch(connection, [isva_lmi_status.uri, '{}/count'.format(isva_pending_changes.uri)] +
+                           [FACT_SUBSETS[subset][0] for subset in missing])
+    validity = {'start_time': isva_lmi_status.from_api(contents[0]).get('start_time'), 'pending_changes': contents[1].get('count')}
+
+    fetched = dict(zip(missing, contents[2:]))
+    if entry.get('validity') != validity:
+        logger.debug('The cached facts of {} are outdated'.format(key))
+        cached = {}
+        stale = [subset for subset in subsets if subset not in fetched and subset != 'lmi']
+        fetched.update(zip(stale, _send_batch(connection, [FACT_SUBSETS[subset][0] for subset in stale])))
+    else:
+        logger.debug('Serving the facts {} of {} from the cache'.format([subset for subset in subsets if subset in cached], key))
+
+    cached = dict(cached, **fetched)
+    if fetched:
+        save_cached_facts(key, {'validity': validity, 'subsets': cached})
+
+    live = {'lmi': contents[0]}
+    return _to_facts((subset, live[subset] if subset in live else cached[subset]) for subset in subsets)
+
+
+def _to_facts(contents):
+    facts = {}
+    for subset, source in contents:
+        logger.debug('Gathered the {} facts'.format(subset))
+        facts.update(FACT_SUBSETS[subset][1](source))
+
+    return facts
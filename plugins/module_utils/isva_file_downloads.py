@@ -7,17 +7,21 @@ from __future__ import absolute_import, division, print_function
 
 __metaclass__ = type
 
-from ansible_collections.community.isva.plugins.module_utils.isva_utils import parse_fail_message, identical_files
+from ansible_collections.community.isva.plugins.module_utils.isva_utils import (
+    parse_fail_message, file_sha256, record_file_sha256, file_signature, load_local_state, save_local_state, move_file,
+    check_parallelism, download_in_chunks, FilesystemIndex
+)
 from ansible_collections.community.isva.plugins.module_utils.common import ISVAModuleError
 from ansible.module_utils.connection import Connection
 
-import json
 import logging
 import os
-import base64
-import shutil
+import tempfile
 
 uri = '/isam/downloads'
+MANIFEST_SUFFIX = '.isva_manifest'
+MANIFEST_VERSION = 1
+REMOTE_METADATA_ATTRIBUTES = ['size', 'modified']
 
 logger = logging.getLogger(__name__)
 
@@ -53,30 +57,104 @@ def fetch_file_downloads(module, path=None, recursive=True):
     return response['contents']
 
 
-def download_file_downloads(module, path, dest, remote_files={}):
-    """This function will download the requested shared volume file.
+def _remote_metadata(entry):
+    return {key: entry[key] for key in REMOTE_METADATA_ATTRIBUTES if entry.get(key) is not None}
+
 
+def _is_unchanged(path, dest, metadata):
+    """Tell whether dest is the copy of the remote file described by metadata, according to its sidecar manifest.
+    """
+    if not metadata or not os.path.isfile(dest):
+        return False
+
+    manifest = load_local_state('{}{}'.format(dest, MANIFEST_SUFFIX), MANIFEST_VERSION)
+    return manifest.get('path') == path and manifest.get('remote') == metadata and manifest.get('local') == file_signature(dest)
+
+
+def _write_manifest(path, dest, metadata):
+    save_local_state('{}{}'.format(dest, MANIFEST_SUFFIX), MANIFEST_VERSION, {'path': path, 'remote': metadata, 'local': file_signature(dest)})
+
+
+def _prepare_download(module, path, dest, remote_files, compare):
+    """Return the download request of a file, or None when compare is metadata and the remote size and
+    modification time of the file are the ones recorded in the manifest of dest.
+    Unless skipped, the file is downloaded to a temporary location as we've no way to find out remotely if it is
+    identical to the local one. The temporary file is staged next to dest so that it can be renamed in place, the
+    directory of dest must then be writable. It's removed if the download fails: unlike shared volume files, the
+    listing has no checksum a resumed download could be verified with.
     """
     target_uri = '{}/{}'.format(uri, path)
-    file_path = path.split('/')
 
-    curr_d = remote_files
-    for d in file_path[1:]:  # Starting at 1 to avoid the first empty string
-        curr_d = curr_d.get(d)
-        if not curr_d:
-            raise ISVAModuleError('The requested file does not exist {}'.format(path))
+    entry = remote_files.get(path)
+    if not entry or entry['type'] != 'File':
+        raise ISVAModuleError('The requested file does not exist {}'.format(path))
 
-    tmp_dest = '{}{}'.format(module.tmpdir, file_path[-1])
-    # Downloading file, we've no way to find out remotely if they are identical, so adding it at a temporary location.
-    connection = Connection(module._socket_path)
-    response = connection.download_file(path=target_uri, dest=tmp_dest)
+    metadata = _remote_metadata(entry) if compare == 'metadata' else None
+    if _is_unchanged(path, dest, metadata):
+        logger.debug('The remote file {} did not change since it was downloaded to {}'.format(path, dest))
+        return None
 
-    if not response:
-        raise ISVAModuleError('Couldn\'t download the file {}/{}'.format(volume, path))
+    directory = os.path.dirname(os.path.abspath(dest))
+    try:
+        fd, tmp_dest = tempfile.mkstemp(dir=directory, prefix='.{}.'.format(os.path.basename(dest)), suffix='.part')
+    except OSError as e:
+        raise ISVAModuleError('Couldn\'t download the file {} to {}, its directory {} is not writable: {}'.format(path, dest, directory, e))
+    os.close(fd)
 
-    if identical_files(module, tmp_dest, dest):  # No change to report
-        return False
+    return {'path': target_uri, 'dest': tmp_dest, 'metadata': metadata}
+
+
+def _complete_download(module, path, request, response, dest):
+    """Move a downloaded file to its destination unless it is identical to it.
+    """
+    if response['code'] != 200:
+        raise ISVAModuleError('Couldn\'t download the file {}: {}'.format(path, parse_fail_message(response['code'], response['contents'])))
+
+    changed = False
+    if not os.path.isfile(dest) or file_sha256(module, dest) != response['sha256']:
+        move_file(request['dest'], dest)
+        record_file_sha256(dest, response['sha256'])
+        changed = True
+
+    if request['metadata']:
+        _write_manifest(path, dest, request['metadata'])
 
-    shutil.copyfile(tmp_dest, dest)
+    return changed
+
+
+def download_file_downloads(module, path, dest, remote_files=None, compare='checksum'):
+    """This function will download the requested shared volume file.
 
-    return True
+    """
+    return download_file_downloads_batch(module, [{'path': path, 'dest': dest}], remote_files, compare=compare)[0]
+
+
+def download_file_downloads_batch(module, files, remote_files=None, parallelism=1, compare='checksum'):
+    """This function will download the requested files, up to parallelism files are downloaded concurrently by the
+    connection, at most max_concurrent_requests. With compare set to metadata, the files whose remote size and modification time didn't change since
+    they were last downloaded are not transferred again.
+
+    Returns:
+        list: For each requested file, in the same order, whether its destination has been changed.
+    """
+    check_parallelism(parallelism)
+    if remote_files is None:
+        remote_files = FilesystemIndex()
+    requests = []
+    try:
+        for f in files:
+            requests.append(_prepare_download(module, f['path'], f['dest'], remote_files, compare))
+        batch = [request for request in requests if request]
+        if not batch:
+            return [False for _ in files]
+
+        connection = Connection(module._socket_path)
+        responses = iter(download_in_chunks(connection, [{'path': request['path'], 'dest': request['dest']} for request in batch],
+                                            parallelism))
+
+        return [_complete_download(module, f['path'], request, next(responses), f['dest']) if request else False
+                for f, request in zip(files, requests)]
+    finally:
+        for request in filter(None, requests):  # Don't leave temporary files behind when a download failed.
+            if os.path.exists(request['dest']):
+                os.remove(request['dest'])
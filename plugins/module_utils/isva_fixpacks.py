@@ -32,3 +32,9 @@ def fetch_fixpacks(module):
         raise ISVAModuleError(parse_fail_message(response['code'], response['contents']))
 
     return response['contents']
+
+
+def to_facts(source):
+    """ This function turns the fixpacks fetched from the appliance into ansible facts.
+    """
+    return {'isva_fixpacks': source}
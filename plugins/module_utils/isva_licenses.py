@@ -32,3 +32,9 @@ def fetch_licenses(module):
         raise ISVAModuleError(parse_fail_message(response['code'], response['contents']))
 
     return response['contents']
+
+
+def to_facts(source):
+    """ This function turns the licenses fetched from the appliance into ansible facts.
+    """
+    return {'isva_licenses': source}
@@ -33,6 +33,12 @@ def from_api(source):
     return data
 
 
+def to_facts(source):
+    """ This function turns the lmi status fetched from the appliance into ansible facts.
+    """
+    return {'isva_lmi_status': from_api(source)}
+
+
 def fetch_lmi_status(module):
     """ This function fetch the lmi status from the appliance
 
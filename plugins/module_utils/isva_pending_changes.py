@@ -7,12 +7,16 @@ from __future__ import absolute_import, division, print_function
 
 __metaclass__ = type
 
-from ansible_collections.community.isva.plugins.module_utils.isva_utils import parse_fail_message
+from ansible_collections.community.isva.plugins.module_utils.isva_utils import parse_fail_message, appliance_key, invalidate_cached_facts
 from ansible_collections.community.isva.plugins.module_utils.common import ISVAModuleError
-from ansible.module_utils.connection import Connection
+from ansible_collections.community.isva.plugins.module_utils import isva_lmi_status
+from ansible_collections.community.isva.plugins.module_utils.isva_docker_publish import forget_published_configuration
+from ansible.module_utils.connection import Connection, ConnectionError
 
 import logging
 import json
+import random
+import time
 
 uri = '/isam/pending_changes'
 
@@ -49,6 +53,31 @@ def count_pending_changes(module):
     return response['contents']
 
 
+def request_deploy(module, reason):
+    """ This function registers on the connection that the pending changes must be deployed, the deploy itself is
+    left to a later isva_pending_changes task with deferred set.
+    """
+    connection = Connection(module._socket_path)
+    connection.request_deploy(reason=reason)
+
+
+def fetch_deploy_requests(module):
+    """ This function collects the deferred deploys registered on the connection and not forgotten yet.
+
+    Returns:
+        list: The reasons of the requested deploys, empty when none has been requested.
+    """
+    connection = Connection(module._socket_path)
+    return connection.deploy_requests()
+
+
+def forget_deploy_requests(module, requests):
+    """ This function forgets the deferred deploys returned by fetch_deploy_requests, once they have been deployed.
+    """
+    connection = Connection(module._socket_path)
+    connection.forget_deploy_requests(count=len(requests))
+
+
 def deploy_changes(module):
     """This function deploy the list of outsanding changes
 
@@ -61,6 +90,9 @@ def deploy_changes(module):
     if response['code'] != 200:
         raise ISVAModuleError(parse_fail_message(response['code'], response['contents']))
 
+    key = appliance_key(connection)
+    invalidate_cached_facts(key)
+    forget_published_configuration(key)
     return response['contents']
 
 
@@ -77,3 +109,61 @@ def rollback_changes(module):
         raise ISVAModuleError(parse_fail_message(response['code'], response['contents']))
 
     return response['contents']
+
+
+def fetch_start_time(module):
+    """ This function fetches the start time of the LMI, it changes when a deploy restarts the LMI.
+
+    Returns:
+        str: The start time of the LMI.
+    """
+    return isva_lmi_status.from_api(isva_lmi_status.fetch_lmi_status(module)).get('start_time')
+
+
+def _is_ready(connection, start_time=None):
+    """ The appliance is ready once there are no changes left to deploy and the LMI answers, with another start time
+    than start_time, the one before the deploy, when given.
+    """
+    try:
+        count = connection.send_request(path='{}/count'.format(uri))
+        if count['code'] != 200 or count['contents'].get('count'):
+            return False
+
+        lmi = connection.send_request(path=isva_lmi_status.uri)
+        if lmi['code'] != 200:
+            return False
+        if start_time is not None and isva_lmi_status.from_api(lmi['contents']).get('start_time') == start_time:
+            logger.debug('The LMI has not restarted yet')
+            return False
+        return True
+    except ConnectionError as e:  # The LMI is restarting and doesn't accept connections yet.
+        logger.debug('The appliance is not reachable: {}'.format(e))
+        return False
+
+
+def wait_for_deploy(module, timeout=600, delay=1, max_delay=30, start_time=None):
+    """ This function polls the pending changes count and the LMI status until the appliance is ready, i.e. the
+    changes are deployed and the LMI answers again. When the deployed changes restart the LMI, the count is already 0
+    and the LMI still answers right after the deploy request, pass the LMI start time fetched before the deploy to
+    wait until the LMI has restarted. Most changes don't restart it, start_time must then be None.
+    The polls are spaced with an exponential backoff, from delay up to max_delay seconds, with a random jitter.
+
+    Returns:
+        float: The number of seconds waited.
+    """
+    connection = Connection(module._socket_path)
+    start = time.monotonic()
+    deadline = start + timeout
+    attempt = 0
+    while not _is_ready(connection, start_time):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise ISVAModuleError('The appliance is still not ready after {} seconds'.format(timeout))
+
+        backoff = min(max_delay, delay * 2 ** attempt)
+        attempt += 1
+        time.sleep(min(remaining, random.uniform(backoff / 2, backoff)))
+
+    elapsed = time.monotonic() - start
+    logger.debug('The appliance is ready after {:.1f} seconds'.format(elapsed))
+    return elapsed
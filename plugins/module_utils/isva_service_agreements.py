@@ -37,7 +37,7 @@ def fetch_service_agreements(module):
 def accept_service_agreements(module, **kwargs):
     connection = Connection(module._socket_path)
     accepted = kwargs.pop('accepted')
-    payload = json.dump({'accepted': str(accepted)})
+    payload = json.dumps({'accepted': str(accepted)})
 
     response = connection.send_request(path=uri, method='PUT', payload=payload)
 
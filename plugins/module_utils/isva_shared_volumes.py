@@ -7,14 +7,14 @@ from __future__ import absolute_import, division, print_function
 
 __metaclass__ = type
 
-from ansible_collections.community.isva.plugins.module_utils.isva_utils import parse_fail_message
+from ansible_collections.community.isva.plugins.module_utils.isva_utils import (
+    parse_fail_message, file_sha256, record_file_sha256, check_parallelism, download_in_chunks, FilesystemIndex
+)
 from ansible_collections.community.isva.plugins.module_utils.common import ISVAModuleError
 from ansible.module_utils.connection import Connection
 
-import json
 import logging
 import os
-import base64
 
 uri = '/shared_volume'
 ALLOWED_PATH = ['fixpacks', 'snapshots', 'support']
@@ -59,48 +59,121 @@ def fetch_shared_volumes(module, path=None, recursive=True):
     return response['contents']
 
 
-def download_shared_volumes(module, path, volume, dest, remote_files={}):
-    """This function will download the requested shared volume file.
+def fetch_shared_volumes_index(module, paths):
+    """ This function lists the given shared volume paths, one level deep, and indexes their files by full path.
+    Only the requested paths are listed, the listings are fetched concurrently by the connection.
 
+    Returns:
+        FilesystemIndex: The files of the given paths.
+    """
+    paths = sorted(set(paths))
+    for path in paths:
+        _check_path(path)
+
+    connection = Connection(module._socket_path)
+    responses = connection.send_requests(batch=[{'path': '{}/{}?recursive={}'.format(uri, path, False)} for path in paths])
+
+    index = FilesystemIndex()
+    for path, response in zip(paths, responses):
+        if response['code'] != 200:
+            raise ISVAModuleError(parse_fail_message(response['code'], response['contents']))
+        index.add(response['contents'], prefix=path)
+
+    return index
+
+
+def _prepare_download(module, path, volume, dest, remote_files):
+    """Return the download request of a shared volume file, or None when dest is already up to date.
     """
     _check_path(path)
     target_uri = '{}/{}/{}?type=File&export'.format(uri, path, volume)
 
-    if path in remote_files and volume not in remote_files[path]:
+    entry = remote_files.get('{}/{}'.format(path, volume))
+    if not entry or entry['type'] != 'File':
         raise ISVAModuleError('The requested file does not exist {}/{}'.format(path, volume))
 
-    want = remote_files[path][volume]['sha256']
+    want = entry['sha256']
 
     if os.path.isfile(dest):
-        have = module.sha256(dest)
+        have = file_sha256(module, dest)
         if want == have:  # Don't download file if we already have it.
-            return False
+            return None
 
-    connection = Connection(module._socket_path)
     # Need to pass-in empty headers or the appliance responds with a JSON.
-    response = connection.download_file(path=target_uri, dest=dest, headers={})
+    return {'path': target_uri, 'dest': '{}.part'.format(dest), 'headers': {}, 'resume': True, 'sha256': want}
+
+
+def _complete_download(connection, request, response, dest):
+    """Verify a downloaded shared volume file and move it in place.
+    """
+    want = request['sha256']
+    if response['code'] == 200 and response['resumed'] and response['sha256'] != want:
+        logger.debug('The resumed download of {} is corrupted, downloading it again'.format(request['path']))
+        response = connection.download_file(path=request['path'], dest=request['dest'], headers=request['headers'])
 
-    if not response:
-        raise ISVAModuleError('Couldn\'t download the file {}/{}'.format(volume, path))
+    if response['code'] != 200:
+        raise ISVAModuleError('Couldn\'t download the file {}: {}'.format(request['path'], parse_fail_message(response['code'], response['contents'])))
 
-    have = module.sha256(dest)
+    have = response['sha256']  # Computed while the file was being downloaded.
     if want != have:  # Throw error if downloaded file doesn't have the same checksum as remote
+        os.remove(request['dest'])
         raise ISVAModuleError('The downloaded file checksum doesn\'t match the remote one: {} - {}'.format(want, have))
 
-    return True
+    os.replace(request['dest'], dest)
+    record_file_sha256(dest, have)
 
 
-def upload_shared_volumes(module, path, volume, src, overwrite=False, remote_files={}, check_mode=False):
+def download_shared_volumes(module, path, volume, dest, remote_files=None):
+    """This function will download the requested shared volume file.
+    The file is downloaded next to the destination and moved in place once its checksum has been verified, an
+    interrupted download is resumed on the next run.
+    """
+    return download_shared_volumes_batch(module, [{'path': path, 'name': volume, 'dest': dest}], remote_files)[0]
+
+
+def download_shared_volumes_batch(module, files, remote_files=None, parallelism=1):
+    """This function will download the requested shared volume files, up to parallelism files are downloaded
+    concurrently by the connection, at most max_concurrent_requests. Each file is verified against its own checksum.
+
+    Returns:
+        list: For each requested file, in the same order, whether it has been downloaded.
+    """
+    check_parallelism(parallelism)
+    if remote_files is None:
+        remote_files = fetch_shared_volumes_index(module, [f['path'] for f in files])
+    requests = [_prepare_download(module, f['path'], f['name'], f['dest'], remote_files) for f in files]
+    batch = [request for request in requests if request]
+    if not batch:
+        return [False for _ in files]
+
+    connection = Connection(module._socket_path)
+    responses = iter(download_in_chunks(connection, [{key: request[key] for key in ('path', 'dest', 'headers', 'resume')}
+                                                     for request in batch], parallelism))
+
+    for f, request in zip(files, requests):
+        if request:
+            _complete_download(connection, request, next(responses), f['dest'])
+
+    return [request is not None for request in requests]
+
+
+def upload_shared_volumes(module, path, volume, src, overwrite=False, remote_files=None, check_mode=False):
     """This function will upload the requested shared volume file.
+    The file is streamed by the connection, the memory used doesn't depend on its size.
     """
     _check_path(path)
 
     if not os.path.isfile(src):
         raise ISVAModuleError('The source file is not valid {}'.format(src))
 
-    if path in remote_files and volume in remote_files[path]:
-        want = module.sha256(src)
-        have = remote_files[path][volume]['sha256']
+    volume = volume or os.path.basename(src)
+    if remote_files is None:
+        remote_files = fetch_shared_volumes_index(module, [path])
+
+    entry = remote_files.get('{}/{}'.format(path, volume))
+    if entry:
+        want = file_sha256(module, src)
+        have = entry['sha256']
         if want == have:  # The remote file is already the right one, no need to import
             return False
         elif not overwrite:
@@ -109,22 +182,12 @@ def upload_shared_volumes(module, path, volume, src, overwrite=False, remote_fil
     if check_mode:
         return True
 
-    raise ISVAModuleError('This function is not supported yet')
-
-    with open(src, 'rb') as f:
-        headers = {'Accept': 'application/json', 'Content-Type': 'application/octet-stream'}
-        b64_file = base64.b64encode(f.read()).decode('utf-8')
-        payload = json.dumps({
-            'file': b64_file,
-            'force': overwrite
-        })
+    target_uri = '{}/{}/{}'.format(uri, path, volume)
 
-        target_uri = '{}/{}/{}'.format(uri, path, volume)
-
-        connection = Connection(module._socket_path)
-        response = connection.send_request(path=target_uri, method='POST', payload=payload, headers=headers)
+    connection = Connection(module._socket_path)
+    response = connection.upload_file(path=target_uri, src=src, filename=volume, fields={'force': str(overwrite).lower()})
 
-        if response['code'] != 200:
-            raise ISVAModuleError(parse_fail_message(response['code'], response['contents']))
+    if response['code'] != 200:
+        raise ISVAModuleError(parse_fail_message(response['code'], response['contents']))
 
-        return True
\ No newline at end of file
+    return True
@@ -8,9 +8,24 @@ from __future__ import absolute_import, division, print_function
 __metaclass__ = type
 
 import os
+import collections
+import errno
+import fnmatch
+import json
+import shutil
+import time
+import tempfile
 import logging
 import logging.config
 
+from ansible_collections.community.isva.plugins.module_utils.common import ISVAModuleError
+from ansible_collections.community.isva.plugins.module_utils.constants import (
+    DIGEST_CACHE_FILE, DIGEST_CACHE_MAX_ENTRIES, FACTS_CACHE_FILE, LOG_BUFFER_MAX_BYTES, LOG_RECORD_MAX_BYTES
+)
+
+DIGEST_CACHE_VERSION = 1
+FACTS_CACHE_VERSION = 3
+
 logger = logging.getLogger(__name__)
 
 #log_level=dict(type='str', default='INFO', choices=['CRITICAL', 'FATAL', 'ERROR', 'WARN', 'WARNING', 'INFO', 'DEBUG', 'NOTSET'])
@@ -24,23 +39,87 @@ MAP_VERBOSITY_TO_LOG_LEVEL = {
 }
 
 
+LOG_FORMAT = '[%(asctime)s] [PID:%(process)d TID:%(thread)d] [%(levelname)s] [%(name)s] [%(funcName)s():%(lineno)s] %(message)s'
+
+
+class RingBufferLogHandler(logging.Handler):
+    """ Log handler keeping the most recent records in memory, up to max_bytes of formatted text. The oldest records
+    are dropped first and a record longer than max_record_bytes is truncated, so that a debug run logging large
+    listings doesn't balloon the result of the module.
+    """
+
+    def __init__(self, max_bytes=LOG_BUFFER_MAX_BYTES, max_record_bytes=LOG_RECORD_MAX_BYTES):
+        super(RingBufferLogHandler, self).__init__()
+        self.max_bytes = max_bytes
+        self.max_record_bytes = max_record_bytes
+        self.dropped = 0
+        self._buffer = collections.deque()
+        self._size = 0
+
+    def emit(self, record):
+        try:
+            text = self._truncate(self.format(record))
+            message = self._truncate(record.getMessage())
+        except Exception:
+            self.handleError(record)
+            return
+
+        self._buffer.append((text, {
+            'time': self.formatter.formatTime(record) if self.formatter else record.created,
+            'level': record.levelname,
+            'logger': record.name,
+            'function': record.funcName,
+            'line': record.lineno,
+            'message': message
+        }))
+        self._size += len(text) + 1
+        while self._size > self.max_bytes and len(self._buffer) > 1:
+            self._size -= len(self._buffer.popleft()[0]) + 1
+            self.dropped += 1
+
+    def _truncate(self, text):
+        if len(text) <= self.max_record_bytes:
+            return text
+        return '{}... [truncated {} characters]'.format(text[:self.max_record_bytes], len(text) - self.max_record_bytes)
+
+    def _dropped_message(self):
+        return '[{} earlier log records dropped]'.format(self.dropped)
+
+    def getvalue(self):
+        """ The records as text, one per line, like the content of a StringIO a StreamHandler writes to.
+        """
+        lines = [self._dropped_message()] if self.dropped else []
+        lines.extend(text for text, _ in self._buffer)
+        return ''.join('{}\n'.format(line) for line in lines)
+
+    def records(self):
+        """ The records as a list of dicts, with their time, level, logger, function, line and message.
+        """
+        records = [{'level': 'WARNING', 'message': self._dropped_message()}] if self.dropped else []
+        records.extend(dict(record) for _, record in self._buffer)
+        return records
+
+
 def setup_logging(str_log, verbosity):
+    """ This function sends the logs of the module to str_log, either a RingBufferLogHandler or a stream, at the
+    level matching the verbosity of the task.
+    """
     log_level = MAP_VERBOSITY_TO_LOG_LEVEL[verbosity]
+    if isinstance(str_log, logging.Handler):
+        handler = {'level': log_level, 'formatter': 'standard', '()': lambda: str_log}
+    else:
+        handler = {'level': log_level, 'formatter': 'standard', 'class': 'logging.StreamHandler', 'stream': str_log}
+
     DEFAULT_LOGGING = {
         'version': 1,
         'disable_existing_loggers': False,
         'formatters': {
             'standard': {
-                'format': '[%(asctime)s] [PID:%(process)d TID:%(thread)d] [%(levelname)s] [%(name)s] [%(funcName)s():%(lineno)s] %(message)s'
+                'format': LOG_FORMAT
             },
         },
         'handlers': {
-            'default': {
-                'level': log_level,
-                'formatter': 'standard',
-                'class': 'logging.StreamHandler',
-                'stream': str_log
-            },
+            'default': handler,
         },
         'loggers': {
             '': {
@@ -57,12 +136,31 @@ def parse_fail_message(code, response):
     return 'ISVA device returned error {0} with message {1}'.format(code, response)
 
 
-def update_logging_info(return_value, stdout='', stderr=''):
-    return return_value.update({'stdout': stdout, 'stdout_lines': stdout.splitlines(), 'stderr': stderr, 'stderr_lines': stderr.splitlines()})
+def _logging_info(stdout, stderr, log_output):
+    """ The logs to return with the result of a module. stdout is either the text of the logs or the
+    RingBufferLogHandler which captured them. log_output is text, lines to also return stdout_lines or records
+    to return log_records, the list of the records, instead of stdout. stdout_lines is otherwise returned empty,
+    so that Ansible doesn't split stdout on its own.
+    """
+    info = {'stderr': stderr, 'stderr_lines': stderr.splitlines(), 'stdout_lines': []}
+    if log_output == 'records' and isinstance(stdout, RingBufferLogHandler):
+        info.update({'stdout': '', 'log_records': stdout.records()})
+        return info
 
+    info['stdout'] = stdout.getvalue() if isinstance(stdout, RingBufferLogHandler) else stdout
+    if log_output == 'lines':
+        info['stdout_lines'] = info['stdout'].splitlines()
+    return info
 
-def create_return_error(msg='', stdout='', stderr=''):
-    return {'msg': msg, 'stdout': stdout, 'stdout_lines': stdout.splitlines(), 'stderr': stderr, 'stderr_lines': stderr.splitlines()}
+
+def update_logging_info(return_value, stdout='', stderr='', log_output='text'):
+    return return_value.update(_logging_info(stdout, stderr, log_output))
+
+
+def create_return_error(msg='', stdout='', stderr='', log_output='text'):
+    return_value = {'msg': msg}
+    return_value.update(_logging_info(stdout, stderr, log_output))
+    return return_value
 
 
 def create_return_object(changed=False, failed=False, rc=0, skipped=False, stderr='', stderr_lines=None, stdout='', stdout_lines=None, warnings=None):
@@ -97,11 +195,300 @@ def convert_filesystem_to_dict(filesystem):
     return ret
 
 
+class _IndexedDirectory(object):
+    """ A directory of a FilesystemIndex, its listings are only indexed when one of its entries is looked up.
+    """
+    __slots__ = ('listings', 'entries')
+
+    def __init__(self):
+        self.listings = []
+        self.entries = {}
+
+    def children(self):
+        listings, self.listings = self.listings, []
+        entries = self.entries
+        attributes = FilesystemIndex.FILE_ATTRIBUTES
+        for listing in listings:
+            for entry in listing:
+                if entry['type'] == 'File':
+                    entries[entry['name']] = {key: entry[key] for key in attributes if key in entry}
+                elif entry['type'] == 'Directory':
+                    child = entries.get(entry['name'])
+                    if not isinstance(child, _IndexedDirectory):
+                        child = entries[entry['name']] = _IndexedDirectory()
+                    if entry.get('children'):
+                        child.listings.append(entry['children'])
+
+        return entries
+
+
+class FilesystemIndex(object):
+    """ Index of the filesystem listings returned by the appliance, looked up by full path, e.g.
+    'snapshots/isva_10.0.3.1_published.snapshot'. A directory is only indexed when a path below it is looked up, its
+    files are then recorded with the attributes of FILE_ATTRIBUTES only, the rest of the listing is left untouched.
+    """
+
+    FILE_ATTRIBUTES = ('name', 'type', 'size', 'modified', 'sha256')
+
+    def __init__(self, filesystem=None, prefix=''):
+        self._root = _IndexedDirectory()
+        if filesystem:
+            self.add(filesystem, prefix)
+
+    @staticmethod
+    def normalize(path):
+        return path.strip('/')
+
+    def add(self, filesystem, prefix=''):
+        """ Add the entries of a listing, prefix being the path of the directory which has been listed.
+        """
+        directory = self._root
+        for name in self._split(prefix):
+            child = directory.children().get(name)
+            if not isinstance(child, _IndexedDirectory):
+                child = directory.entries[name] = _IndexedDirectory()
+            directory = child
+        directory.listings.append(filesystem)
+
+    def _split(self, path):
+        path = self.normalize(path)
+        return path.split('/') if path else []
+
+    @staticmethod
+    def _entry(name, node):
+        return {'name': name, 'type': 'Directory'} if isinstance(node, _IndexedDirectory) else node
+
+    def _node(self, path):
+        node = self._root
+        for name in self._split(path):
+            if not isinstance(node, _IndexedDirectory):
+                return None
+            node = node.children().get(name)
+        return node
+
+    def get(self, path, default=None):
+        names = self._split(path)
+        node = self._node(path)
+        if node is None or not names:
+            return default
+        return self._entry(names[-1], node)
+
+    def __contains__(self, path):
+        return self.get(path) is not None
+
+    def __len__(self):
+        return sum(1 for _ in self._walk(self._root, ''))
+
+    def _walk(self, directory, parent):
+        for name, node in directory.children().items():
+            path = '{}/{}'.format(parent, name) if parent else name
+            yield path, node
+            if isinstance(node, _IndexedDirectory):
+                for item in self._walk(node, path):
+                    yield item
+
+    def iter_prefix(self, prefix):
+        """ Iterate in order over the (path, entry) pairs of prefix and of everything below it.
+        """
+        prefix = self.normalize(prefix)
+        node = self._node(prefix)
+        if node is None:
+            return
+
+        paths = [(prefix, node)] if prefix else []
+        if isinstance(node, _IndexedDirectory):
+            paths.extend(self._walk(node, prefix))
+        for path, node in sorted(paths, key=lambda item: item[0]):
+            yield path, self._entry(path.rsplit('/', 1)[-1], node)
+
+    def match(self, pattern):
+        """ Return the (path, entry) pairs, in order, whose path matches the shell-style pattern.
+        """
+        pattern = self.normalize(pattern)
+        return [(path, entry) for path, entry in self.iter_prefix('') if fnmatch.fnmatchcase(path, pattern)]
+
+
 def identical_files(module, src, dest):  # Compare 2 files based on their checksum.
     if not os.path.isfile(src) or not os.path.isfile(dest):
         return False
 
-    sha_src = module.sha256(src)
-    sha_dest = module.sha256(dest)
+    sha_src = file_sha256(module, src)
+    sha_dest = file_sha256(module, dest)
+
+    return sha_src == sha_dest
+
+
+def move_file(src, dest):
+    """ Move src to dest with an atomic rename, so that readers never see a partially written dest. The content is
+    only copied, next to dest before being renamed, when both paths are on different devices.
+    dest keeps its permissions if it already exists, otherwise it gets the default ones.
+    """
+    if os.path.exists(dest):
+        shutil.copymode(dest, src)
+    else:
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(src, 0o666 & ~umask)
+
+    try:
+        os.replace(src, dest)
+        return
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+
+    fd, tmp_dest = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(dest)), prefix='.{}.'.format(os.path.basename(dest)))
+    os.close(fd)
+    try:
+        shutil.copy(src, tmp_dest)
+        os.replace(tmp_dest, dest)
+    except Exception:
+        os.remove(tmp_dest)
+        raise
+    os.remove(src)
+
+
+def load_local_state(path, version):
+    """ Load a JSON state file stored on the controller.
+
+    Returns:
+        dict: The stored data, or an empty dict if the file is missing, unreadable or has another schema version.
+    """
+    try:
+        with open(path, 'r') as f:
+            state = json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+
+    if not isinstance(state, dict) or state.get('version') != version or not isinstance(state.get('data'), dict):
+        return {}
+
+    return state['data']
+
+
+def save_local_state(path, version, data):
+    """ Store a JSON state file on the controller, the file is replaced atomically so that concurrent readers
+    never see a partially written state.
+    """
+    directory = os.path.dirname(path)
+    try:
+        if not os.path.isdir(directory):
+            os.makedirs(directory, 0o700)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.{}.'.format(os.path.basename(path)))
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'version': version, 'data': data}, f)
+        os.replace(tmp_path, path)
+    except (IOError, OSError) as e:  # The state is an optimisation only, never fail the module because of it.
+        logger.debug('Unable to save the local state {}: {}'.format(path, e))
+
+
+def appliance_key(connection):
+    """ This function returns the key under which the state of an appliance is kept on the controller, connection
+    being either the connection plugin or its proxy on the module side.
+
+    Returns:
+        str: The key of the appliance.
+    """
+    return '{}:{}'.format(connection.get_option('host'), connection.get_option('port'))
+
+
+def load_cached_facts(key):
+    """ This function returns the facts of an appliance cached on the controller by isva_facts.
+
+    Returns:
+        dict: The validity and the subsets of the cached facts, empty when none are cached.
+    """
+    return load_local_state(FACTS_CACHE_FILE, FACTS_CACHE_VERSION).get(key, {})
+
+
+def save_cached_facts(key, entry):
+    """ This function caches the facts of an appliance on the controller.
+    """
+    cache = load_local_state(FACTS_CACHE_FILE, FACTS_CACHE_VERSION)
+    cache[key] = entry
+    save_local_state(FACTS_CACHE_FILE, FACTS_CACHE_VERSION, cache)
+
+
+def invalidate_cached_facts(key):
+    """ This function drops the cached facts of an appliance, it's called by the module_utils which deploy changes:
+    a deploy restores the pending changes count the facts are validated with and doesn't always restart the LMI.
+    """
+    cache = load_local_state(FACTS_CACHE_FILE, FACTS_CACHE_VERSION)
+    if key in cache:
+        del cache[key]
+        save_local_state(FACTS_CACHE_FILE, FACTS_CACHE_VERSION, cache)
+
+
+def file_signature(path):
+    st = os.stat(path)
+    return [st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns]
+
+
+def _load_digest_cache():
+    """ Load the digest cache, the malformed entries, e.g. written by hand, are dropped.
+    """
+    cache = load_local_state(DIGEST_CACHE_FILE, DIGEST_CACHE_VERSION)
+    return dict((path, entry) for path, entry in cache.items() if isinstance(entry, dict) and 'signature' in entry and 'sha256' in entry)
+
+
+def record_file_sha256(path, sha256, signature=None):
+    """ Remember the sha256 of a local file in the digest cache, e.g. when it has been computed while downloading it.
+    """
+    path = os.path.realpath(path)
+    cache = _load_digest_cache()
+    cache[path] = {'signature': signature or file_signature(path), 'sha256': sha256, 'time': time.time()}
+
+    if len(cache) > DIGEST_CACHE_MAX_ENTRIES:  # Evict the entries which have been hashed the longest time ago.
+        for key in sorted(cache, key=lambda k: cache[k].get('time', 0))[:len(cache) - DIGEST_CACHE_MAX_ENTRIES]:
+            del cache[key]
+
+    save_local_state(DIGEST_CACHE_FILE, DIGEST_CACHE_VERSION, cache)
+
+
+def file_sha256(module, path):
+    """ Compute the sha256 of a local file. The digest is served from the digest cache when the path, inode, size,
+    modification and change times of the file are the same as when it was last hashed.
+
+    Returns:
+        str: The sha256 of the file.
+    """
+    signature = file_signature(path)
+    entry = _load_digest_cache().get(os.path.realpath(path))
+    if entry and entry['signature'] == signature:
+        logger.debug('Using cached sha256 for {}'.format(path))
+        return entry['sha256']
+
+    sha256 = module.sha256(path)
+    if file_signature(path) == signature:  # Don't cache a digest of a file that was modified while being hashed.
+        record_file_sha256(path, sha256, signature)
+
+    return sha256
+
+
+def check_parallelism(parallelism):
+    if parallelism < 1:
+        raise ISVAModuleError('The parallelism must be at least 1, got {}'.format(parallelism))
+
+
+def download_in_chunks(connection, batch, parallelism=1):
+    """ Download a batch of files over the connection, one call per file when parallelism is 1, else one call per
+    chunk of parallelism files downloaded concurrently, parallelism being capped by the max_concurrent_requests option
+    of the connection. Each call has to complete within the persistent_command_timeout of the connection, it mustn't
+    hold more files than are downloaded at once.
+
+    Returns:
+        list: The response of each download, in the same order as the batch.
+    """
+    check_parallelism(parallelism)
+    if parallelism > 1 and len(batch) > 1:
+        parallelism = min(parallelism, max(connection.get_option('max_concurrent_requests'), 1))
+
+    responses = []
+    for start in range(0, len(batch), parallelism):
+        chunk = batch[start:start + parallelism]
+        if len(chunk) == 1:
+            responses.append(connection.download_file(**chunk[0]))
+        else:
+            responses.extend(connection.download_files(batch=chunk, parallelism=parallelism))
 
-    return sha_src == sha_dest
\ No newline at end of file
+    return responses
@@ -31,3 +31,9 @@ def fetch_system_version(module):
         raise ISVAModuleError(parse_fail_message(response['code'], response['contents']))
 
     return response['contents']
+
+
+def to_facts(source):
+    """ This function turns the version fetched from the appliance into ansible facts.
+    """
+    return {'isva_{}'.format(key): source[key] for key in source}
@@ -15,6 +15,8 @@ short_description: Collect information about the First Steps Setup process.
 description:
   - Collect information about the First Steps Setup process.
 version_added: "1.0.0"
+extends_documentation_fragment:
+  - community.isva.isva
 author:
   - Cédric Servais (@7893254)
 '''
@@ -32,14 +34,14 @@ from io import StringIO
 
 from ansible.module_utils.basic import AnsibleModule
 
-from ansible_collections.community.isva.plugins.module_utils.isva_advanced_tuning_parameters import fetch_advanced_tuning_parameters, from_api
+from ansible_collections.community.isva.plugins.module_utils.isva_advanced_tuning_parameters import fetch_advanced_tuning_parameters, to_facts
 
 from ansible_collections.community.isva.plugins.module_utils.isva_utils import (
-    create_return_object, create_return_error, setup_logging, update_logging_info
+    create_return_object, create_return_error, setup_logging, update_logging_info, RingBufferLogHandler
 )
 
 logger = logging.getLogger(__name__)
-str_log = StringIO()
+str_log = RingBufferLogHandler()
 error_log = StringIO()
 
 
@@ -47,7 +49,8 @@ class ArgumentSpec(object):
     def __init__(self):
         self.supports_check_mode = True
         argument_spec = dict(
-            log_level=dict(type='str', default='INFO', choices=['CRITICAL', 'FATAL', 'ERROR', 'WARN', 'WARNING', 'INFO', 'DEBUG', 'NOTSET'])
+            log_level=dict(type='str', default='INFO', choices=['CRITICAL', 'FATAL', 'ERROR', 'WARN', 'WARNING', 'INFO', 'DEBUG', 'NOTSET']),
+            log_output=dict(type='str', default='text', choices=['text', 'lines', 'records'])
         )
         self.argument_spec = {}
         self.argument_spec.update(argument_spec)
@@ -59,9 +62,7 @@ def __exec_get_facts(module):
 
 
 def exec_module(module):
-    response = from_api(__exec_get_facts(module=module))
-    ansible_facts = {'isva_advanced_tuning_parameters': response}
-    return {'ansible_facts': ansible_facts}
+    return {'ansible_facts': to_facts(__exec_get_facts(module=module))}
 
 def main():
     spec = ArgumentSpec()
@@ -75,14 +76,14 @@ def main():
 
         response = exec_module(module)
         return_value = create_return_object()
-        update_logging_info(return_value, str_log.getvalue(), error_log.getvalue())
+        update_logging_info(return_value, str_log, error_log.getvalue(), module.params['log_output'])
         return_value.update(response)
 
         module.exit_json(**return_value)
     except Exception as e:
         error_log.write(str(e))
         error_log.write(str(e.code))
-        return_value = create_return_error(msg=str(e), stdout=str_log.getvalue(), stderr=error_log.getvalue())
+        return_value = create_return_error(msg=str(e), stdout=str_log, stderr=error_log.getvalue(), log_output=module.params['log_output'])
         module.fail_json(**return_value)
 
 
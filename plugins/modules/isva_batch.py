@@ -0,0 +1,79 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2022, Cédric Servais <cedric.servais@outlook.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: isva_batch
+short_description: Run several modules of the collection in a single task.
+description:
+  - Run a list of operations, each one being a module of this collection with its arguments, in order.
+  - The operations run in the controller process over the persistent connection of the host, the modules are not
+    packaged nor started one by one.
+  - Each operation returns the same result as the module would have returned on its own.
+  - This module is implemented by an action plugin, it requires C(ansible_connection=httpapi).
+version_added: "1.0.0"
+options:
+  operations:
+    description:
+      - The operations to run.
+    type: list
+    elements: dict
+    required: true
+    suboptions:
+      module:
+        description:
+          - The name of the module, e.g. C(isva_dsc_config) or C(community.isva.isva_dsc_config).
+        type: str
+        required: true
+      args:
+        description:
+          - The arguments of the module.
+        type: dict
+        default: {}
+  stop_on_error:
+    description:
+      - Stop at the first operation which fails, the remaining operations aren't run.
+    type: bool
+    default: true
+author:
+  - Cédric Servais (@7893254)
+'''
+
+EXAMPLES = r'''
+- name: Configure the appliance
+  isva_batch:
+    operations:
+      - module: isva_service_agreements
+        args:
+          accepted: True
+          state: replaced
+      - module: isva_dsc_config
+        args:
+          state: gathered
+      - module: community.isva.isva_pending_changes
+        args:
+          state: deployed
+'''
+
+RETURN = r'''
+results:
+  description: The result of each operation which has been run, in order, with the name of its module.
+  returned: always
+  type: list
+  elements: dict
+changed:
+  description: Whether any operation changed the appliance.
+  returned: always
+  type: bool
+ansible_facts:
+  description: The facts returned by all the operations.
+  returned: when an operation returned facts
+  type: dict
+'''
@@ -0,0 +1,139 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2022, Cédric Servais <cedric.servais@outlook.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: isva_deploy_wait
+short_description: Wait until the deployed changes are applied
+description:
+  - Poll the pending changes count and the LMI status until there are no changes left to deploy and the LMI answers.
+  - When the deployed changes restart the LMI, the count is already 0 and the LMI still answers right after the
+    deploy, pass the I(start_time) of the LMI before the deploy to wait until it has restarted. Most changes don't
+    restart the LMI, don't pass it then or the task fails after I(timeout) seconds.
+  - The polls are spaced with an exponential backoff and a random jitter, the module returns as soon as the appliance
+    is ready.
+version_added: "1.0.0"
+options:
+  start_time:
+    description:
+      - The start time of the LMI before the deploy, e.g. C(isva_lmi_status.start_time) as gathered by
+        isva_lmi_facts. The appliance is only ready once the LMI answers with another start time.
+    type: str
+  timeout:
+    description:
+      - How many seconds to wait, the task fails when the appliance still isn't ready by then.
+    type: int
+    default: 600
+  delay:
+    description:
+      - How many seconds to wait before the second poll, the delay doubles after each poll.
+    type: int
+    default: 1
+  max_delay:
+    description:
+      - The maximum number of seconds between two polls.
+    type: int
+    default: 30
+extends_documentation_fragment:
+  - community.isva.isva
+author:
+  - Cédric Servais (@7893254)
+'''
+
+EXAMPLES = r'''
+- name: Deploy the pending changes
+  isva_pending_changes:
+    state: deployed
+
+- name: Wait for the appliance to be ready
+  isva_deploy_wait:
+    timeout: 300
+
+- name: Gather the LMI start time before deploying changes which restart the LMI
+  isva_lmi_facts:
+
+- name: Deploy the pending changes
+  isva_pending_changes:
+    state: deployed
+
+- name: Wait for the LMI to restart
+  isva_deploy_wait:
+    start_time: "{{ isva_lmi_status.start_time }}"
+    timeout: 300
+'''
+
+RETURN = r'''
+waited:
+  description: The number of seconds waited.
+  returned: always
+  type: float
+'''
+
+import logging
+from io import StringIO
+
+from ansible.module_utils.basic import AnsibleModule
+
+from ansible_collections.community.isva.plugins.module_utils.isva_pending_changes import wait_for_deploy
+
+from ansible_collections.community.isva.plugins.module_utils.isva_utils import (
+    create_return_object, create_return_error, setup_logging, update_logging_info, RingBufferLogHandler
+)
+
+logger = logging.getLogger(__name__)
+str_log = RingBufferLogHandler()
+error_log = StringIO()
+
+
+class ArgumentSpec(object):
+    def __init__(self):
+        self.supports_check_mode = True
+        argument_spec = dict(
+            start_time=dict(type='str', required=False),
+            timeout=dict(type='int', default=600),
+            delay=dict(type='int', default=1),
+            max_delay=dict(type='int', default=30),
+            log_level=dict(type='str', default='INFO', choices=['CRITICAL', 'FATAL', 'ERROR', 'WARN', 'WARNING', 'INFO', 'DEBUG', 'NOTSET']),
+            log_output=dict(type='str', default='text', choices=['text', 'lines', 'records'])
+        )
+        self.argument_spec = {}
+        self.argument_spec.update(argument_spec)
+
+
+def exec_module(module):
+    waited = wait_for_deploy(module=module, timeout=module.params['timeout'], delay=module.params['delay'],
+                             max_delay=module.params['max_delay'], start_time=module.params['start_time'])
+    return {'changed': False, 'waited': waited}
+
+
+def main():
+    spec = ArgumentSpec()
+    module = AnsibleModule(
+        argument_spec=spec.argument_spec,
+        supports_check_mode=spec.supports_check_mode
+    )
+    try:
+        setup_logging(str_log, module._verbosity)
+        logger.debug('Module parameters {}'.format(module.params))
+
+        response = exec_module(module)
+        return_value = create_return_object()
+        update_logging_info(return_value, str_log, error_log.getvalue(), module.params['log_output'])
+        return_value.update(response)
+
+        module.exit_json(**return_value)
+    except Exception as e:
+        error_log.write(str(e))
+        return_value = create_return_error(msg=str(e), stdout=str_log, stderr=error_log.getvalue(), log_output=module.params['log_output'])
+        module.fail_json(**return_value)
+
+
+if __name__ == '__main__':
+    main()
@@ -14,7 +14,27 @@ module: isva_docker_publish
 short_description: Publish the current configuration to the shared volume
 description:
   - Publish the current configuration to the shared volume
+  - When a I(fingerprint) is given, the publish is skipped if the configuration has already been published with the
+    same fingerprint, the snapshot it created is still on the shared volume, unchanged, no changes have been deployed
+    through this collection and the LMI hasn't been restarted since then.
+  - Most deploys don't restart the LMI, a change deployed by other means (e.g. the LMI web interface) with the same
+    fingerprint then skips a needed publish. Only give a fingerprint when the appliance is configured with this
+    collection and the fingerprint covers all of its configuration, otherwise the configuration is always published.
 version_added: "1.0.0"
+options:
+  fingerprint:
+    description:
+      - An identifier of the configuration being published, e.g. a checksum of the variables used to configure the
+        appliance. The configuration is published again when it differs from the one of the last publish.
+      - Without a fingerprint, the configuration is always published.
+    type: str
+  force:
+    description:
+      - Publish the configuration even if it has already been published.
+    type: bool
+    default: false
+extends_documentation_fragment:
+  - community.isva.isva
 author:
   - Cédric Servais (@7893254)
 '''
@@ -23,6 +43,11 @@ EXAMPLES = r'''
 - name: Publish current configuration to the shared volume
   isva_docker_publish:
     state: published
+
+- name: Publish the configuration unless it's already published
+  isva_docker_publish:
+    state: published
+    fingerprint: "{{ isva_config | to_json | hash('sha256') }}"
 '''
 
 RETURN = r'''
@@ -36,14 +61,16 @@ from io import StringIO
 
 from ansible.module_utils.basic import AnsibleModule
 
-from ansible_collections.community.isva.plugins.module_utils.isva_docker_publish import publish_configuration
+from ansible_collections.community.isva.plugins.module_utils.isva_docker_publish import (
+    publish_configuration, fetch_published_configuration, remember_published_configuration
+)
 
 from ansible_collections.community.isva.plugins.module_utils.isva_utils import (
-    create_return_object, create_return_error, setup_logging, update_logging_info
+    create_return_object, create_return_error, setup_logging, update_logging_info, RingBufferLogHandler
 )
 
 logger = logging.getLogger(__name__)
-str_log = StringIO()
+str_log = RingBufferLogHandler()
 error_log = StringIO()
 
 
@@ -52,7 +79,10 @@ class ArgumentSpec(object):
         self.supports_check_mode = True
         argument_spec = dict(
             state=dict(type='str', required=True, choices=['published']),
-            log_level=dict(type='str', default='INFO', choices=['CRITICAL', 'FATAL', 'ERROR', 'WARN', 'WARNING', 'INFO', 'DEBUG', 'NOTSET'])
+            fingerprint=dict(type='str', required=False),
+            force=dict(type='bool', default=False),
+            log_level=dict(type='str', default='INFO', choices=['CRITICAL', 'FATAL', 'ERROR', 'WARN', 'WARNING', 'INFO', 'DEBUG', 'NOTSET']),
+            log_output=dict(type='str', default='text', choices=['text', 'lines', 'records'])
         )
         self.argument_spec = {}
         self.argument_spec.update(argument_spec)
@@ -60,11 +90,20 @@ class ArgumentSpec(object):
 
 def __exec_published(module):
     check_mode = module.check_mode
+    fingerprint = module.params['fingerprint']
+    if fingerprint and not module.params['force']:
+        published = fetch_published_configuration(module, fingerprint)
+        if published:
+            logger.debug('The configuration has already been published to {}'.format(published['snapshot']))
+            return {'changed': False, 'after': {'filename': published['snapshot']}}
+
     logger.debug('Publishing docker configuration')
     if check_mode:
         return {'changed': True, 'after': {'filename': 'check_mode.snapshot'}}
 
     response = publish_configuration(module)
+    if fingerprint and 'filename' in response:
+        remember_published_configuration(module, response['filename'], fingerprint)
     return {'changed': True, 'after': response}
 
 
@@ -73,7 +112,8 @@ def exec_module(module):
 
     if state == 'published':
         response = __exec_published(module=module)
-        return {'changed': response['changed'], 'diff': {'before': {}, 'after': response['after']}}
+        before = {} if response['changed'] else response['after']
+        return {'changed': response['changed'], 'diff': {'before': before, 'after': response['after']}}
 
     return {}
 
@@ -90,14 +130,14 @@ def main():
 
         response = exec_module(module)
         return_value = create_return_object()
-        update_logging_info(return_value, str_log.getvalue(), error_log.getvalue())
+        update_logging_info(return_value, str_log, error_log.getvalue(), module.params['log_output'])
         return_value.update(response)
 
         module.exit_json(**return_value)
     except Exception as e:
         error_log.write(str(e))
         error_log.write(str(e.code))
-        return_value = create_return_error(msg=str(e), stdout=str_log.getvalue(), stderr=error_log.getvalue())
+        return_value = create_return_error(msg=str(e), stdout=str_log, stderr=error_log.getvalue(), log_output=module.params['log_output'])
         module.fail_json(**return_value)
 
 
@@ -6,8 +6,6 @@
 
 from __future__ import (absolute_import, division, print_function)
 
-from requests import JSONDecodeError
-
 __metaclass__ = type
 
 DOCUMENTATION = r'''
@@ -17,6 +15,15 @@ short_description: Collect information about the First Steps Setup process.
 description:
   - Collect information about the First Steps Setup process.
 version_added: "1.0.0"
+options:
+  deferred_deploy:
+    description:
+      - When the configuration is changed, register on the connection that the changes must be deployed. The deploy
+        is then run once by a later isva_pending_changes task with I(deferred=true).
+    type: bool
+    default: false
+extends_documentation_fragment:
+  - community.isva.isva
 author:
   - Cédric Servais (@7893254)
 '''
@@ -25,6 +32,12 @@ EXAMPLES = r'''
 - name: Collect ISVA First Steps status
   isva_dsc_config:
     state: gathered
+
+- name: Update the configuration, the deploy is deferred
+  isva_dsc_config:
+    state: replaced
+    dsc: "{{ dsc }}"
+    deferred_deploy: true
 '''
 
 RETURN = r'''
@@ -39,18 +52,21 @@ import logging
 from io import StringIO
 
 from ansible.module_utils.basic import AnsibleModule
-from ansible.module_utils.common.dict_transformations import recursive_diff
+
+from ansible_collections.community.isva.plugins.module_utils.isva_diff import semantic_diff
 
 from ansible_collections.community.isva.plugins.module_utils.isva_dsc_config import (
-    to_api, from_api, from_module, fetch_dsc_configuration, update_dsc_configuration, get_default
+    DIFF_RULES, to_api, from_api, from_module, fetch_dsc_configuration, update_dsc_configuration, get_default
 )
 
+from ansible_collections.community.isva.plugins.module_utils.isva_pending_changes import request_deploy
+
 from ansible_collections.community.isva.plugins.module_utils.isva_utils import (
-    create_return_object, create_return_error, setup_logging, update_logging_info
+    create_return_object, create_return_error, setup_logging, update_logging_info, RingBufferLogHandler
 )
 
 logger = logging.getLogger(__name__)
-str_log = StringIO()
+str_log = RingBufferLogHandler()
 error_log = StringIO()
 
 
@@ -73,7 +89,9 @@ class ArgumentSpec(object):
         )
         argument_spec = dict(
             state=dict(type='str', required=True, choices=['gathered', 'replaced', 'deleted']),
-            dsc=dict(type='dict', required=False, options=dsc_spec)
+            deferred_deploy=dict(type='bool', default=False),
+            dsc=dict(type='dict', required=False, options=dsc_spec),
+            log_output=dict(type='str', default='text', choices=['text', 'lines', 'records'])
         )
         self.argument_spec = {}
         self.argument_spec.update(argument_spec)
@@ -93,7 +111,7 @@ def __exec_replaced(module, **kwargs):
     have = kwargs
     want = from_module(module.params['dsc'])
 
-    diff = recursive_diff(have, want)
+    diff = semantic_diff(have, want, DIFF_RULES)
     if diff:  # Execute only if there were changes
         payload = to_api(want)
 
@@ -112,7 +130,7 @@ def __exec_deleted(module, **kwargs):
     have = kwargs
     want = get_default()
 
-    diff = recursive_diff(have, want)
+    diff = semantic_diff(have, want, DIFF_RULES)
     if diff:  # Execute only if there were changes
         payload = to_api(want)
 
@@ -126,6 +144,11 @@ def __exec_deleted(module, **kwargs):
 
     return {'changed': False}
 
+def __request_deploy(module, response):
+    if response['changed'] and not module.check_mode and module.params['deferred_deploy']:
+        request_deploy(module=module, reason='isva_dsc_config')
+
+
 def exec_module(module):
     state = module.params['state']
 
@@ -135,10 +158,12 @@ def exec_module(module):
     elif state == 'replaced':
         before = __exec_gathered(module=module)
         response = __exec_replaced(module=module, **before)
+        __request_deploy(module=module, response=response)
         return response
     elif state == 'deleted':
         before = __exec_gathered(module=module)
         response = __exec_deleted(module=module, **before)
+        __request_deploy(module=module, response=response)
         return response
 
     return {}
@@ -157,7 +182,7 @@ def main():
 
         response = exec_module(module)
         return_value = create_return_object()
-        update_logging_info(return_value, str_log.getvalue(), error_log.getvalue())
+        update_logging_info(return_value, str_log, error_log.getvalue(), module.params['log_output'])
         return_value.update(response)
 
         module.exit_json(**return_value)
@@ -165,7 +190,7 @@ def main():
         error_log.write(str(e))
         if 'code' in e:
             error_log.write(str(e.code))
-        return_value = create_return_error(msg=str(e), stdout=str_log.getvalue(), stderr=error_log.getvalue())
+        return_value = create_return_error(msg=str(e), stdout=str_log, stderr=error_log.getvalue(), log_output=module.params['log_output'])
         module.fail_json(**return_value)
 
 
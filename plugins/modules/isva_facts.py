@@ -0,0 +1,124 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2022, Cédric Servais <cedric.servais@outlook.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: isva_facts
+short_description: Collect information about the appliance in a single task.
+description:
+  - Collect the facts of the selected subsets, the endpoints are queried concurrently.
+  - The facts are the same as the ones returned by the matching isva_*_facts modules.
+version_added: "1.0.0"
+options:
+  gather_subset:
+    description:
+      - The subsets of facts to collect, C(all) selects every subset and C(!name) excludes one.
+      - Possible values are C(all), C(version), C(license), C(extension), C(fixpack), C(fixpack_fips), C(lmi),
+        C(administrator_setting), C(application_locale), C(activation) and C(advanced_tuning_parameter).
+    type: list
+    elements: str
+    default: ['all']
+  cache:
+    description:
+      - Remember the facts on the controller, in C(~/.ansible/isva/facts.json), and serve them from there while the
+        start time of the LMI and the pending changes count of the appliance are unchanged. The C(lmi) subset is never
+        served from the cache.
+      - The cached facts are dropped when changes are deployed through this collection. A change made by other means
+        is noticed while it is pending, but once deployed without an LMI restart the cached facts are served again,
+        only enable the cache when the appliance is configured with this collection.
+    type: bool
+    default: false
+extends_documentation_fragment:
+  - community.isva.isva
+author:
+  - Cédric Servais (@7893254)
+'''
+
+EXAMPLES = r'''
+- name: Collect all ISVA facts
+  isva_facts:
+
+- name: Collect ISVA facts, cached between playbook runs
+  isva_facts:
+    cache: true
+
+- name: Collect ISVA version and fixpacks facts
+  isva_facts:
+    gather_subset:
+      - version
+      - fixpack
+'''
+
+RETURN = r'''
+ansible_facts:
+  description: The facts of the selected subsets, prefixed by isva_.
+  returned: always
+  type: dict
+'''
+
+import logging
+from io import StringIO
+
+from ansible.module_utils.basic import AnsibleModule
+
+from ansible_collections.community.isva.plugins.module_utils.isva_facts import fetch_facts, resolve_gather_subset
+
+from ansible_collections.community.isva.plugins.module_utils.isva_utils import (
+    create_return_object, create_return_error, setup_logging, update_logging_info, RingBufferLogHandler
+)
+
+logger = logging.getLogger(__name__)
+str_log = RingBufferLogHandler()
+error_log = StringIO()
+
+
+class ArgumentSpec(object):
+    def __init__(self):
+        self.supports_check_mode = True
+        argument_spec = dict(
+            gather_subset=dict(type='list', elements='str', default=['all']),
+            cache=dict(type='bool', default=False),
+            log_level=dict(type='str', default='INFO', choices=['CRITICAL', 'FATAL', 'ERROR', 'WARN', 'WARNING', 'INFO', 'DEBUG', 'NOTSET']),
+            log_output=dict(type='str', default='text', choices=['text', 'lines', 'records'])
+        )
+        self.argument_spec = {}
+        self.argument_spec.update(argument_spec)
+
+
+def exec_module(module):
+    subsets = resolve_gather_subset(module.params['gather_subset'])
+    ansible_facts = fetch_facts(module, subsets, module.params['cache'])
+    return {'ansible_facts': ansible_facts}
+
+
+def main():
+    spec = ArgumentSpec()
+    module = AnsibleModule(
+        argument_spec=spec.argument_spec,
+        supports_check_mode=spec.supports_check_mode
+    )
+    try:
+        setup_logging(str_log, module._verbosity)
+        logger.debug('Module parameters {}'.format(module.params))
+
+        response = exec_module(module)
+        return_value = create_return_object()
+        update_logging_info(return_value, str_log, error_log.getvalue(), module.params['log_output'])
+        return_value.update(response)
+
+        module.exit_json(**return_value)
+    except Exception as e:
+        error_log.write(str(e))
+        return_value = create_return_error(msg=str(e), stdout=str_log, stderr=error_log.getvalue(), log_output=module.params['log_output'])
+        module.fail_json(**return_value)
+
+
+if __name__ == '__main__':
+    main()
@@ -14,7 +14,20 @@ module: isva_shared_volumes_fetch
 short_description: Collect information about the service agreements status of the appliance
 description:
   - Collect service agreements status from IBM ISVA devices.
+  - An interrupted download isn't resumed, unlike with M(community.isva.isva_shared_volumes_fetch). The appliance
+    doesn't return the checksum of the file downloads, a resumed file couldn't be verified, the whole file is
+    downloaded again on the next run.
 version_added: "1.0.0"
+options:
+  parallelism:
+    description:
+      - How many files are downloaded at once.
+      - It's capped by the C(max_concurrent_requests) option of the connection, a larger value downloads
+        C(max_concurrent_requests) files at once.
+    type: int
+    default: 1
+extends_documentation_fragment:
+  - community.isva.isva
 author:
   - Cédric Servais (@7893254)
 '''
@@ -39,14 +52,14 @@ from io import StringIO
 
 from ansible.module_utils.basic import AnsibleModule
 
-from ansible_collections.community.isva.plugins.module_utils.isva_file_downloads import fetch_file_downloads, download_file_downloads
+from ansible_collections.community.isva.plugins.module_utils.isva_file_downloads import fetch_file_downloads, download_file_downloads_batch
 
 from ansible_collections.community.isva.plugins.module_utils.isva_utils import (
-    create_return_object, create_return_error, setup_logging, update_logging_info, convert_filesystem_to_dict
+    create_return_object, create_return_error, setup_logging, update_logging_info, FilesystemIndex, RingBufferLogHandler
 )
 
 logger = logging.getLogger(__name__)
-str_log = StringIO()
+str_log = RingBufferLogHandler()
 error_log = StringIO()
 
 
@@ -61,7 +74,10 @@ class ArgumentSpec(object):
             files=dict(type='list', required=False, elements='dict', options=file_spec),
             path=dict(type='str', required=False),
             dest=dict(type='str', required=False),
-            log_level=dict(type='str', default='INFO', choices=['CRITICAL', 'FATAL', 'ERROR', 'WARN', 'WARNING', 'INFO', 'DEBUG', 'NOTSET'])
+            parallelism=dict(type='int', default=1),
+            compare=dict(type='str', default='checksum', choices=['checksum', 'metadata']),
+            log_level=dict(type='str', default='INFO', choices=['CRITICAL', 'FATAL', 'ERROR', 'WARN', 'WARNING', 'INFO', 'DEBUG', 'NOTSET']),
+            log_output=dict(type='str', default='text', choices=['text', 'lines', 'records'])
         )
         self.argument_spec = {}
         self.argument_spec.update(argument_spec)
@@ -77,18 +93,17 @@ class ArgumentSpec(object):
 
 def exec_module(module):
     check_mode = module.check_mode  # We download files also in checkmode.
-    remote_files = convert_filesystem_to_dict(fetch_file_downloads(module))
+    remote_files = FilesystemIndex(fetch_file_downloads(module))
     files = module.params.get('files') or [{'path': module.params['path'], 'dest': module.params['dest']}]
     changed = False
     diff = {
         'before': [],
         'after': []
     }
-    for f in files:
-        path = f['path']
+    results = download_file_downloads_batch(module, files, remote_files, module.params['parallelism'], module.params['compare'])
+    for f, result in zip(files, results):
         dest = f['dest']
 
-        result = download_file_downloads(module, path, dest, remote_files)
         if result:
             diff['before'].append({'path': dest, 'state': 'absent'})
         else:
@@ -114,13 +129,13 @@ def main():
 
         response = exec_module(module)
         return_value = create_return_object()
-        update_logging_info(return_value, str_log.getvalue(), error_log.getvalue())
+        update_logging_info(return_value, str_log, error_log.getvalue(), module.params['log_output'])
         return_value.update(response)
 
         module.exit_json(**return_value)
     except Exception as e:
         error_log.write(str(e))
-        return_value = create_return_error(msg=str(e), stdout=str_log.getvalue(), stderr=error_log.getvalue())
+        return_value = create_return_error(msg=str(e), stdout=str_log, stderr=error_log.getvalue(), log_output=module.params['log_output'])
         module.fail_json(**return_value)
 
 
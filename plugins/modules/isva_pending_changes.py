@@ -15,6 +15,38 @@ short_description: Collect information about the First Steps Setup process.
 description:
   - Collect information about the First Steps Setup process.
 version_added: "1.0.0"
+options:
+  deferred:
+    description:
+      - With I(state=deployed), deploy the changes left pending by the config modules run with I(deferred_deploy=true)
+        and report the deferred deploys they registered on the connection.
+      - All the deferred deploys are coalesced into this one. Whether to deploy is decided by the pending changes
+        count of the appliance, the registered deploys are lost when the persistent connection is closed after
+        I(persistent_connect_timeout) seconds idle.
+      - The registered deploys are forgotten once the changes have been deployed.
+    type: bool
+    default: false
+  wait:
+    description:
+      - With I(state=deployed), once changes have been deployed, wait until there are no changes left to deploy and
+        the LMI answers. See also the isva_deploy_wait module.
+    type: bool
+    default: false
+  wait_for_restart:
+    description:
+      - With I(wait), also wait until the LMI has restarted, i.e. until it answers with another start time than
+        before the deploy.
+      - Only set it when the deployed changes restart the LMI, most changes (e.g. policies, runtime or reverse proxy
+        configuration) don't and the task would then fail after I(wait_timeout) seconds.
+    type: bool
+    default: false
+  wait_timeout:
+    description:
+      - How many seconds to wait, the task fails when the appliance still isn't ready by then.
+    type: int
+    default: 600
+extends_documentation_fragment:
+  - community.isva.isva
 author:
   - Cédric Servais (@7893254)
 '''
@@ -23,6 +55,22 @@ EXAMPLES = r'''
 - name: Collect ISVA First Steps status
   isva_pending_changes:
     state: gathered
+
+- name: Configure the DSC and the database, deploying the changes once
+  block:
+    - isva_dsc_config:
+        state: replaced
+        dsc: "{{ dsc }}"
+        deferred_deploy: true
+    - isva_database_config:
+        state: replaced
+        hvdb: "{{ hvdb }}"
+        deferred_deploy: true
+  always:
+    - isva_pending_changes:
+        state: deployed
+        deferred: true
+        wait: true
 '''
 
 RETURN = r'''
@@ -39,14 +87,17 @@ from io import StringIO
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.connection import ConnectionError
 
-from ansible_collections.community.isva.plugins.module_utils.isva_pending_changes import fetch_pending_changes, deploy_changes, rollback_changes
+from ansible_collections.community.isva.plugins.module_utils.isva_pending_changes import (
+    fetch_pending_changes, count_pending_changes, deploy_changes, rollback_changes, fetch_deploy_requests,
+    forget_deploy_requests, fetch_start_time, wait_for_deploy
+)
 
 from ansible_collections.community.isva.plugins.module_utils.isva_utils import (
-    create_return_object, create_return_error, setup_logging, update_logging_info
+    create_return_object, create_return_error, setup_logging, update_logging_info, RingBufferLogHandler
 )
 
 logger = logging.getLogger(__name__)
-str_log = StringIO()
+str_log = RingBufferLogHandler()
 error_log = StringIO()
 
 
@@ -55,7 +106,12 @@ class ArgumentSpec(object):
         self.supports_check_mode = True
         argument_spec = dict(
             state=dict(type='str', required=True, choices=['gathered', 'deployed', 'rollbacked']),
-            log_level=dict(type='str', default='INFO', choices=['CRITICAL', 'FATAL', 'ERROR', 'WARN', 'WARNING', 'INFO', 'DEBUG', 'NOTSET'])
+            deferred=dict(type='bool', default=False),
+            wait=dict(type='bool', default=False),
+            wait_for_restart=dict(type='bool', default=False),
+            wait_timeout=dict(type='int', default=600),
+            log_level=dict(type='str', default='INFO', choices=['CRITICAL', 'FATAL', 'ERROR', 'WARN', 'WARNING', 'INFO', 'DEBUG', 'NOTSET']),
+            log_output=dict(type='str', default='text', choices=['text', 'lines', 'records'])
         )
         self.argument_spec = {}
         self.argument_spec.update(argument_spec)
@@ -66,6 +122,17 @@ def __exec_gathered(module):
     return response
 
 
+def __exec_before(module):
+    # The count is a much smaller response than the list of changes, which is only needed when there is something to
+    # deploy or rollback, or when a diff has been requested.
+    response = count_pending_changes(module=module)
+    if response.get('count') or module._diff:
+        return __exec_gathered(module=module)
+
+    logger.debug('There are no pending changes')
+    return {'changes': []}
+
+
 def __exec_deployed(module, **kwargs):
     check_mode = module.check_mode
     before = kwargs.pop('changes', [])
@@ -73,12 +140,26 @@ def __exec_deployed(module, **kwargs):
         if check_mode:
             return {'changed': True, 'after': {'changes': []}}
 
+        if module.params['wait']:
+            # The start time of the LMI only changes when the deployed changes restart it.
+            start_time = fetch_start_time(module=module) if module.params['wait_for_restart'] else None
+            deploy_changes(module=module)
+            waited = wait_for_deploy(module=module, timeout=module.params['wait_timeout'], start_time=start_time)
+            return {'changed': True, 'after': {'changes': []}, 'waited': waited}
+
         deploy_changes(module=module)
         return {'changed': True, 'after': {'changes': []}}
 
     return {'changed': False, 'after': {'changes': []}}
 
 
+def __deployed_result(response, before):
+    result = {'changed': response['changed'], 'diff': {'before': before, 'after': response['after']}}
+    if 'waited' in response:
+        result['waited'] = response['waited']
+    return result
+
+
 def __exec_rollbacked(module, **kwargs):
     check_mode = module.check_mode
     before = kwargs
@@ -98,12 +179,19 @@ def exec_module(module):
     if state == 'gathered':
         response = __exec_gathered(module=module)
         return {'gathered': response}
+    elif state == 'deployed' and module.params['deferred']:
+        requests = fetch_deploy_requests(module=module)
+        before = __exec_before(module=module)
+        response = __exec_deployed(module=module, **before)
+        if not module.check_mode:  # The changes are deployed, or there were none left to deploy.
+            forget_deploy_requests(module=module, requests=requests)
+        return dict(__deployed_result(response, before), deploy_requests=requests)
     elif state == 'deployed':
-        before = __exec_gathered(module=module)
+        before = __exec_before(module=module)
         response = __exec_deployed(module=module, **before)
-        return {'changed': response['changed'], 'diff': {'before': before, 'after': response['after']}}
+        return __deployed_result(response, before)
     elif state == 'rollbacked':
-        before = __exec_gathered(module=module)
+        before = __exec_before(module=module)
         response = __exec_rollbacked(module=module, **before)
         return {'changed': response['changed'], 'diff': {'before': before, 'after': response['after']}}
 
@@ -122,19 +210,19 @@ def main():
 
         response = exec_module(module)
         return_value = create_return_object()
-        update_logging_info(return_value, str_log.getvalue(), error_log.getvalue())
+        update_logging_info(return_value, str_log, error_log.getvalue(), module.params['log_output'])
         return_value.update(response)
 
         module.exit_json(**return_value)
     except ConnectionError as e:
         error_log.write(str(e))
-        return_value = create_return_error(msg=str(e), stdout=str_log.getvalue(), stderr=error_log.getvalue())
+        return_value = create_return_error(msg=str(e), stdout=str_log, stderr=error_log.getvalue(), log_output=module.params['log_output'])
         module.fail_json(**return_value)
     except Exception as e:
         error_log.write(str(e))
         if 'code' in e:
             error_log.write(str(e.code))
-        return_value = create_return_error(msg=str(e), stdout=str_log.getvalue(), stderr=error_log.getvalue())
+        return_value = create_return_error(msg=str(e), stdout=str_log, stderr=error_log.getvalue(), log_output=module.params['log_output'])
         module.fail_json(**return_value)
 
 
@@ -15,6 +15,8 @@ short_description: Collect information about the service agreements status of th
 description:
   - Collect service agreements status from IBM ISVA devices.
 version_added: "1.0.0"
+extends_documentation_fragment:
+  - community.isva.isva
 author:
   - Cédric Servais (@7893254)
 '''
@@ -42,11 +44,11 @@ from ansible.module_utils.basic import AnsibleModule
 from ansible_collections.community.isva.plugins.module_utils.isva_service_agreements import accept_service_agreements, fetch_service_agreements
 
 from ansible_collections.community.isva.plugins.module_utils.isva_utils import (
-    create_return_object, create_return_error, setup_logging, update_logging_info
+    create_return_object, create_return_error, setup_logging, update_logging_info, RingBufferLogHandler
 )
 
 logger = logging.getLogger(__name__)
-str_log = StringIO()
+str_log = RingBufferLogHandler()
 error_log = StringIO()
 
 
@@ -56,7 +58,8 @@ class ArgumentSpec(object):
         argument_spec = dict(
             state=dict(type='str', required=True, choices=['replaced']),
             accepted=dict(type='bool', required=True, choices=[True]),
-            log_level=dict(type='str', default='INFO', choices=['CRITICAL', 'FATAL', 'ERROR', 'WARN', 'WARNING', 'INFO', 'DEBUG', 'NOTSET'])
+            log_level=dict(type='str', default='INFO', choices=['CRITICAL', 'FATAL', 'ERROR', 'WARN', 'WARNING', 'INFO', 'DEBUG', 'NOTSET']),
+            log_output=dict(type='str', default='text', choices=['text', 'lines', 'records'])
         )
         self.argument_spec = {}
         self.argument_spec.update(argument_spec)
@@ -70,7 +73,7 @@ def __exec_replaced(module, **kwargs):
         if check_mode:
             return {'changed': True, 'after': {'accepted': True}}
 
-        response = accept_service_agreements(accepted=accepted)
+        response = accept_service_agreements(module=module, accepted=accepted)
         return {'changed': True, 'after': response}
 
     return {'changed': False, 'after': {'accepted': True}}
@@ -99,14 +102,14 @@ def main():
 
         response = exec_module(module)
         return_value = create_return_object()
-        update_logging_info(return_value, str_log.getvalue(), error_log.getvalue())
+        update_logging_info(return_value, str_log, error_log.getvalue(), module.params['log_output'])
         return_value.update(response)
 
         module.exit_json(**return_value)
     except Exception as e:
         error_log.write(str(e))
         error_log.write(str(e.code))
-        return_value = create_return_error(msg=str(e), stdout=str_log.getvalue(), stderr=error_log.getvalue())
+        return_value = create_return_error(msg=str(e), stdout=str_log, stderr=error_log.getvalue(), log_output=module.params['log_output'])
         module.fail_json(**return_value)
 
 
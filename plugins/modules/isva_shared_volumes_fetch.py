@@ -15,6 +15,16 @@ short_description: Collect information about the service agreements status of th
 description:
   - Collect service agreements status from IBM ISVA devices.
 version_added: "1.0.0"
+options:
+  parallelism:
+    description:
+      - How many files are downloaded at once.
+      - It's capped by the C(max_concurrent_requests) option of the connection, a larger value downloads
+        C(max_concurrent_requests) files at once.
+    type: int
+    default: 1
+extends_documentation_fragment:
+  - community.isva.isva
 author:
   - Cédric Servais (@7893254)
 '''
@@ -39,14 +49,14 @@ from io import StringIO
 
 from ansible.module_utils.basic import AnsibleModule
 
-from ansible_collections.community.isva.plugins.module_utils.isva_shared_volumes import fetch_shared_volumes, download_shared_volumes
+from ansible_collections.community.isva.plugins.module_utils.isva_shared_volumes import fetch_shared_volumes_index, download_shared_volumes_batch
 
 from ansible_collections.community.isva.plugins.module_utils.isva_utils import (
-    create_return_object, create_return_error, setup_logging, update_logging_info, convert_filesystem_to_dict
+    create_return_object, create_return_error, setup_logging, update_logging_info, RingBufferLogHandler
 )
 
 logger = logging.getLogger(__name__)
-str_log = StringIO()
+str_log = RingBufferLogHandler()
 error_log = StringIO()
 
 
@@ -63,7 +73,9 @@ class ArgumentSpec(object):
             path=dict(type='str', required=False, choices=['fixpacks', 'snapshots', 'support']),
             name=dict(type='str', required=False),
             dest=dict(type='str', required=False),
-            log_level=dict(type='str', default='INFO', choices=['CRITICAL', 'FATAL', 'ERROR', 'WARN', 'WARNING', 'INFO', 'DEBUG', 'NOTSET'])
+            parallelism=dict(type='int', default=1),
+            log_level=dict(type='str', default='INFO', choices=['CRITICAL', 'FATAL', 'ERROR', 'WARN', 'WARNING', 'INFO', 'DEBUG', 'NOTSET']),
+            log_output=dict(type='str', default='text', choices=['text', 'lines', 'records'])
         )
         self.argument_spec = {}
         self.argument_spec.update(argument_spec)
@@ -81,19 +93,17 @@ class ArgumentSpec(object):
 
 def exec_module(module):
     check_mode = module.check_mode  # We download files also in checkmode.
-    remote_files = convert_filesystem_to_dict(fetch_shared_volumes(module))
     files = module.params.get('files') or [{'path': module.params['path'], 'name': module.params['name'], 'dest': module.params['dest']}]
+    remote_files = fetch_shared_volumes_index(module, [f['path'] for f in files])
     changed = False
     diff = {
         'before': [],
         'after': []
     }
-    for f in files:
-        path = f['path']
-        volume = f['name']
+    results = download_shared_volumes_batch(module, files, remote_files, module.params['parallelism'])
+    for f, result in zip(files, results):
         dest = f['dest']
 
-        result = download_shared_volumes(module, path, volume, dest, remote_files)
         if result:
             diff['before'].append({'path': dest, 'state': 'absent'})
         else:
@@ -119,13 +129,13 @@ def main():
 
         response = exec_module(module)
         return_value = create_return_object()
-        update_logging_info(return_value, str_log.getvalue(), error_log.getvalue())
+        update_logging_info(return_value, str_log, error_log.getvalue(), module.params['log_output'])
         return_value.update(response)
 
         module.exit_json(**return_value)
     except Exception as e:
         error_log.write(str(e))
-        return_value = create_return_error(msg=str(e), stdout=str_log.getvalue(), stderr=error_log.getvalue())
+        return_value = create_return_error(msg=str(e), stdout=str_log, stderr=error_log.getvalue(), log_output=module.params['log_output'])
         module.fail_json(**return_value)
 
 
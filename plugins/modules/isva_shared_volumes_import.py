@@ -15,6 +15,8 @@ short_description: Collect information about the service agreements status of th
 description:
   - Collect service agreements status from IBM ISVA devices.
 version_added: "1.0.0"
+extends_documentation_fragment:
+  - community.isva.isva
 author:
   - Cédric Servais (@7893254)
 '''
@@ -35,18 +37,19 @@ gathered:
 '''
 
 import logging
+import os
 from io import StringIO
 
 from ansible.module_utils.basic import AnsibleModule
 
-from ansible_collections.community.isva.plugins.module_utils.isva_shared_volumes import fetch_shared_volumes, upload_shared_volumes
+from ansible_collections.community.isva.plugins.module_utils.isva_shared_volumes import fetch_shared_volumes_index, upload_shared_volumes
 
 from ansible_collections.community.isva.plugins.module_utils.isva_utils import (
-    create_return_object, create_return_error, setup_logging, update_logging_info, convert_filesystem_to_dict
+    create_return_object, create_return_error, setup_logging, update_logging_info, RingBufferLogHandler
 )
 
 logger = logging.getLogger(__name__)
-str_log = StringIO()
+str_log = RingBufferLogHandler()
 error_log = StringIO()
 
 
@@ -65,7 +68,8 @@ class ArgumentSpec(object):
             name=dict(type='str', required=False),
             src=dict(type='str', required=False),
             overwrite=dict(type='bool', default=False),
-            log_level=dict(type='str', default='INFO', choices=['CRITICAL', 'FATAL', 'ERROR', 'WARN', 'WARNING', 'INFO', 'DEBUG', 'NOTSET'])
+            log_level=dict(type='str', default='INFO', choices=['CRITICAL', 'FATAL', 'ERROR', 'WARN', 'WARNING', 'INFO', 'DEBUG', 'NOTSET']),
+            log_output=dict(type='str', default='text', choices=['text', 'lines', 'records'])
         )
         self.argument_spec = {}
         self.argument_spec.update(argument_spec)
@@ -81,8 +85,8 @@ class ArgumentSpec(object):
 
 def exec_module(module):
     check_mode = module.check_mode  # We donwload files also in checkmode.
-    remote_files = convert_filesystem_to_dict(fetch_shared_volumes(module))
     files = module.params.get('files') or [{'path': module.params['path'], 'name': module.params['name'], 'src': module.params['src'], 'overwrite': module.params['overwrite']}]
+    remote_files = fetch_shared_volumes_index(module, [f['path'] for f in files])
     diff = {
         'before': [],
         'after': []
@@ -90,8 +94,8 @@ def exec_module(module):
     changed = False
     for f in files:
         path = f['path']
-        volume = f['name']
         src = f['src']
+        volume = f['name'] or os.path.basename(src)
         overwrite = f['overwrite']
 
         result = upload_shared_volumes(module, path, volume, src, overwrite, remote_files, check_mode)
@@ -100,9 +104,10 @@ def exec_module(module):
         else:
             diff['before'].append({'path': '{}/{}'.format(path, volume), 'state': 'file'})
 
+        diff['after'].append({'path': '{}/{}'.format(path, volume), 'state': 'file'})
         changed = changed or result
 
-    return {'changed': changed}
+    return {'changed': changed, 'diff': diff}
 
 
 def main():
@@ -119,13 +124,13 @@ def main():
 
         response = exec_module(module)
         return_value = create_return_object()
-        update_logging_info(return_value, str_log.getvalue(), error_log.getvalue())
+        update_logging_info(return_value, str_log, error_log.getvalue(), module.params['log_output'])
         return_value.update(response)
 
         module.exit_json(**return_value)
     except Exception as e:
         error_log.write(str(e))
-        return_value = create_return_error(msg=str(e), stdout=str_log.getvalue(), stderr=error_log.getvalue())
+        return_value = create_return_error(msg=str(e), stdout=str_log, stderr=error_log.getvalue(), log_output=module.params['log_output'])
         module.fail_json(**return_value)
 
 
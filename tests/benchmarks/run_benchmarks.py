@@ -0,0 +1,420 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2022, Cédric Servais <cedric.servais@outlook.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+""" Benchmarks of the modules and of the hot paths of the module_utils, run against the mocked appliance of
+tests/utils/mock_appliance.py.
+
+Each benchmark runs in its own process, so that its peak RSS isn't inflated by the previous ones, and reports:
+  - wall_time: the min, median and max duration of a run, in seconds,
+  - requests: the number of HTTP requests received by the mocked appliance during a run,
+  - calls: the number of calls made to the httpapi plugin during a run,
+  - peak_rss_kb and rss_delta_kb: the peak resident memory of the process and its growth during the runs.
+
+The results are written as JSON, compare them to the ones of a previous release with --compare:
+
+    PYTHONPATH=<dir holding ansible_collections> python tests/benchmarks/run_benchmarks.py --output results.json
+    PYTHONPATH=<dir holding ansible_collections> python tests/benchmarks/run_benchmarks.py --compare results.json
+"""
+
+from __future__ import (absolute_import, division, print_function)
+
+__metaclass__ = type
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from unittest.mock import patch
+
+import yaml
+
+from ansible.module_utils.ansible_release import __version__ as ansible_version
+from ansible.module_utils.six.moves.urllib.request import urlopen, Request
+
+from ansible_collections.community.isva.plugins.module_utils.isva_utils import convert_filesystem_to_dict, FilesystemIndex
+from ansible_collections.community.isva.tests.utils.mock_appliance import connect
+from ansible_collections.community.isva.tests.utils.module_runner import RecordingConnection, run_module
+
+COLLECTION_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+MOCK_APPLIANCE = os.path.join(COLLECTION_DIR, 'tests', 'utils', 'mock_appliance.py')
+RESULTS_VERSION = 1
+MIB = 1024 * 1024
+
+# The files written by the modules on the controller are redirected to the temporary directory of the benchmark.
+LOCAL_STATE_FILES = [
+    'ansible_collections.community.isva.plugins.module_utils.isva_utils.DIGEST_CACHE_FILE',
+    'ansible_collections.community.isva.plugins.module_utils.isva_utils.FACTS_CACHE_FILE',
+    'ansible_collections.community.isva.plugins.module_utils.isva_docker_publish.PUBLISH_STATE_FILE',
+]
+
+DSC = {
+    'worker_threads': 32, 'max_session_lifetime': 7200, 'client_grace': 300, 'connection_idle_timeout': 0,
+    'service_port': 443, 'replication_port': 444,
+    'servers': [{'ip': '10.0.0.{}'.format(i), 'service_port': 443, 'replication_port': 444} for i in range(1, 4)]
+}
+
+HVDB = {
+    'db_type': 'postgresql', 'address': 'db.example.com', 'port': 5432, 'user': 'isva', 'password': 'secret',
+    'db_name': 'isva', 'secure': True,
+    'failover_servers': [{'address': 'db{}.example.com'.format(i), 'port': 5432, 'order': i} for i in range(1, 3)]
+}
+
+FILE_COUNT = 4
+FILESYSTEM_LOOKUPS = 16
+
+FACTS_MODULES = [
+    'isva_activation_facts', 'isva_administrator_setting_facts', 'isva_advanced_tuning_parameter_facts',
+    'isva_application_locale_facts', 'isva_extension_facts', 'isva_first_step_facts', 'isva_fixpack_facts',
+    'isva_fixpack_fips_facts', 'isva_license_facts', 'isva_lmi_facts', 'isva_service_agreement_facts',
+    'isva_version_facts'
+]
+
+
+def _files(template, **kwargs):
+    return [dict((key, value.format(i=i, **kwargs)) for key, value in template.items()) for i in range(FILE_COUNT)]
+
+
+# Each case is (module, state, args, setup), the setup runs before every run and isn't measured. The args may refer
+# to the temporary directory of the benchmark as {tmpdir}. The first steps settings can't be turned off, the runs
+# after the first one don't change them.
+MODULE_CASES = [
+    ('isva_facts', 'gathered', {}, None),
+    ('isva_facts', 'gathered_cached', {'cache': True}, 'converge'),
+    ('isva_service_agreements', 'replaced_unchanged', {'state': 'replaced', 'accepted': True}, 'converge'),
+    ('isva_setup_complete', 'replaced_unchanged', {'state': 'replaced', 'configured': True}, 'converge'),
+    ('isva_docker_stop', 'stopped', {'state': 'stopped'}, None),
+    ('isva_pending_changes', 'gathered', {'state': 'gathered'}, None),
+    ('isva_pending_changes', 'deployed', {'state': 'deployed'}, 'add_pending_change'),
+    ('isva_deploy_wait', 'ready', {}, None),
+    ('isva_dsc_config', 'gathered', {'state': 'gathered'}, None),
+    ('isva_dsc_config', 'replaced', {'state': 'replaced', 'dsc': DSC}, 'reset_dsc_config'),
+    ('isva_dsc_config', 'replaced_unchanged', {'state': 'replaced', 'dsc': DSC}, 'converge'),
+    ('isva_database_config', 'gathered', {'state': 'gathered'}, None),
+    ('isva_database_config', 'replaced', {'state': 'replaced', 'hvdb': HVDB}, 'reset_cluster_config'),
+    ('isva_database_config', 'replaced_unchanged', {'state': 'replaced', 'hvdb': HVDB}, 'converge'),
+    ('isva_docker_publish', 'published', {'state': 'published', 'force': True}, None),
+    ('isva_docker_publish', 'published_unchanged', {'state': 'published', 'fingerprint': 'v1'}, 'converge'),
+    ('isva_shared_volumes_fetch', 'fetch',
+     {'files': _files({'path': 'fixpacks', 'name': 'fixpack_{i}.fixpack', 'dest': '{tmpdir}/fixpack_{i}.fixpack'}, tmpdir='{tmpdir}'),
+      'parallelism': FILE_COUNT}, 'clean_tmpdir'),
+    ('isva_shared_volumes_fetch', 'fetch_unchanged',
+     {'files': _files({'path': 'fixpacks', 'name': 'fixpack_{i}.fixpack', 'dest': '{tmpdir}/fixpack_{i}.fixpack'}, tmpdir='{tmpdir}'),
+      'parallelism': FILE_COUNT}, 'converge'),
+    ('isva_shared_volumes_import', 'import',
+     {'files': _files({'path': 'support', 'src': '{tmpdir}/support_{i}.zip'}, tmpdir='{tmpdir}')}, 'prepare_import'),
+    ('isva_file_downloads_fetch', 'fetch',
+     {'files': _files({'path': 'isam/downloads_{i}.zip', 'dest': '{tmpdir}/downloads_{i}.zip'}, tmpdir='{tmpdir}'),
+      'parallelism': FILE_COUNT}, 'clean_tmpdir'),
+    ('isva_file_downloads_fetch', 'fetch_unchanged',
+     {'files': _files({'path': 'isam/downloads_{i}.zip', 'dest': '{tmpdir}/downloads_{i}.zip'}, tmpdir='{tmpdir}'),
+      'parallelism': FILE_COUNT, 'compare': 'metadata'}, 'converge'),
+] + [(module, 'gathered', {}, None) for module in FACTS_MODULES]
+
+
+class RemoteAppliance(object):
+    """ A mocked appliance served by another process, so that its memory isn't accounted to the benchmarks.
+    """
+
+    def __init__(self, *options):
+        self.process = subprocess.Popen([sys.executable, MOCK_APPLIANCE, '--port', '0'] + list(options),
+                                        stdout=subprocess.PIPE, universal_newlines=True)
+        self.url = self.process.stdout.readline().split()[-1]
+        self.host, port = self.url.split('//')[1].split(':')
+        self.port = int(port)
+
+    def __getstate__(self):  # Only the address is handed to the benchmark processes.
+        return {'url': self.url, 'host': self.host, 'port': self.port}
+
+    def stats(self):
+        return json.loads(urlopen(self.url + '/__mock__/stats').read())
+
+    def reset_stats(self):
+        urlopen(Request(self.url + '/__mock__/reset', data=b'', method='POST')).read()
+
+    def stop(self):
+        self.process.terminate()
+        self.process.wait()
+
+
+def _rss_kb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def _summary(name, times, rss_before, **extra):
+    result = {
+        'name': name,
+        'wall_time': {'min': min(times), 'median': statistics.median(times), 'max': max(times)},
+        'peak_rss_kb': _rss_kb(),
+        'rss_delta_kb': _rss_kb() - rss_before,
+    }
+    result.update(extra)
+    return result
+
+
+def _format(value, tmpdir):
+    if isinstance(value, dict):
+        return dict((key, _format(item, tmpdir)) for key, item in value.items())
+    if isinstance(value, list):
+        return [_format(item, tmpdir) for item in value]
+    if isinstance(value, str):
+        return value.replace('{tmpdir}', tmpdir)
+    return value
+
+
+def setup_add_pending_change(plugin, tmpdir, module, args):
+    plugin.send_request('/isam/dsc/config', method='PUT', payload=json.dumps({'worker_threads': 64}))
+
+
+def setup_reset_dsc_config(plugin, tmpdir, module, args):
+    plugin.send_request('/isam/dsc/config', method='PUT', payload=json.dumps({'worker_threads': 64, 'servers': []}))
+
+
+def setup_reset_cluster_config(plugin, tmpdir, module, args):
+    plugin.send_request('/isam/cluster/v2', method='PUT', payload=json.dumps({'hvdb_address': '', 'hvdb_failover_servers': []}))
+
+
+def setup_converge(plugin, tmpdir, module, args):
+    run_module(module, args, plugin, tmpdir=tmpdir)
+
+
+def setup_clean_tmpdir(plugin, tmpdir, module, args):
+    for name in os.listdir(tmpdir):
+        if not name.endswith('.json'):
+            os.remove(os.path.join(tmpdir, name))
+
+
+def setup_prepare_import(plugin, tmpdir, module, args):
+    for f in args['files']:
+        if not os.path.exists(f['src']):
+            with open(f['src'], 'wb') as src:
+                src.write(os.urandom(MIB))
+        plugin.send_request('/shared_volume/support/{}'.format(os.path.basename(f['src'])), method='DELETE')
+
+
+def bench_module(appliance, module, state, args, setup, repeat):
+    tmpdir = tempfile.mkdtemp(prefix='isva_bench_')
+    try:
+        with ExitStack() as stack:
+            for target in LOCAL_STATE_FILES:
+                stack.enter_context(patch(target, os.path.join(tmpdir, '{}.json'.format(target.rsplit('.', 1)[-1].lower()))))
+
+            plugin = connect(appliance)
+            connection = RecordingConnection(plugin)
+            args = _format(args, tmpdir)
+            setup_function = globals()['setup_{}'.format(setup)] if setup else None
+            rss_before = _rss_kb()
+
+            times, requests, calls = [], [], []
+            for _ in range(repeat):
+                if setup_function:
+                    setup_function(plugin, tmpdir, module, args)
+                appliance.reset_stats()
+                connection.reset()
+                start = time.perf_counter()
+                run_module(module, args, connection, tmpdir=tmpdir)
+                times.append(time.perf_counter() - start)
+                requests.append(appliance.stats()['total'])
+                calls.append(len(connection.calls))
+
+            return _summary('modules/{}/{}'.format(module, state), times, rss_before, requests=max(requests), calls=max(calls))
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def synthetic_tree(size, fanout=100):
+    """ Build a listing of the shared volume or of the file downloads holding size entries, the directories hold
+    fanout entries each.
+    """
+    def build(count, depth):
+        if count <= fanout:
+            return [{'name': 'file_{}'.format(i), 'type': 'File', 'size': 1024, 'modified': '2022-06-01T22:02:52Z',
+                     'sha256': '0' * 64} for i in range(count)]
+        per_child = -(-(count - fanout) // fanout)  # Each child directory is an entry on its own.
+        children = []
+        remaining = count
+        for i in range(fanout):
+            if remaining <= 0:
+                break
+            child_count = min(per_child, remaining - 1)
+            children.append({'name': 'dir_{}_{}'.format(depth, i), 'type': 'Directory',
+                             'children': build(child_count, depth + 1) if child_count else []})
+            remaining -= child_count + 1
+        return children
+
+    return build(size, 0)
+
+
+def _sample_file_paths(tree, count):
+    """ Return count paths of files spread over the tree, like the files requested by a fetch task.
+    """
+    paths = []
+    stack = [('', entry) for entry in tree]
+    while stack:
+        parent, entry = stack.pop()
+        path = '{}/{}'.format(parent, entry['name']) if parent else entry['name']
+        if entry['type'] == 'File':
+            paths.append(path)
+        else:
+            stack.extend((path, child) for child in entry['children'])
+    return paths[::max(len(paths) // count, 1)][:count]
+
+
+def _lookup_nested(nested, path):
+    for name in path.split('/'):
+        nested = nested[name]
+    return nested
+
+
+def bench_filesystem(size, implementation, repeat, lookups=FILESYSTEM_LOOKUPS):
+    """ Index a listing of size entries then look up lookups files in it, the way the fetch modules use it.
+    """
+    tree = synthetic_tree(size)
+    paths = _sample_file_paths(tree, lookups)
+    rss_before = _rss_kb()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        if implementation == 'convert_filesystem_to_dict':
+            nested = convert_filesystem_to_dict(tree)
+            entries = [_lookup_nested(nested, path) for path in paths]
+        else:
+            index = FilesystemIndex(tree)
+            entries = [index.get(path) for path in paths]
+        times.append(time.perf_counter() - start)
+        assert all(entry['type'] == 'File' for entry in entries)
+    return _summary('module_utils/{}/{}'.format(implementation, size), times, rss_before, entries=size, lookups=len(paths))
+
+
+def bench_download(appliance, size, repeat):
+    tmpdir = tempfile.mkdtemp(prefix='isva_bench_')
+    try:
+        plugin = connect(appliance)
+        dest = os.path.join(tmpdir, 'downloads_0.zip')
+        rss_before = _rss_kb()
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = plugin.download_file('/isam/downloads/isam/downloads_0.zip', dest, headers={})
+            times.append(time.perf_counter() - start)
+            assert response['size'] == size
+        result = _summary('httpapi/download_file/{}'.format(size), times, rss_before, size=size)
+        result['throughput_mib_s'] = size / MIB / result['wall_time']['median']
+        return result
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def _isolated(function, *args):
+    """ Run a benchmark in a new process, its peak RSS is then its own.
+    """
+    context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn')
+    with context.Pool(1) as pool:
+        return pool.apply(function, args)
+
+
+def run(args):
+    results = []
+    if 'modules' in args.suites:
+        appliance = RemoteAppliance('--latency', str(args.latency), '--files', str(FILE_COUNT), '--file-size', str(MIB))
+        try:
+            for module, state, module_args, setup in MODULE_CASES:
+                results.append(_isolated(bench_module, appliance, module, state, module_args, setup, args.repeat))
+                print('{name}: {wall_time[median]:.4f}s, {requests} requests'.format(**results[-1]))
+        finally:
+            appliance.stop()
+
+    if 'filesystem' in args.suites:
+        for size in args.tree_sizes:
+            for implementation in ('convert_filesystem_to_dict', 'FilesystemIndex'):
+                results.append(_isolated(bench_filesystem, size, implementation, args.repeat))
+                print('{name}: {wall_time[median]:.4f}s, peak RSS {peak_rss_kb} KiB'.format(**results[-1]))
+
+    if 'download' in args.suites:
+        for size in args.file_sizes:
+            appliance = RemoteAppliance('--latency', str(args.latency), '--files', '1', '--file-size', str(size))
+            try:
+                results.append(_isolated(bench_download, appliance, size, args.repeat))
+                print('{name}: {throughput_mib_s:.1f} MiB/s'.format(**results[-1]))
+            finally:
+                appliance.stop()
+
+    with open(os.path.join(COLLECTION_DIR, 'galaxy.yml')) as f:
+        collection_version = yaml.safe_load(f)['version']
+
+    return {
+        'version': RESULTS_VERSION,
+        'collection_version': collection_version,
+        'ansible_version': ansible_version,
+        'python_version': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'settings': {'repeat': args.repeat, 'latency': args.latency},
+        'results': results
+    }
+
+
+def compare(baseline, current, threshold):
+    """ Print the results next to the baseline ones and return the names of the benchmarks which regressed, i.e.
+    whose median wall time grew by more than threshold or which send more requests.
+    """
+    previous = dict((result['name'], result) for result in baseline['results'])
+    regressions = []
+    print('{:<60} {:>12} {:>12} {:>8} {:>10}'.format('benchmark', 'baseline', 'current', 'ratio', 'requests'))
+    for result in current['results']:
+        before = previous.get(result['name'])
+        if not before:
+            continue
+        ratio = result['wall_time']['median'] / max(before['wall_time']['median'], 1e-9)
+        requests = '{}->{}'.format(before.get('requests', '-'), result.get('requests', '-'))
+        print('{:<60} {:>12.4f} {:>12.4f} {:>8.2f} {:>10}'.format(result['name'], before['wall_time']['median'],
+                                                               result['wall_time']['median'], ratio, requests))
+        if ratio > threshold or result.get('requests', 0) > before.get('requests', 0):
+            regressions.append(result['name'])
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the modules of the collection against a mocked appliance.')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='compare the results to the ones of this JSON file')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='the median wall time ratio above which a benchmark has regressed')
+    parser.add_argument('--suites', type=lambda value: value.split(','), default=['modules', 'filesystem', 'download'],
+                        help='comma separated suites to run, among modules, filesystem and download')
+    parser.add_argument('--repeat', type=int, default=5, help='number of runs of each benchmark')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds every response of the appliance is delayed by')
+    parser.add_argument('--tree-sizes', type=lambda value: [int(v) for v in value.split(',')],
+                        default=[10000, 100000, 1000000], help='comma separated number of entries of the synthetic trees')
+    parser.add_argument('--file-sizes', type=lambda value: [int(v) for v in value.split(',')],
+                        default=[MIB, 16 * MIB, 128 * MIB], help='comma separated sizes in bytes of the downloaded files')
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results, args.threshold)
+        if regressions:
+            print('Regressions: {}'.format(', '.join(regressions)))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2022, Cédric Servais <cedric.servais@outlook.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+
+__metaclass__ = type
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from ansible.errors import AnsibleActionFail
+
+from ansible_collections.community.isva.plugins.action.isva_batch import ActionModule
+
+
+def action_module(args, check_mode=False, socket_path='fake_socket'):
+    task = MagicMock()
+    task.args = args
+    task.async_val = 0
+    task.check_mode = check_mode
+    task.diff = False
+    connection = MagicMock()
+    connection.socket_path = socket_path
+    return ActionModule(task, connection, MagicMock(), loader=None, templar=None, shared_loader_obj=None)
+
+
+@patch('ansible_collections.community.isva.plugins.modules.isva_facts.fetch_facts')
+@patch('ansible_collections.community.isva.plugins.modules.isva_pending_changes.deploy_changes')
+def test_run_operations_in_process(deploy_changes, fetch_facts):
+    fetch_facts.return_value = {'isva_firmware_version': '10.0.3.1'}
+    action = action_module({'operations': [
+        {'module': 'isva_facts', 'args': {'gather_subset': ['version']}},
+        {'module': 'community.isva.isva_pending_changes', 'args': {'state': 'deployed'}}
+    ]})
+
+    with patch('ansible_collections.community.isva.plugins.modules.isva_pending_changes.count_pending_changes',
+               return_value={'count': 1}), \
+            patch('ansible_collections.community.isva.plugins.modules.isva_pending_changes.fetch_pending_changes',
+                  return_value={'changes': [{'policy': 'dsc'}]}):
+        result = action.run(task_vars={})
+
+    module = fetch_facts.call_args[0][0]
+    assert module._socket_path == 'fake_socket'
+    assert module.params == {'gather_subset': ['version'], 'cache': False, 'log_level': 'INFO', 'log_output': 'text'}
+    assert fetch_facts.call_args[0][1:] == (['version'], False)
+    deploy_changes.assert_called_once()
+
+    assert [op['module'] for op in result['results']] == ['isva_facts', 'community.isva.isva_pending_changes']
+    assert result['ansible_facts'] == {'isva_firmware_version': '10.0.3.1'}
+    assert result['changed'] and not result['failed']
+
+
+@patch('ansible_collections.community.isva.plugins.modules.isva_facts.fetch_facts', return_value={})
+def test_run_returns_log_records(fetch_facts):
+    action = action_module({'operations': [
+        {'module': 'isva_facts', 'args': {'log_output': 'records'}},
+        {'module': 'isva_facts', 'args': {}}
+    ]})
+
+    with patch('ansible_collections.community.isva.plugins.action.isva_batch.display') as display:
+        display.verbosity = 3
+        result = action.run(task_vars={})
+
+    records, text = result['results']
+    assert records['stdout'] == '' and records['stdout_lines'] == []
+    assert records['log_records'][0]['message'].startswith('Module parameters')
+    assert 'Module parameters' in text['stdout'] and text['stdout_lines'] == [] and 'log_records' not in text
+
+
+@patch('ansible_collections.community.isva.plugins.modules.isva_database_config.create_database_configuration', return_value={})
+@patch('ansible_collections.community.isva.plugins.modules.isva_database_config.fetch_database_configuration', return_value={})
+def test_run_masks_no_log_values(fetch_database_configuration, create_database_configuration):
+    action = action_module({'operations': [{'module': 'isva_database_config', 'args': {
+        'state': 'replaced', 'log_output': 'records', 'hvdb': {
+            'db_type': 'postgresql', 'address': 'db.example.com', 'port': 5432, 'user': 'isva', 'password': 'S3cret!',
+            'db_name': 'isva', 'secure': True
+        }
+    }}]})
+
+    with patch('ansible_collections.community.isva.plugins.action.isva_batch.display') as display:
+        display.verbosity = 3
+        result = action.run(task_vars={})
+
+    operation = result['results'][0]
+    assert operation['changed']
+    assert operation['diff']['after']['password'] == 'VALUE_SPECIFIED_IN_NO_LOG_PARAMETER'
+    assert operation['log_records'][0]['message'].startswith('Module parameters')
+    assert 'S3cret!' not in str(operation)
+
+
+def test_run_stops_on_error():
+    action = action_module({'operations': [
+        {'module': 'isva_facts', 'args': {'gather_subset': ['unknown']}},
+        {'module': 'isva_facts', 'args': {}}
+    ]})
+
+    result = action.run(task_vars={})
+
+    assert result['failed']
+    assert len(result['results']) == 1
+    assert 'Invalid subset unknown' in result['results'][0]['msg']
+
+
+def test_run_rejects_invalid_operations():
+    action = action_module({'stop_on_error': False, 'operations': [
+        {'module': 'ansible.builtin.command', 'args': {}},
+        {'module': 'isva_unknown', 'args': {}},
+        {'module': 'isva_facts', 'args': {'unknown': True}}
+    ]})
+
+    result = action.run(task_vars={})
+
+    assert [op['failed'] for op in result['results']] == [True, True, True]
+    assert 'unknown' in result['results'][2]['msg']
+
+
+def test_run_requires_persistent_connection():
+    action = action_module({'operations': []}, socket_path=None)
+
+    with pytest.raises(AnsibleActionFail):
+        action.run(task_vars={})
@@ -6,17 +6,20 @@
 from __future__ import (absolute_import, division, print_function)
 __metaclass__ = type
 
+import hashlib
 import json
 import os
+import socket
+import tempfile
 
 import mock
 
 from ansible.errors import AnsibleConnectionFailure
-from ansible.module_utils.six.moves.urllib.error import HTTPError
+from ansible.module_utils.six.moves.urllib.error import HTTPError, URLError
 from ansible.module_utils.six import BytesIO, StringIO
 
 from ansible_collections.community.internal_test_tools.tests.unit.compat import unittest
-from ansible_collections.community.isva.plugins.httpapi.isva import HttpApi
+from ansible_collections.community.isva.plugins.httpapi.isva import HttpApi, MultipartFileStream
 
 fixture_path = os.path.join(os.path.dirname(__file__), 'fixtures')
 fixture_data = {}
@@ -55,6 +58,11 @@ class TestISVAHttpapi(unittest.TestCase):
         self.connection_mock = mock.Mock()
         self.isva_plugin = FakeISVAHttpApiPlugin(self.connection_mock)
         self.isva_plugin._load_name = 'httpapi'
+        self.isva_plugin.set_option('session_auth', False)
+        self.isva_plugin.set_option('cache_ttl', 0)
+        self.isva_plugin.set_option('cache_max_entries', 128)
+        self.isva_plugin.set_option('max_concurrent_requests', 4)
+        self.connection_mock.get_option.side_effect = {'host': 'isva.example.com', 'port': 443}.get
 
     def test_send_request_should_return_error_info_when_http_error_raises(self):
         self.connection_mock.send.side_effect = HTTPError('http://testhost.com', 500, '', {},
@@ -65,6 +73,278 @@ class TestISVAHttpapi(unittest.TestCase):
 
         assert resp == {'code': 500, 'contents': {'errorMessage': 'ERROR'}}
 
+    def test_send_request_should_not_cache_by_default(self):
+        self.connection_mock.send.side_effect = lambda *args, **kwargs: self._connection_response({'id': 'fr'})
+
+        self.isva_plugin.send_request('/isam/applang/v1')
+        self.isva_plugin.send_request('/isam/applang/v1')
+
+        assert self.connection_mock.send.call_count == 2
+
+    def test_send_request_should_serve_get_from_cache(self):
+        self.isva_plugin.set_option('cache_ttl', 60)
+        self.connection_mock.send.side_effect = lambda *args, **kwargs: self._connection_response({'id': 'fr'})
+
+        first = self.isva_plugin.send_request('/isam/applang/v1')
+        first['contents']['id'] = 'modified'
+        second = self.isva_plugin.send_request('/isam/applang/v1')
+
+        assert self.connection_mock.send.call_count == 1
+        assert second == {'code': 200, 'contents': {'id': 'fr'}}
+
+    def test_send_request_should_invalidate_cache_on_write(self):
+        self.isva_plugin.set_option('cache_ttl', 60)
+        self.connection_mock.send.side_effect = lambda *args, **kwargs: self._connection_response({})
+
+        self.isva_plugin.send_request('/isam/dsc/config')
+        self.isva_plugin.send_request('/shared_volume?recursive=True')
+        self.isva_plugin.send_request('/shared_volume/snapshots/file', method='DELETE')
+        self.isva_plugin.send_request('/isam/dsc/config')
+        self.isva_plugin.send_request('/shared_volume?recursive=True')
+
+        assert self.connection_mock.send.call_count == 4
+
+    def test_send_request_should_not_cache_excluded_paths(self):
+        self.isva_plugin.set_option('cache_ttl', 60)
+        self.connection_mock.send.side_effect = lambda *args, **kwargs: self._connection_response({'changes': []})
+
+        self.isva_plugin.send_request('/isam/pending_changes')
+        self.isva_plugin.send_request('/isam/pending_changes')
+
+        assert self.connection_mock.send.call_count == 2
+
+    @mock.patch('ansible_collections.community.isva.plugins.httpapi.isva.time')
+    def test_send_request_should_expire_cache_entries(self, time_mock):
+        self.isva_plugin.set_option('cache_ttl', 60)
+        self.connection_mock.send.side_effect = lambda *args, **kwargs: self._connection_response({})
+
+        time_mock.time.return_value = 1000
+        self.isva_plugin.send_request('/isam/dsc/config')
+        time_mock.time.return_value = 1061
+        self.isva_plugin.send_request('/isam/dsc/config')
+
+        assert self.connection_mock.send.call_count == 2
+
+    def test_send_request_should_evict_least_recently_used_entry(self):
+        self.isva_plugin.set_option('cache_ttl', 60)
+        self.isva_plugin.set_option('cache_max_entries', 2)
+        self.connection_mock.send.side_effect = lambda *args, **kwargs: self._connection_response({})
+
+        for path in ['/licenses', '/fixpacks', '/licenses', '/extensions', '/licenses', '/fixpacks']:
+            self.isva_plugin.send_request(path)
+
+        assert self.connection_mock.send.call_count == 4
+
+    def test_send_requests_should_return_results_in_order(self):
+        def send(path, *args, **kwargs):
+            if path == '/fixpacks':
+                raise HTTPError('http://testhost.com', 404, '', {}, StringIO('{"message": "Not found"}'))
+            return self._connection_response({'path': path})
+        self.connection_mock.send.side_effect = send
+
+        resp = self.isva_plugin.send_requests([{'path': '/licenses'}, {'path': '/fixpacks'}, {'path': '/extensions'}])
+
+        assert resp == [
+            {'code': 200, 'contents': {'path': '/licenses'}},
+            {'code': 404, 'contents': {'message': 'Not found'}},
+            {'code': 200, 'contents': {'path': '/extensions'}}
+        ]
+
+    def test_send_requests_should_accept_an_empty_batch(self):
+        assert self.isva_plugin.send_requests([]) == []
+
+    @mock.patch('ansible_collections.community.isva.plugins.httpapi.isva.ThreadPoolExecutor')
+    def test_download_files_should_cap_parallelism(self, executor_mock):
+        executor_mock.return_value.__enter__.return_value.map.return_value = []
+
+        self.isva_plugin.download_files([{'path': '/file_{}'.format(i), 'dest': '/tmp/file_{}'.format(i)} for i in range(8)], parallelism=16)
+
+        executor_mock.assert_called_once_with(max_workers=4)
+
+    def test_download_files_should_reject_invalid_parallelism(self):
+        with self.assertRaisesRegex(ValueError, 'must be at least 1'):
+            self.isva_plugin.download_files([{'path': '/file', 'dest': '/tmp/file'}], parallelism=0)
+
+    def test_upload_file_should_stream_multipart_body(self):
+        src = self._temporary_file(b'ab' * 1000)
+        bodies = []
+
+        def send(path, data, **kwargs):
+            chunks = []
+            chunk = data.read(256)
+            while chunk:
+                assert len(chunk) <= 256
+                chunks.append(chunk)
+                chunk = data.read(256)
+            body = b''.join(chunks)
+            assert int(kwargs['headers']['Content-Length']) == len(body)
+            bodies.append((body, kwargs['headers']['Content-Type']))
+            return self._connection_response({})
+        self.connection_mock.send.side_effect = send
+
+        resp = self.isva_plugin.upload_file('/shared_volume/fixpacks/fix.fixpack', src, filename='fix.fixpack', fields={'force': 'true'})
+
+        body, content_type = bodies[0]
+        boundary = content_type.split('boundary=')[1]
+        assert resp == {'code': 200, 'contents': {}}
+        assert content_type.startswith('multipart/form-data; ')
+        assert 'name="force"\r\n\r\ntrue\r\n'.encode() in body
+        assert 'filename="fix.fixpack"'.encode() in body
+        assert body.endswith('\r\n--{0}--\r\n'.format(boundary).encode())
+        assert b'ab' * 1000 in body
+
+    def test_multipart_file_stream_can_be_replayed(self):
+        src = self._temporary_file(b'content')
+        stream = MultipartFileStream(src, 'file', 'name')
+
+        first = self._read_stream(stream)
+        second = self._read_stream(stream)
+        stream.close()
+
+        assert first == second
+        assert len(first) == stream.size
+
+    def test_multipart_file_stream_reads_to_the_end(self):
+        src = self._temporary_file(b'content' * 1000)
+        stream = MultipartFileStream(src, 'file', 'name')
+        expected = self._read_stream(stream)
+
+        for size in (-1, None):
+            assert stream.read(3) == expected[:3]
+            assert stream.read(size) == expected[3:]
+            assert stream.read(size) == b''
+        assert stream.read() == expected
+        stream.close()
+
+    @mock.patch('ansible_collections.community.isva.plugins.httpapi.isva.open_url')
+    def test_download_file_should_return_digest_of_streamed_content(self, open_url_mock):
+        content = b'ab' * 50000
+        open_url_mock.return_value = self._download_response(content)
+        self.connection_mock._url = 'https://isva'
+        self.connection_mock._auth = None
+        dest = self._temporary_file(b'')
+
+        resp = self.isva_plugin.download_file('/isam/downloads/file', dest)
+
+        assert resp == {'code': 200, 'sha256': hashlib.sha256(content).hexdigest(), 'size': len(content), 'resumed': False}
+        with open(dest, 'rb') as f:
+            assert f.read() == content
+        assert open_url_mock.call_args[0][0] == 'https://isva/isam/downloads/file'
+        assert open_url_mock.call_args[1]['force_basic_auth'] is True
+
+    @mock.patch('ansible_collections.community.isva.plugins.httpapi.isva.open_url')
+    def test_download_file_should_forward_ciphers(self, open_url_mock):
+        open_url_mock.return_value = self._download_response(b'content')
+        self.connection_mock.get_option.side_effect = {'ciphers': ['ECDHE-RSA-AES128-SHA256']}.get
+        self.connection_mock._url = 'https://isva'
+        self.connection_mock._auth = None
+
+        self.isva_plugin.download_file('/isam/downloads/file', self._temporary_file(b''))
+
+        assert open_url_mock.call_args[1]['ciphers'] == ['ECDHE-RSA-AES128-SHA256']
+
+    @mock.patch('ansible_collections.community.isva.plugins.httpapi.isva.open_url')
+    def test_download_file_should_raise_connection_failure_when_unreachable(self, open_url_mock):
+        open_url_mock.side_effect = URLError('Connection refused')
+        self.connection_mock._url = 'https://isva'
+        self.connection_mock._auth = None
+
+        with self.assertRaisesRegex(AnsibleConnectionFailure, 'Could not connect to https://isva/isam/downloads/file: Connection refused'):
+            self.isva_plugin.download_file('/isam/downloads/file', self._temporary_file(b''))
+
+        open_url_mock.side_effect = socket.timeout('timed out')
+        with self.assertRaisesRegex(AnsibleConnectionFailure, 'Could not connect to https://isva/isam/downloads/file: timed out'):
+            self.isva_plugin.download_file('/isam/downloads/file', self._temporary_file(b''))
+
+    @mock.patch('ansible_collections.community.isva.plugins.httpapi.isva.open_url')
+    def test_download_file_should_resume_partial_file(self, open_url_mock):
+        content = b'ab' * 50000
+        open_url_mock.return_value = self._download_response(content[1000:], status=206, content_range='bytes 1000-99999/100000')
+        self.connection_mock._url = 'https://isva'
+        self.connection_mock._auth = None
+        dest = self._temporary_file(content[:1000])
+
+        resp = self.isva_plugin.download_file('/shared_volume/snapshots/file', dest, headers={}, resume=True)
+
+        assert resp == {'code': 200, 'sha256': hashlib.sha256(content).hexdigest(), 'size': len(content), 'resumed': True}
+        assert open_url_mock.call_args[1]['headers'] == {'Range': 'bytes=1000-'}
+        with open(dest, 'rb') as f:
+            assert f.read() == content
+
+    @mock.patch('ansible_collections.community.isva.plugins.httpapi.isva.open_url')
+    def test_download_file_should_restart_when_range_is_ignored(self, open_url_mock):
+        content = b'ab' * 50000
+        open_url_mock.return_value = self._download_response(content)
+        self.connection_mock._url = 'https://isva'
+        self.connection_mock._auth = None
+        dest = self._temporary_file(b'garbage')
+
+        resp = self.isva_plugin.download_file('/shared_volume/snapshots/file', dest, headers={}, resume=True)
+
+        assert resp == {'code': 200, 'sha256': hashlib.sha256(content).hexdigest(), 'size': len(content), 'resumed': False}
+        with open(dest, 'rb') as f:
+            assert f.read() == content
+
+    @mock.patch('ansible_collections.community.isva.plugins.httpapi.isva.open_url')
+    def test_download_file_should_restart_when_range_is_not_satisfiable(self, open_url_mock):
+        content = b'ab' * 50000
+        open_url_mock.side_effect = [
+            HTTPError('http://testhost.com', 416, '', {}, StringIO('{}')),
+            self._download_response(content)
+        ]
+        self.connection_mock._url = 'https://isva'
+        self.connection_mock._auth = None
+        dest = self._temporary_file(b'ab' * 60000)
+
+        resp = self.isva_plugin.download_file('/shared_volume/snapshots/file', dest, headers={}, resume=True)
+
+        assert resp['sha256'] == hashlib.sha256(content).hexdigest()
+        assert open_url_mock.call_args[1]['headers'] == {}
+
+    @mock.patch('ansible_collections.community.isva.plugins.httpapi.isva.open_url')
+    def test_download_file_should_return_error_info_when_http_error_raises(self, open_url_mock):
+        open_url_mock.side_effect = HTTPError('http://testhost.com', 404, '', {}, StringIO('{"message": "Not found"}'))
+        self.connection_mock._url = 'https://isva'
+        self.connection_mock._auth = None
+
+        resp = self.isva_plugin.download_file('/isam/downloads/file', '/tmp/not_written')
+
+        assert resp == {'code': 404, 'contents': {'message': 'Not found'}}
+        assert not os.path.exists('/tmp/not_written')
+
+    def test_update_auth_should_not_keep_session_by_default(self):
+        response = self._cookie_response(['JSESSIONID=abc; Path=/; Secure; HttpOnly'])
+
+        assert self.isva_plugin.update_auth(response, None) is None
+
+    def test_update_auth_should_return_session_cookies(self):
+        self.isva_plugin.set_option('session_auth', True)
+        self.connection_mock._auth = None
+        response = self._cookie_response(['JSESSIONID=abc; Path=/; Secure; HttpOnly', 'LtpaToken2=def; Path=/'])
+
+        assert self.isva_plugin.update_auth(response, None) == {'Cookie': 'JSESSIONID=abc; LtpaToken2=def'}
+
+    def test_update_auth_should_merge_with_existing_session(self):
+        self.isva_plugin.set_option('session_auth', True)
+        self.connection_mock._auth = {'Cookie': 'JSESSIONID=abc; LtpaToken2=def'}
+        response = self._cookie_response(['LtpaToken2=ghi; Path=/'])
+
+        assert self.isva_plugin.update_auth(response, None) == {'Cookie': 'JSESSIONID=abc; LtpaToken2=ghi'}
+
+    def test_update_auth_should_keep_session_when_no_cookie_is_returned(self):
+        self.isva_plugin.set_option('session_auth', True)
+        self.connection_mock._auth = None
+        response = self._cookie_response([])
+
+        assert self.isva_plugin.update_auth(response, None) is None
+
+    def test_handle_httperror_should_drop_expired_session(self):
+        self.connection_mock._auth = {'Cookie': 'JSESSIONID=abc'}
+        error = HTTPError('http://testhost.com', 401, '', {}, StringIO('{}'))
+
+        assert self.isva_plugin.handle_httperror(error) is True
+        assert self.connection_mock._auth is None
+
     '''
     def test_upload_file(self):
         self.connection.send.return_value = True
@@ -134,10 +414,50 @@ class TestISVAHttpapi(unittest.TestCase):
         assert res.exception.code == 400
     '''
 
+    def _temporary_file(self, content):
+        fd, path = tempfile.mkstemp()
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    @staticmethod
+    def _read_stream(stream):
+        chunks = []
+        chunk = stream.read(3)
+        while chunk:
+            chunks.append(chunk)
+            chunk = stream.read(3)
+        return b''.join(chunks)
+
+    @staticmethod
+    def _download_response(content, status=200, content_range=None):
+        response_mock = mock.Mock()
+        response_mock.getcode.return_value = status
+        response_mock.read.side_effect = BytesIO(content).read
+        response_mock.info.return_value.get_all.return_value = []
+        response_mock.info.return_value.get.return_value = content_range
+        return response_mock
+
+    @staticmethod
+    def _cookie_response(cookies):
+        response_mock = mock.Mock()
+        response_mock.info.return_value.get_all.return_value = cookies
+        return response_mock
+
     @staticmethod
     def _connection_response(response, status=200):
         response_mock = mock.Mock()
         response_mock.getcode.return_value = status
         response_text = json.dumps(response) if type(response) is dict else response
         response_data = BytesIO(response_text.encode() if response_text else ''.encode())
-        return response_mock, response_data
\ No newline at end of file
+        return response_mock, response_data
+
+    def test_deploy_requests_are_kept_until_forgotten(self):
+        self.isva_plugin.request_deploy('isva_dsc_config')
+        self.isva_plugin.request_deploy('isva_database_config')
+
+        assert self.isva_plugin.deploy_requests() == ['isva_dsc_config', 'isva_database_config']
+        self.isva_plugin.request_deploy('isva_dsc_config')
+        self.isva_plugin.forget_deploy_requests(2)
+        assert self.isva_plugin.deploy_requests() == ['isva_dsc_config']
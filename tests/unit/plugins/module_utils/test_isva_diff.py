@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2022, Cédric Servais <cedric.servais@outlook.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+
+__metaclass__ = type
+
+from ansible.module_utils.common.dict_transformations import recursive_diff
+
+from ansible_collections.community.isva.plugins.module_utils.isva_diff import semantic_diff
+from ansible_collections.community.isva.plugins.module_utils import isva_database_config, isva_dsc_config
+
+
+DSC = {
+    'worker_threads': 64,
+    'max_session_lifetime': 3600,
+    'client_grace': 600,
+    'connection_idle_timeout': 0,
+    'service_port': 443,
+    'replication_port': 444,
+    'servers': [
+        {'ip': '10.0.0.1', 'service_port': 443, 'replication_port': 444},
+        {'ip': '10.0.0.2', 'service_port': 443, 'replication_port': 444}
+    ]
+}
+
+HVDB = {
+    'db_type': 'postgresql',
+    'address': 'db1.example.com',
+    'port': 5432,
+    'user': 'isva',
+    'db_name': 'isva',
+    'secure': True,
+    'failover_servers': [
+        {'address': 'db2.example.com', 'port': 5432, 'order': 1},
+        {'address': 'db3.example.com', 'port': 5432, 'order': 2}
+    ]
+}
+
+
+def test_reordered_servers_are_the_same():
+    want = dict(DSC, servers=list(reversed(DSC['servers'])))
+
+    assert recursive_diff(DSC, want) is not None
+    assert semantic_diff(DSC, want, isva_dsc_config.DIFF_RULES) is None
+
+
+def test_normalised_attributes_are_the_same():
+    have = dict(HVDB, port='5432', address='DB1.example.com', secure='true', failover_servers=[
+        {'address': 'DB3.example.com', 'port': '5432', 'order': '2'},
+        {'address': 'db2.example.com', 'port': 5432, 'order': 1}
+    ])
+
+    assert semantic_diff(have, isva_database_config.from_module(HVDB), isva_database_config.DIFF_RULES) is None
+
+
+def test_dropped_falsy_attributes_are_the_same():
+    assert semantic_diff(DSC, isva_dsc_config.from_module(DSC), isva_dsc_config.DIFF_RULES) is None
+
+
+def test_changed_item_is_reported():
+    servers = [dict(DSC['servers'][1], replication_port=445), DSC['servers'][0]]
+    want = dict(DSC, servers=servers, worker_threads=128)
+
+    assert semantic_diff(DSC, want, isva_dsc_config.DIFF_RULES) == (
+        {'servers': DSC['servers'], 'worker_threads': 64},
+        {'servers': servers, 'worker_threads': 128}
+    )
+
+
+def test_failover_priority_is_a_change():
+    failover_servers = [dict(HVDB['failover_servers'][0], order=2), dict(HVDB['failover_servers'][1], order=1)]
+
+    assert semantic_diff(HVDB, dict(HVDB, failover_servers=failover_servers), isva_database_config.DIFF_RULES) is not None
+
+
+def test_removed_attribute_is_a_change():
+    have = dict(HVDB, db2_alt_address='db4.example.com')
+
+    assert semantic_diff(have, HVDB, isva_database_config.DIFF_RULES) == ({'db2_alt_address': 'db4.example.com'}, {})
+
+
+def test_lists_without_rule_keep_their_order():
+    assert semantic_diff({'values': [1, 2]}, {'values': [2, 1]}) == ({'values': [1, 2]}, {'values': [2, 1]})
+
+
+def test_changed_secrets_and_names_are_reported():
+    have = dict(HVDB, password='0123', user='isva', db_name='isva')
+    want = dict(HVDB, password='123', user='isva ', db_name='ISVA')
+
+    assert semantic_diff({'password': '0123'}, {'password': '123'}) == ({'password': '0123'}, {'password': '123'})
+    assert semantic_diff(have, want, isva_database_config.DIFF_RULES) == (
+        {'password': '0123', 'user': 'isva', 'db_name': 'isva'},
+        {'password': '123', 'user': 'isva ', 'db_name': 'ISVA'}
+    )
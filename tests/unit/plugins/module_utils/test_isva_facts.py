@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2022, Cédric Servais <cedric.servais@outlook.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+
+__metaclass__ = type
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from ansible_collections.community.isva.plugins.module_utils.isva_facts import (
+    FACT_SUBSETS, fetch_facts, resolve_gather_subset
+)
+from ansible_collections.community.isva.plugins.module_utils.isva_pending_changes import deploy_changes
+from ansible_collections.community.isva.plugins.module_utils.common import ISVAModuleError
+
+
+@pytest.fixture
+def module_mock():
+    module = MagicMock()
+    module._socket_path = 'fake_socket'
+    yield module
+
+
+@pytest.fixture
+def facts_cache(tmp_path):
+    path = str(tmp_path / 'facts.json')
+    with patch('ansible_collections.community.isva.plugins.module_utils.isva_utils.FACTS_CACHE_FILE', path):
+        yield path
+
+
+def appliance(connection_class, start_time='2022-06-01 22:02:52', count=0):
+    """Answer the batches of requests like an appliance would, and record the paths requested."""
+    contents = {
+        '/lmi': [{'start_time': start_time}],
+        '/isam/pending_changes/count': {'count': count},
+        '/core/sys/versions': {'firmware_version': '10.0.3.1'},
+        '/licenses': []
+    }
+    requested = []
+
+    def send_requests(batch):
+        requested.append([request['path'] for request in batch])
+        return [{'code': 200, 'contents': contents[request['path']]} for request in batch]
+
+    connection_class.return_value.send_requests.side_effect = send_requests
+    connection_class.return_value.get_option.side_effect = {'host': 'isva.example.com', 'port': 443}.get
+    return requested
+
+
+def test_resolve_gather_subset():
+    assert resolve_gather_subset(['all']) == sorted(FACT_SUBSETS)
+    assert resolve_gather_subset(['version', 'lmi', 'version']) == ['lmi', 'version']
+    assert resolve_gather_subset(['all', '!license']) == sorted(set(FACT_SUBSETS) - {'license'})
+
+
+def test_resolve_gather_subset_rejects_unknown_subset():
+    with pytest.raises(ISVAModuleError):
+        resolve_gather_subset(['unknown'])
+
+
+@patch('ansible_collections.community.isva.plugins.module_utils.isva_facts.Connection')
+def test_fetch_facts_sends_one_batch(connection_class, module_mock):
+    connection_class.return_value.send_requests.return_value = [
+        {'code': 200, 'contents': [{'start_time': '2022-06-01 22:02:52'}]},
+        {'code': 200, 'contents': {'firmware_version': '10.0.3.1'}}
+    ]
+
+    facts = fetch_facts(module_mock, ['lmi', 'version'])
+
+    connection_class.return_value.send_requests.assert_called_once_with(batch=[{'path': '/lmi'}, {'path': '/core/sys/versions'}])
+    assert facts == {'isva_lmi_status': {'start_time': '2022-06-01 22:02:52'}, 'isva_firmware_version': '10.0.3.1'}
+
+
+@patch('ansible_collections.community.isva.plugins.module_utils.isva_facts.Connection')
+def test_fetch_facts_fails_on_error(connection_class, module_mock):
+    connection_class.return_value.send_requests.return_value = [
+        {'code': 500, 'contents': {'message': 'Internal error'}}
+    ]
+
+    with pytest.raises(ISVAModuleError):
+        fetch_facts(module_mock, ['license'])
+
+
+@patch('ansible_collections.community.isva.plugins.module_utils.isva_facts.Connection')
+def test_fetch_facts_serves_cached_facts(connection_class, module_mock, facts_cache):
+    requested = appliance(connection_class)
+
+    first = fetch_facts(module_mock, ['license', 'version'], cache=True)
+    second = fetch_facts(module_mock, ['license', 'version'], cache=True)
+
+    assert first == second == {'isva_licenses': [], 'isva_firmware_version': '10.0.3.1'}
+    assert requested == [
+        ['/lmi', '/isam/pending_changes/count', '/licenses', '/core/sys/versions'],
+        ['/lmi', '/isam/pending_changes/count']
+    ]
+
+
+@patch('ansible_collections.community.isva.plugins.module_utils.isva_facts.Connection')
+def test_fetch_facts_refreshes_cache_after_restart(connection_class, module_mock, facts_cache):
+    requested = appliance(connection_class)
+    fetch_facts(module_mock, ['version'], cache=True)
+
+    requested = appliance(connection_class, start_time='2022-06-02 08:00:00')
+    fetch_facts(module_mock, ['license', 'version'], cache=True)
+
+    assert requested == [
+        ['/lmi', '/isam/pending_changes/count', '/licenses'],
+        ['/core/sys/versions']
+    ]
+
+
+@patch('ansible_collections.community.isva.plugins.module_utils.isva_facts.Connection')
+def test_fetch_facts_refreshes_cache_after_change(connection_class, module_mock, facts_cache):
+    requested = appliance(connection_class)
+    fetch_facts(module_mock, ['version'], cache=True)
+
+    requested = appliance(connection_class, count=1)
+    fetch_facts(module_mock, ['version'], cache=True)
+
+    assert requested == [['/lmi', '/isam/pending_changes/count'], ['/core/sys/versions']]
+
+
+@patch('ansible_collections.community.isva.plugins.module_utils.isva_facts.Connection')
+def test_fetch_facts_cache_ignores_lmi_attributes_but_start_time(connection_class, module_mock, facts_cache):
+    requested = appliance(connection_class)
+    fetch_facts(module_mock, ['version'], cache=True)
+
+    contents = [[{'start_time': '2022-06-01 22:02:52', 'cpu': 12}], {'count': 0}]
+    connection_class.return_value.send_requests.side_effect = lambda batch: [{'code': 200, 'contents': content} for content in contents]
+    assert fetch_facts(module_mock, ['version'], cache=True) == {'isva_firmware_version': '10.0.3.1'}
+
+
+@patch('ansible_collections.community.isva.plugins.module_utils.isva_pending_changes.Connection')
+@patch('ansible_collections.community.isva.plugins.module_utils.isva_facts.Connection')
+def test_fetch_facts_refreshes_cache_after_deploy(connection_class, pending_changes_connection_class, module_mock, facts_cache):
+    requested = appliance(connection_class)
+    fetch_facts(module_mock, ['version'], cache=True)
+
+    # The deploy doesn't restart the LMI, the start time and the pending changes count are the same as before.
+    pending_changes_connection_class.return_value = connection_class.return_value
+    connection_class.return_value.send_request.return_value = {'code': 200, 'contents': {}}
+    deploy_changes(module_mock)
+    fetch_facts(module_mock, ['version'], cache=True)
+
+    assert requested == [
+        ['/lmi', '/isam/pending_changes/count', '/core/sys/versions'],
+        ['/lmi', '/isam/pending_changes/count', '/core/sys/versions']
+    ]
+
+
+@patch('ansible_collections.community.isva.plugins.module_utils.isva_facts.Connection')
+def test_fetch_facts_builds_lmi_facts_from_live_status(connection_class, module_mock, facts_cache):
+    requested = appliance(connection_class)
+    fetch_facts(module_mock, ['lmi', 'version'], cache=True)
+    facts = fetch_facts(module_mock, ['lmi', 'version'], cache=True)
+
+    assert facts == {'isva_lmi_status': {'start_time': '2022-06-01 22:02:52'}, 'isva_firmware_version': '10.0.3.1'}
+    assert requested == [
+        ['/lmi', '/isam/pending_changes/count', '/core/sys/versions'],
+        ['/lmi', '/isam/pending_changes/count']
+    ]
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2022, Cédric Servais <cedric.servais@outlook.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+
+__metaclass__ = type
+
+import errno
+import hashlib
+import tempfile
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from ansible_collections.community.isva.plugins.module_utils.common import ISVAModuleError
+from ansible_collections.community.isva.plugins.module_utils.isva_file_downloads import (
+    download_file_downloads_batch
+)
+from ansible_collections.community.isva.plugins.module_utils.isva_utils import FilesystemIndex
+
+
+def sha256(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+@pytest.fixture(autouse=True)
+def digest_cache(tmp_path):
+    with patch('ansible_collections.community.isva.plugins.module_utils.isva_utils.DIGEST_CACHE_FILE', str(tmp_path / 'digests.json')):
+        yield
+
+
+@pytest.fixture
+def module_mock(tmp_path):
+    module = MagicMock()
+    module._socket_path = 'fake_socket'
+    module.tmpdir = str(tmp_path)
+    module.sha256.side_effect = lambda path: sha256(open(path, 'rb').read())
+    yield module
+
+
+@pytest.fixture
+def remote_files():
+    yield FilesystemIndex([{'name': 'isam', 'type': 'Directory', 'children': [
+        {'name': 'sdk.zip', 'type': 'File', 'size': 3, 'modified': '2022-06-01T22:02:52Z'}
+    ]}])
+
+
+def fake_download_file(path, dest, headers=None, resume=False):
+    with open(dest, 'wb') as f:
+        f.write(b'sdk')
+    return {'code': 200, 'sha256': sha256(b'sdk'), 'size': 3, 'resumed': False}
+
+
+@patch('ansible_collections.community.isva.plugins.module_utils.isva_file_downloads.Connection')
+def test_download_file_downloads_batch_skips_unchanged_remote_file(connection_class, module_mock, remote_files, tmp_path):
+    connection_class.return_value.download_file.side_effect = fake_download_file
+    files = [{'path': '/isam/sdk.zip', 'dest': str(tmp_path / 'sdk.zip')}]
+
+    assert download_file_downloads_batch(module_mock, files, remote_files, compare='metadata') == [True]
+    assert download_file_downloads_batch(module_mock, files, remote_files, compare='metadata') == [False]
+    assert connection_class.return_value.download_file.call_count == 1
+
+    remote_files.get('isam/sdk.zip')['modified'] = '2022-07-01T22:02:52Z'
+    assert download_file_downloads_batch(module_mock, files, remote_files, compare='metadata') == [False]
+    assert connection_class.return_value.download_file.call_count == 2
+
+
+@patch('ansible_collections.community.isva.plugins.module_utils.isva_file_downloads.Connection')
+def test_download_file_downloads_batch_only_indexes_requested_directories(connection_class, module_mock, remote_files, tmp_path):
+    connection_class.return_value.download_file.side_effect = fake_download_file
+    remote_files.add([{'name': 'kit.zip', 'type': 'File', 'size': 3}], prefix='other')
+    files = [{'path': '/isam/sdk.zip', 'dest': str(tmp_path / 'sdk.zip')}]
+
+    assert download_file_downloads_batch(module_mock, files, remote_files) == [True]
+    assert remote_files._root.children()['other'].listings
+
+
+@patch('ansible_collections.community.isva.plugins.module_utils.isva_file_downloads.Connection')
+def test_download_file_downloads_batch_compares_checksum_by_default(connection_class, module_mock, remote_files, tmp_path):
+    connection_class.return_value.download_file.side_effect = fake_download_file
+    files = [{'path': '/isam/sdk.zip', 'dest': str(tmp_path / 'sdk.zip')}]
+
+    assert download_file_downloads_batch(module_mock, files, remote_files) == [True]
+    assert download_file_downloads_batch(module_mock, files, remote_files) == [False]
+    assert connection_class.return_value.download_file.call_count == 2
+    assert not (tmp_path / 'sdk.zip.isva_manifest').exists()
+
+
+@patch('ansible_collections.community.isva.plugins.module_utils.isva_file_downloads.Connection')
+def test_download_file_downloads_batch_stages_next_to_destination(connection_class, module_mock, remote_files, tmp_path):
+    destination = tmp_path / 'destination'
+    destination.mkdir()
+    downloads = []
+
+    def download_file(path, dest, headers=None, resume=False):
+        downloads.append({'path': path, 'dest': dest})
+        return fake_download_file(path, dest)
+    connection_class.return_value.download_file.side_effect = download_file
+    files = [{'path': '/isam/sdk.zip', 'dest': str(destination / 'sdk.zip')}]
+
+    assert download_file_downloads_batch(module_mock, files, remote_files) == [True]
+    assert downloads[0]['dest'].startswith(str(destination))
+    assert [path.name for path in destination.iterdir()] == ['sdk.zip']
+
+
+@patch('ansible_collections.community.isva.plugins.module_utils.isva_file_downloads.Connection')
+def test_download_file_downloads_batch_fails_on_unwritable_destination(connection_class, module_mock, remote_files, tmp_path):
+    readonly = str(tmp_path / 'readonly')
+    mkstemp = tempfile.mkstemp
+
+    def fake_mkstemp(dir=None, **kwargs):
+        if dir == readonly:
+            raise OSError(errno.EACCES, 'Permission denied')
+        return mkstemp(dir=dir, **kwargs)
+    files = [{'path': '/isam/sdk.zip', 'dest': str(tmp_path / 'sdk.zip')}, {'path': '/isam/sdk.zip', 'dest': readonly + '/sdk.zip'}]
+
+    with patch('ansible_collections.community.isva.plugins.module_utils.isva_file_downloads.tempfile.mkstemp', side_effect=fake_mkstemp):
+        with pytest.raises(ISVAModuleError, match='its directory {} is not writable'.format(readonly)):
+            download_file_downloads_batch(module_mock, files, remote_files)
+
+    connection_class.return_value.download_file.assert_not_called()
+    assert not list(tmp_path.glob('*.part'))  # The file staged for the first destination is removed.
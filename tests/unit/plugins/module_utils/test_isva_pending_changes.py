@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2022, Cédric Servais <cedric.servais@outlook.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+
+__metaclass__ = type
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from ansible.module_utils.connection import ConnectionError
+
+from ansible_collections.community.isva.plugins.module_utils.isva_pending_changes import wait_for_deploy
+from ansible_collections.community.isva.plugins.module_utils.common import ISVAModuleError
+
+PENDING_CHANGES = 'ansible_collections.community.isva.plugins.module_utils.isva_pending_changes'
+
+
+@pytest.fixture
+def module_mock():
+    module = MagicMock()
+    module._socket_path = 'fake_socket'
+    yield module
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    clock = FakeClock()
+    with patch(PENDING_CHANGES + '.time', clock):
+        yield clock
+
+
+def responses(*answers, **kwargs):
+    """Answer the polls in order, an answer being the pending changes count, None when the LMI can't be reached. The
+    LMI answers with the start times given, the last one once they have been all returned."""
+    start_times = list(kwargs.get('start_times', ['2022-06-01 22:02:52']))
+
+    def send_request(path):
+        answer = remaining[0]
+        if answer is None:
+            remaining.pop(0)
+            raise ConnectionError('Connection refused')
+        if path.endswith('/count'):
+            if answer:
+                remaining.pop(0)
+            return {'code': 200, 'contents': {'count': answer}}
+        remaining.pop(0)
+        return {'code': 200, 'contents': [{'start_time': start_times.pop(0) if len(start_times) > 1 else start_times[0]}]}
+
+    remaining = list(answers)
+    return send_request
+
+
+@patch(PENDING_CHANGES + '.Connection')
+def test_wait_for_deploy_backs_off_until_ready(connection_class, module_mock, clock):
+    connection_class.return_value.send_request.side_effect = responses(2, None, None, 1, 0)
+
+    waited = wait_for_deploy(module_mock, timeout=600, delay=1, max_delay=4)
+
+    assert len(clock.sleeps) == 4
+    for sleep, backoff in zip(clock.sleeps, [1, 2, 4, 4]):
+        assert backoff / 2 <= sleep <= backoff
+    assert waited == clock.now
+
+
+@patch(PENDING_CHANGES + '.Connection')
+def test_wait_for_deploy_waits_for_lmi_restart(connection_class, module_mock, clock):
+    # Right after the deploy, there are no pending changes left and the LMI still answers until it restarts.
+    connection_class.return_value.send_request.side_effect = responses(0, 0, None, 0, start_times=[
+        '2022-06-01 22:02:52', '2022-06-01 22:02:52', '2022-06-01 22:05:10'
+    ])
+
+    waited = wait_for_deploy(module_mock, timeout=600, delay=1, max_delay=4, start_time='2022-06-01 22:02:52')
+
+    assert len(clock.sleeps) == 3
+    assert waited == clock.now
+
+
+@patch(PENDING_CHANGES + '.Connection')
+def test_wait_for_deploy_times_out(connection_class, module_mock, clock):
+    connection_class.return_value.send_request.return_value = {'code': 200, 'contents': {'count': 1}}
+
+    with pytest.raises(ISVAModuleError):
+        wait_for_deploy(module_mock, timeout=60, delay=1, max_delay=30)
+    assert clock.now == 60
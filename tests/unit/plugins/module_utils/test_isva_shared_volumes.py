@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2022, Cédric Servais <cedric.servais@outlook.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+
+__metaclass__ = type
+
+import hashlib
+import os
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from ansible_collections.community.isva.plugins.module_utils.isva_shared_volumes import (
+    download_shared_volumes_batch, fetch_shared_volumes_index
+)
+from ansible_collections.community.isva.plugins.module_utils.isva_utils import FilesystemIndex
+from ansible_collections.community.isva.plugins.module_utils.common import ISVAModuleError
+
+
+def sha256(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+@pytest.fixture(autouse=True)
+def digest_cache(tmp_path):
+    with patch('ansible_collections.community.isva.plugins.module_utils.isva_utils.DIGEST_CACHE_FILE', str(tmp_path / 'digests.json')):
+        yield
+
+
+@pytest.fixture
+def module_mock():
+    module = MagicMock()
+    module._socket_path = 'fake_socket'
+    module.sha256.side_effect = lambda path: sha256(open(path, 'rb').read())
+    yield module
+
+
+@pytest.fixture
+def remote_files():
+    yield FilesystemIndex([
+        {'name': 'snapshots', 'type': 'Directory', 'children': [{'name': 'a.snapshot', 'type': 'File', 'sha256': sha256(b'a')}]},
+        {'name': 'support', 'type': 'Directory', 'children': [{'name': 'b.support', 'type': 'File', 'sha256': sha256(b'b')}]}
+    ])
+
+
+def fake_download_file(path, dest, headers=None, resume=False):
+    content = path.split('/')[3][0].encode()
+    with open(dest, 'wb') as f:
+        f.write(content)
+    return {'code': 200, 'sha256': sha256(content), 'size': 1, 'resumed': False}
+
+
+def fake_download_files(batch, parallelism=None):
+    return [fake_download_file(**download) for download in batch]
+
+
+@patch('ansible_collections.community.isva.plugins.module_utils.isva_shared_volumes.Connection')
+def test_download_shared_volumes_batch_downloads_missing_files(connection_class, module_mock, remote_files, tmp_path):
+    connection_class.return_value.download_file.side_effect = fake_download_file
+    (tmp_path / 'a.snapshot').write_bytes(b'a')
+    files = [
+        {'path': 'snapshots', 'name': 'a.snapshot', 'dest': str(tmp_path / 'a.snapshot')},
+        {'path': 'support', 'name': 'b.support', 'dest': str(tmp_path / 'b.support')}
+    ]
+
+    assert download_shared_volumes_batch(module_mock, files, remote_files, parallelism=2) == [False, True]
+    connection_class.return_value.download_file.assert_called_once_with(
+        path='/shared_volume/support/b.support?type=File&export', dest=str(tmp_path / 'b.support.part'), headers={}, resume=True
+    )
+    connection_class.return_value.download_files.assert_not_called()
+    assert (tmp_path / 'b.support').read_bytes() == b'b'
+    assert not os.path.exists(str(tmp_path / 'b.support.part'))
+
+
+@pytest.mark.parametrize('parallelism, max_concurrent_requests, calls', [
+    (1, 4, ['download_file', 'download_file']),
+    (2, 4, ['download_files']),
+    (4, 4, ['download_files']),
+    (4, 1, ['download_file', 'download_file'])
+])
+@patch('ansible_collections.community.isva.plugins.module_utils.isva_shared_volumes.Connection')
+def test_download_shared_volumes_batch_sends_a_call_per_chunk(connection_class, parallelism, max_concurrent_requests, calls,
+                                                              module_mock, remote_files, tmp_path):
+    # Each call must complete within the persistent_command_timeout, it holds at most as many files as are
+    # downloaded at once by the connection.
+    connection_class.return_value.get_option.side_effect = {'max_concurrent_requests': max_concurrent_requests}.get
+    connection_class.return_value.download_file.side_effect = fake_download_file
+    connection_class.return_value.download_files.side_effect = fake_download_files
+    files = [
+        {'path': 'snapshots', 'name': 'a.snapshot', 'dest': str(tmp_path / 'a.snapshot')},
+        {'path': 'support', 'name': 'b.support', 'dest': str(tmp_path / 'b.support')}
+    ]
+
+    assert download_shared_volumes_batch(module_mock, files, remote_files, parallelism=parallelism) == [True, True]
+    assert [call[0] for call in connection_class.return_value.method_calls if call[0] != 'get_option'] == calls
+
+
+@pytest.mark.parametrize('parallelism', [0, -1])
+def test_download_shared_volumes_batch_rejects_invalid_parallelism(parallelism, module_mock, remote_files, tmp_path):
+    files = [{'path': 'support', 'name': 'b.support', 'dest': str(tmp_path / 'b.support')}]
+
+    with pytest.raises(ISVAModuleError, match='The parallelism must be at least 1'):
+        download_shared_volumes_batch(module_mock, files, remote_files, parallelism=parallelism)
+
+
+@patch('ansible_collections.community.isva.plugins.module_utils.isva_shared_volumes.Connection')
+def test_download_shared_volumes_batch_rejects_corrupted_file(connection_class, module_mock, remote_files, tmp_path):
+    connection_class.return_value.download_file.return_value = {'code': 200, 'sha256': 'corrupted', 'size': 1, 'resumed': False}
+    (tmp_path / 'b.support.part').write_bytes(b'x')
+    files = [{'path': 'support', 'name': 'b.support', 'dest': str(tmp_path / 'b.support')}]
+
+    with pytest.raises(ISVAModuleError):
+        download_shared_volumes_batch(module_mock, files, remote_files)
+    assert not os.path.exists(str(tmp_path / 'b.support'))
+
+
+def test_download_shared_volumes_batch_rejects_missing_file(module_mock, remote_files, tmp_path):
+    files = [{'path': 'snapshots', 'name': 'missing.snapshot', 'dest': str(tmp_path / 'missing.snapshot')}]
+
+    with pytest.raises(ISVAModuleError, match='The requested file does not exist snapshots/missing.snapshot'):
+        download_shared_volumes_batch(module_mock, files, remote_files)
+
+
+@patch('ansible_collections.community.isva.plugins.module_utils.isva_shared_volumes.Connection')
+def test_fetch_shared_volumes_index_lists_only_requested_paths(connection_class, module_mock):
+    connection_class.return_value.send_requests.return_value = [
+        {'code': 200, 'contents': [{'name': 'a.snapshot', 'type': 'File', 'sha256': sha256(b'a')}]}
+    ]
+
+    index = fetch_shared_volumes_index(module_mock, ['snapshots', 'snapshots'])
+
+    connection_class.return_value.send_requests.assert_called_once_with(batch=[{'path': '/shared_volume/snapshots?recursive=False'}])
+    assert index.get('snapshots/a.snapshot')['sha256'] == sha256(b'a')
+
+
+@patch('ansible_collections.community.isva.plugins.module_utils.isva_shared_volumes.Connection')
+def test_download_shared_volumes_batch_lists_paths_on_demand(connection_class, module_mock, tmp_path):
+    connection_class.return_value.send_requests.return_value = [
+        {'code': 200, 'contents': [{'name': 'a.snapshot', 'type': 'File', 'sha256': sha256(b'a')}]}
+    ]
+    (tmp_path / 'a.snapshot').write_bytes(b'a')
+    files = [{'path': 'snapshots', 'name': 'a.snapshot', 'dest': str(tmp_path / 'a.snapshot')}]
+
+    assert download_shared_volumes_batch(module_mock, files) == [False]
+    connection_class.return_value.send_requests.assert_called_once_with(batch=[{'path': '/shared_volume/snapshots?recursive=False'}])
+    connection_class.return_value.download_files.assert_not_called()
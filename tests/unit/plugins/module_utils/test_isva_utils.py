@@ -7,16 +7,264 @@ from __future__ import (absolute_import, division, print_function)
 
 __metaclass__ = type
 
+import errno
 import json
+import logging
 import os
+import shutil
+import tempfile
 
 import mock
 
 from ansible_collections.community.internal_test_tools.tests.unit.compat import unittest
 from ansible_collections.community.isva.plugins.module_utils.isva_utils import (
-    parse_fail_message, create_return_object
+    parse_fail_message, create_return_object, file_sha256, record_file_sha256, identical_files, move_file,
+    FilesystemIndex, convert_filesystem_to_dict, RingBufferLogHandler, setup_logging, update_logging_info,
+    create_return_error
 )
 
 fixture_path = os.path.join(os.path.dirname(__file__), 'fixtures')
 fixture_data = {}
 
+
+class TestFileSha256(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        patcher = mock.patch('ansible_collections.community.isva.plugins.module_utils.isva_utils.DIGEST_CACHE_FILE',
+                             os.path.join(self.tmpdir, 'cache', 'digests.json'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.module = mock.Mock()
+        self.module.sha256.side_effect = lambda path: 'sha256-of-{}'.format(open(path).read())
+
+    def _write(self, name, content):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def test_unchanged_file_is_hashed_once(self):
+        path = self._write('file', 'content')
+
+        assert file_sha256(self.module, path) == 'sha256-of-content'
+        assert file_sha256(self.module, path) == 'sha256-of-content'
+        assert self.module.sha256.call_count == 1
+
+    def test_modified_file_is_hashed_again(self):
+        path = self._write('file', 'content')
+        file_sha256(self.module, path)
+        os.utime(path, ns=(0, 0))
+
+        assert file_sha256(self.module, path) == 'sha256-of-content'
+        assert self.module.sha256.call_count == 2
+
+    def test_recorded_digest_is_used(self):
+        path = self._write('file', 'content')
+        record_file_sha256(path, 'recorded')
+
+        assert file_sha256(self.module, path) == 'recorded'
+        assert self.module.sha256.call_count == 0
+
+    def test_corrupted_cache_is_ignored(self):
+        path = self._write('file', 'content')
+        os.makedirs(os.path.join(self.tmpdir, 'cache'))
+        self._write(os.path.join('cache', 'digests.json'), '{not json')
+
+        assert file_sha256(self.module, path) == 'sha256-of-content'
+
+    @mock.patch('ansible_collections.community.isva.plugins.module_utils.isva_utils.DIGEST_CACHE_MAX_ENTRIES', 2)
+    def test_malformed_cache_entries_are_dropped(self):
+        path = self._write('file', 'content')
+        os.makedirs(os.path.join(self.tmpdir, 'cache'))
+        self._write(os.path.join('cache', 'digests.json'), json.dumps({'version': 1, 'data': {
+            os.path.realpath(path): 'sha256-of-content',
+            '/old': {'signature': [], 'sha256': 'old'},
+            '/broken': {'time': 0}
+        }}))
+
+        assert file_sha256(self.module, path) == 'sha256-of-content'
+        assert self.module.sha256.call_count == 1
+        with open(os.path.join(self.tmpdir, 'cache', 'digests.json')) as f:
+            cached = json.load(f)['data']
+        assert sorted(cached) == sorted(['/old', os.path.realpath(path)])
+
+    @mock.patch('ansible_collections.community.isva.plugins.module_utils.isva_utils.DIGEST_CACHE_MAX_ENTRIES', 2)
+    def test_cache_is_bounded(self):
+        paths = [self._write('file{}'.format(i), str(i)) for i in range(3)]
+        for path in paths:
+            file_sha256(self.module, path)
+
+        with open(os.path.join(self.tmpdir, 'cache', 'digests.json')) as f:
+            cached = json.load(f)['data']
+        assert len(cached) == 2
+        assert os.path.realpath(paths[0]) not in cached
+
+    def test_identical_files(self):
+        src = self._write('src', 'content')
+        dest = self._write('dest', 'content')
+        other = self._write('other', 'other content')
+
+        assert identical_files(self.module, src, dest)
+        assert not identical_files(self.module, src, other)
+        assert not identical_files(self.module, src, os.path.join(self.tmpdir, 'missing'))
+
+
+class TestMoveFile(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.src = os.path.join(self.tmpdir, 'src')
+        self.dest = os.path.join(self.tmpdir, 'dest')
+        with open(self.src, 'w') as f:
+            f.write('new')
+
+    def test_move_file_keeps_destination_permissions(self):
+        with open(self.dest, 'w') as f:
+            f.write('old')
+        os.chmod(self.dest, 0o640)
+
+        move_file(self.src, self.dest)
+
+        assert open(self.dest).read() == 'new'
+        assert os.stat(self.dest).st_mode & 0o777 == 0o640
+        assert not os.path.exists(self.src)
+
+    def test_move_file_copies_across_devices(self):
+        replace = os.replace
+        calls = []
+
+        def cross_device_replace(src, dest):
+            calls.append(src)
+            if src == self.src:
+                raise OSError(errno.EXDEV, 'Invalid cross-device link')
+            replace(src, dest)
+
+        with mock.patch('ansible_collections.community.isva.plugins.module_utils.isva_utils.os.replace', side_effect=cross_device_replace):
+            move_file(self.src, self.dest)
+
+        assert open(self.dest).read() == 'new'
+        assert not os.path.exists(self.src)
+        assert len(calls) == 2
+        assert os.listdir(self.tmpdir) == ['dest']
+
+
+class TestFilesystemIndex(unittest.TestCase):
+    def setUp(self):
+        self.listing = [
+            {'name': 'snapshots', 'type': 'Directory', 'children': [
+                {'name': 'isva_10.0.3.1_published.snapshot', 'type': 'File', 'sha256': 'a', 'owner': 'admin'},
+                {'name': 'archive', 'type': 'Directory', 'children': [
+                    {'name': 'isva_10.0.2.0_published.snapshot', 'type': 'File', 'sha256': 'b'}
+                ]}
+            ]},
+            {'name': 'snapshots-old', 'type': 'Directory', 'children': []},
+            {'name': 'support', 'type': 'Directory', 'children': None}
+        ]
+        self.index = FilesystemIndex(self.listing)
+
+    def test_get(self):
+        assert self.index.get('snapshots/isva_10.0.3.1_published.snapshot') == {
+            'name': 'isva_10.0.3.1_published.snapshot', 'type': 'File', 'sha256': 'a'
+        }
+        assert self.index.get('/snapshots/archive/isva_10.0.2.0_published.snapshot')['sha256'] == 'b'
+        assert self.index.get('snapshots') == {'name': 'snapshots', 'type': 'Directory'}
+        assert self.index.get('snapshots/missing') is None
+        assert 'support' in self.index
+        assert len(self.index) == 6
+
+    def test_iter_prefix(self):
+        assert [path for path, _ in self.index.iter_prefix('snapshots')] == [
+            'snapshots',
+            'snapshots/archive',
+            'snapshots/archive/isva_10.0.2.0_published.snapshot',
+            'snapshots/isva_10.0.3.1_published.snapshot'
+        ]
+        assert len(list(self.index.iter_prefix(''))) == 6
+
+    def test_match(self):
+        assert [path for path, _ in self.index.match('snapshots/*.snapshot')] == [
+            'snapshots/archive/isva_10.0.2.0_published.snapshot',
+            'snapshots/isva_10.0.3.1_published.snapshot'
+        ]
+
+    def test_add_with_prefix(self):
+        index = FilesystemIndex()
+        index.add([{'name': 'fix.fixpack', 'type': 'File', 'sha256': 'c'}], prefix='/fixpacks/')
+
+        assert index.get('fixpacks/fix.fixpack')['sha256'] == 'c'
+        assert index.get('fixpacks') == {'name': 'fixpacks', 'type': 'Directory'}
+
+    def test_directories_are_indexed_on_lookup(self):
+        index = FilesystemIndex(self.listing)
+
+        assert index.get('snapshots/isva_10.0.3.1_published.snapshot/missing') is None
+        assert list(index._root.entries['snapshots'].entries) == ['isva_10.0.3.1_published.snapshot', 'archive']
+        assert index._root.entries['snapshots'].entries['archive'].listings == [self.listing[0]['children'][1]['children']]
+
+    def test_same_files_as_convert_filesystem_to_dict(self):
+        nested = convert_filesystem_to_dict(self.listing)
+
+        assert self.index.get('snapshots/isva_10.0.3.1_published.snapshot')['sha256'] == nested['snapshots']['isva_10.0.3.1_published.snapshot']['sha256']
+        assert self.index.get('snapshots/archive/isva_10.0.2.0_published.snapshot') == nested['snapshots']['archive']['isva_10.0.2.0_published.snapshot']
+
+
+class TestRingBufferLogHandler(unittest.TestCase):
+    def setUp(self):
+        self.handler = RingBufferLogHandler(max_bytes=200, max_record_bytes=50)
+        self.handler.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+        self.logger = logging.getLogger('test_ring_buffer')
+        self.logger.addHandler(self.handler)
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.propagate = False
+        self.addCleanup(self.logger.removeHandler, self.handler)
+
+    def test_oldest_records_are_dropped(self):
+        for i in range(20):
+            self.logger.info('message {}'.format(i))
+
+        lines = self.handler.getvalue().splitlines()
+        assert lines[0] == '[{} earlier log records dropped]'.format(self.handler.dropped)
+        assert lines[-1] == 'INFO message 19'
+        assert sum(len(line) + 1 for line in lines[1:]) <= 200
+
+        records = self.handler.records()
+        assert records[0]['message'] == lines[0]
+        assert records[-1]['message'] == 'message 19'
+        assert records[-1]['level'] == 'INFO'
+        assert records[-1]['function'] == 'test_oldest_records_are_dropped'
+
+    def test_long_record_is_truncated(self):
+        self.logger.debug('x' * 100)
+
+        assert self.handler.getvalue() == 'DEBUG {}... [truncated 56 characters]\n'.format('x' * 44)
+        assert self.handler.records()[0]['message'] == '{}... [truncated 50 characters]'.format('x' * 50)
+
+    def test_logging_info(self):
+        self.logger.info('first')
+        self.logger.info('second')
+
+        result = {}
+        update_logging_info(result, self.handler, 'error')
+        assert result == {'stdout': 'INFO first\nINFO second\n', 'stdout_lines': [], 'stderr': 'error', 'stderr_lines': ['error']}
+
+        update_logging_info(result, self.handler, log_output='lines')
+        assert result['stdout_lines'] == ['INFO first', 'INFO second']
+
+        result = create_return_error(msg='failed', stdout=self.handler, log_output='records')
+        assert result['stdout'] == '' and result['stdout_lines'] == []
+        assert [record['message'] for record in result['log_records']] == ['first', 'second']
+
+    def test_setup_logging(self):
+        handler = RingBufferLogHandler()
+        root = logging.getLogger()
+        previous_handlers, previous_level = root.handlers[:], root.level
+        self.addCleanup(setattr, root, 'handlers', previous_handlers)
+        self.addCleanup(root.setLevel, previous_level)
+
+        setup_logging(handler, 3)
+        logging.getLogger('ansible_collections.community.isva.test').debug('captured')
+
+        assert root.handlers == [handler]
+        assert handler.records()[0]['message'] == 'captured'
+        assert '[DEBUG] [ansible_collections.community.isva.test]' in handler.getvalue()
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2022, Cédric Servais <cedric.servais@outlook.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+
+__metaclass__ = type
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from ansible_collections.community.isva.plugins.modules import isva_docker_publish
+from ansible_collections.community.isva.plugins.module_utils import isva_pending_changes
+
+DOCKER_PUBLISH = 'ansible_collections.community.isva.plugins.module_utils.isva_docker_publish'
+
+
+@pytest.fixture
+def module_mock():
+    module = MagicMock()
+    module._socket_path = 'fake_socket'
+    module.check_mode = False
+    module.params = {'state': 'published', 'fingerprint': 'v1', 'force': False}
+    yield module
+
+
+@pytest.fixture
+def appliance(tmp_path):
+    """Publish a new snapshot on every PUT, serve the snapshots and the LMI start time."""
+    snapshots = []
+    published = []
+    lmi = {'start_time': '2022-06-01T22:02:52Z'}
+
+    def publish(module):
+        published.append('isva_{}_published.snapshot'.format(len(published)))
+        snapshots.append(published[-1])
+        return {'filename': published[-1]}
+
+    def send_requests(batch):
+        return [{'code': 200, 'contents': [{'name': name, 'type': 'File', 'sha256': name} for name in snapshots]},
+                {'code': 200, 'contents': [dict(lmi)]}]
+
+    with patch(DOCKER_PUBLISH + '.PUBLISH_STATE_FILE', str(tmp_path / 'publish.json')), \
+            patch(DOCKER_PUBLISH + '.Connection') as connection_class, \
+            patch('ansible_collections.community.isva.plugins.modules.isva_docker_publish.publish_configuration', side_effect=publish):
+        connection_class.return_value.get_option.side_effect = {'host': 'isva.example.com', 'port': 443}.get
+        connection_class.return_value.send_requests.side_effect = send_requests
+        yield snapshots, published, lmi
+
+
+def test_unchanged_configuration_is_not_published_again(module_mock, appliance):
+    assert isva_docker_publish.exec_module(module_mock)['changed']
+    result = isva_docker_publish.exec_module(module_mock)
+
+    assert not result['changed']
+    assert result['diff']['after'] == {'filename': 'isva_0_published.snapshot'}
+    assert len(appliance[1]) == 1
+
+
+def test_configuration_is_published_after_lmi_restart(module_mock, appliance):
+    isva_docker_publish.exec_module(module_mock)
+    appliance[2]['start_time'] = '2022-06-02T08:00:00Z'  # Deployed changes restarted the LMI.
+
+    assert isva_docker_publish.exec_module(module_mock)['changed']
+    assert not isva_docker_publish.exec_module(module_mock)['changed']
+    assert len(appliance[1]) == 2
+
+
+def test_configuration_is_published_after_deploy(module_mock, appliance, tmp_path):
+    isva_docker_publish.exec_module(module_mock)
+
+    with patch('ansible_collections.community.isva.plugins.module_utils.isva_utils.FACTS_CACHE_FILE', str(tmp_path / 'facts.json')), \
+            patch('ansible_collections.community.isva.plugins.module_utils.isva_pending_changes.Connection') as connection_class:
+        connection_class.return_value.get_option.side_effect = {'host': 'isva.example.com', 'port': 443}.get
+        connection_class.return_value.send_request.return_value = {'code': 200, 'contents': {}}
+        isva_pending_changes.deploy_changes(module_mock)  # The LMI start time is unchanged.
+
+    assert isva_docker_publish.exec_module(module_mock)['changed']
+    assert not isva_docker_publish.exec_module(module_mock)['changed']
+    assert len(appliance[1]) == 2
+
+
+def test_configuration_is_always_published_without_fingerprint(module_mock, appliance):
+    module_mock.params['fingerprint'] = None
+
+    assert isva_docker_publish.exec_module(module_mock)['changed']
+    assert isva_docker_publish.exec_module(module_mock)['changed']
+    assert len(appliance[1]) == 2
+
+
+def test_configuration_is_published_when_fingerprint_or_snapshot_differs(module_mock, appliance):
+    isva_docker_publish.exec_module(module_mock)
+    module_mock.params['fingerprint'] = 'v2'
+    assert isva_docker_publish.exec_module(module_mock)['changed']
+
+    appliance[0].remove('isva_1_published.snapshot')
+    assert isva_docker_publish.exec_module(module_mock)['changed']
+
+    module_mock.params['force'] = True
+    assert isva_docker_publish.exec_module(module_mock)['changed']
+    assert len(appliance[1]) == 4
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2022, Cédric Servais <cedric.servais@outlook.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+
+__metaclass__ = type
+
+import json
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from ansible_collections.community.isva.plugins.modules import isva_dsc_config, isva_pending_changes
+from ansible_collections.community.isva.tests.utils.mock_appliance import MockAppliance, connect
+from ansible_collections.community.isva.tests.utils.module_runner import RecordingConnection, connected
+
+PENDING_CHANGES = 'ansible_collections.community.isva.plugins.modules.isva_pending_changes'
+
+
+@pytest.fixture
+def module_mock():
+    module = MagicMock()
+    module._socket_path = 'fake_socket'
+    module.check_mode = False
+    module._diff = False
+    module.params = {'state': 'deployed', 'deferred': True, 'wait': False, 'wait_for_restart': False, 'wait_timeout': 600}
+    yield module
+
+
+@patch(PENDING_CHANGES + '.forget_deploy_requests')
+@patch(PENDING_CHANGES + '.deploy_changes')
+@patch(PENDING_CHANGES + '.fetch_pending_changes', return_value={'changes': [{'policy': 'dsc'}]})
+@patch(PENDING_CHANGES + '.count_pending_changes', return_value={'count': 1})
+@patch(PENDING_CHANGES + '.fetch_deploy_requests', return_value=[])
+def test_deferred_deploy_without_request_deploys_pending_changes(fetch_deploy_requests, count_pending_changes, fetch_pending_changes,
+                                                                 deploy_changes, forget_deploy_requests, module_mock):
+    # The requests are lost when the persistent connection expires, the pending changes are deployed nonetheless.
+    result = isva_pending_changes.exec_module(module_mock)
+
+    assert result['changed']
+    assert result['deploy_requests'] == []
+    deploy_changes.assert_called_once_with(module=module_mock)
+
+
+@patch(PENDING_CHANGES + '.forget_deploy_requests')
+@patch(PENDING_CHANGES + '.deploy_changes')
+@patch(PENDING_CHANGES + '.fetch_pending_changes')
+@patch(PENDING_CHANGES + '.count_pending_changes', return_value={'count': 0})
+@patch(PENDING_CHANGES + '.fetch_deploy_requests', return_value=['isva_dsc_config'])
+def test_deferred_deploy_skipped_without_pending_changes(fetch_deploy_requests, count_pending_changes, fetch_pending_changes, deploy_changes,
+                                                         forget_deploy_requests, module_mock):
+    result = isva_pending_changes.exec_module(module_mock)
+
+    assert not result['changed']
+    assert result['deploy_requests'] == ['isva_dsc_config']
+    fetch_pending_changes.assert_not_called()
+    deploy_changes.assert_not_called()
+
+
+@pytest.mark.parametrize('state', ['deployed', 'rollbacked'])
+@patch(PENDING_CHANGES + '.rollback_changes')
+@patch(PENDING_CHANGES + '.deploy_changes')
+@patch(PENDING_CHANGES + '.fetch_pending_changes')
+@patch(PENDING_CHANGES + '.count_pending_changes', return_value={'count': 0})
+def test_only_count_is_fetched_without_pending_changes(count_pending_changes, fetch_pending_changes, deploy_changes, rollback_changes,
+                                                      state, module_mock):
+    module_mock.params = {'state': state, 'deferred': False, 'wait': False, 'wait_timeout': 600}
+
+    assert isva_pending_changes.exec_module(module_mock) == {
+        'changed': False, 'diff': {'before': {'changes': []}, 'after': {'changes': []}}
+    }
+    fetch_pending_changes.assert_not_called()
+    deploy_changes.assert_not_called()
+    rollback_changes.assert_not_called()
+
+
+@patch(PENDING_CHANGES + '.fetch_pending_changes', return_value={'changes': []})
+@patch(PENDING_CHANGES + '.count_pending_changes', return_value={'count': 0})
+def test_changes_are_fetched_for_diff(count_pending_changes, fetch_pending_changes, module_mock):
+    module_mock.params = {'state': 'rollbacked', 'deferred': False, 'wait': False, 'wait_timeout': 600}
+    module_mock._diff = True
+
+    isva_pending_changes.exec_module(module_mock)
+
+    fetch_pending_changes.assert_called_once_with(module=module_mock)
+
+
+@patch(PENDING_CHANGES + '.forget_deploy_requests')
+@patch(PENDING_CHANGES + '.deploy_changes')
+@patch(PENDING_CHANGES + '.fetch_pending_changes', return_value={'changes': [{'policy': 'dsc'}, {'policy': 'hvdb'}]})
+@patch(PENDING_CHANGES + '.count_pending_changes', return_value={'count': 2})
+@patch(PENDING_CHANGES + '.fetch_deploy_requests', return_value=['isva_dsc_config', 'isva_database_config'])
+def test_deferred_deploys_are_coalesced(fetch_deploy_requests, count_pending_changes, fetch_pending_changes, deploy_changes,
+                                        forget_deploy_requests, module_mock):
+    result = isva_pending_changes.exec_module(module_mock)
+
+    assert result['changed']
+    assert result['deploy_requests'] == ['isva_dsc_config', 'isva_database_config']
+    deploy_changes.assert_called_once_with(module=module_mock)
+    forget_deploy_requests.assert_called_once_with(module=module_mock, requests=['isva_dsc_config', 'isva_database_config'])
+
+
+@patch(PENDING_CHANGES + '.forget_deploy_requests')
+@patch(PENDING_CHANGES + '.deploy_changes', side_effect=Exception('The deploy failed'))
+@patch(PENDING_CHANGES + '.fetch_pending_changes', return_value={'changes': [{'policy': 'dsc'}]})
+@patch(PENDING_CHANGES + '.count_pending_changes', return_value={'count': 1})
+@patch(PENDING_CHANGES + '.fetch_deploy_requests', return_value=['isva_dsc_config'])
+def test_failed_deploy_keeps_requests(fetch_deploy_requests, count_pending_changes, fetch_pending_changes, deploy_changes,
+                                      forget_deploy_requests, module_mock):
+    with pytest.raises(Exception, match='The deploy failed'):
+        isva_pending_changes.exec_module(module_mock)
+
+    forget_deploy_requests.assert_not_called()
+
+
+@patch('ansible_collections.community.isva.plugins.modules.isva_dsc_config.request_deploy')
+@patch('ansible_collections.community.isva.plugins.modules.isva_dsc_config.update_dsc_configuration', return_value={})
+@patch('ansible_collections.community.isva.plugins.modules.isva_dsc_config.fetch_dsc_configuration')
+def test_config_module_requests_deferred_deploy(fetch_dsc_configuration, update_dsc_configuration, request_deploy, module_mock):
+    fetch_dsc_configuration.return_value = {
+        'worker_threads': 64, 'max_session_lifetime': 3600, 'client_grace': 600, 'connection_idle_timeout': 0,
+        'service_port': 443, 'replication_port': 444, 'servers': []
+    }
+    module_mock.params = {'state': 'replaced', 'deferred_deploy': True, 'dsc': {
+        'worker_threads': 128, 'max_session_lifetime': 3600, 'client_grace': 600, 'connection_idle_timeout': 0,
+        'service_port': 443, 'replication_port': 444, 'servers': []
+    }}
+
+    assert isva_dsc_config.exec_module(module_mock)['changed']
+    request_deploy.assert_called_once_with(module=module_mock, reason='isva_dsc_config')
+
+
+@patch(PENDING_CHANGES + '.wait_for_deploy', return_value=12.5)
+@patch(PENDING_CHANGES + '.deploy_changes')
+@patch(PENDING_CHANGES + '.fetch_start_time', return_value='2022-06-01 22:02:52')
+@patch(PENDING_CHANGES + '.fetch_pending_changes', return_value={'changes': [{'policy': 'dsc'}]})
+@patch(PENDING_CHANGES + '.count_pending_changes', return_value={'count': 1})
+def test_deploy_waits_for_appliance(count_pending_changes, fetch_pending_changes, fetch_start_time, deploy_changes, wait_for_deploy,
+                                    module_mock):
+    module_mock.params = {'state': 'deployed', 'deferred': False, 'wait': True, 'wait_for_restart': True, 'wait_timeout': 300}
+
+    result = isva_pending_changes.exec_module(module_mock)
+
+    assert result['changed'] and result['waited'] == 12.5
+    wait_for_deploy.assert_called_once_with(module=module_mock, timeout=300, start_time='2022-06-01 22:02:52')
+
+
+@patch(PENDING_CHANGES + '.fetch_start_time')
+def test_deploy_waits_without_lmi_restart(fetch_start_time, module_mock):
+    module_mock.params = {'state': 'deployed', 'deferred': False, 'wait': True, 'wait_for_restart': False, 'wait_timeout': 5}
+
+    with MockAppliance() as appliance:  # The deploy doesn't restart the LMI, its start time doesn't change.
+        plugin = connect(appliance)
+        plugin.send_request('/isam/dsc/config', method='PUT', payload=json.dumps({'worker_threads': 32}))
+        start_time = plugin.send_request('/lmi')['contents'][0]['start_time']
+        with connected(RecordingConnection(plugin)):
+            result = isva_pending_changes.exec_module(module_mock)
+
+        assert plugin.send_request('/lmi')['contents'][0]['start_time'] == start_time
+
+    assert result['changed'] and result['waited'] < 5
+    fetch_start_time.assert_not_called()
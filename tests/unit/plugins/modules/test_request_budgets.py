@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2022, Cédric Servais <cedric.servais@outlook.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+""" The number of requests each module sends to the appliance, per state, is capped by a budget. A change sending
+more requests than the budget of a module fails these tests, raise the budget only when the extra round-trips are
+needed.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+
+__metaclass__ = type
+
+import json
+import os
+import pkgutil
+
+import pytest
+from unittest.mock import patch
+
+from ansible_collections.community.isva.plugins import modules
+from ansible_collections.community.isva.tests.benchmarks.run_benchmarks import FACTS_MODULES, MODULE_CASES
+from ansible_collections.community.isva.tests.utils.mock_appliance import MockAppliance, connect
+from ansible_collections.community.isva.tests.utils.module_runner import RecordingConnection, run_module
+
+MODULE_UTILS = 'ansible_collections.community.isva.plugins.module_utils'
+
+FILE_COUNT = 3
+
+# The modules which don't send requests of their own: isva_batch runs other modules, which have their budget.
+UNBUDGETED_MODULES = ['isva_batch']
+
+DSC = {
+    'worker_threads': 32, 'max_session_lifetime': 7200, 'client_grace': 300, 'connection_idle_timeout': 0,
+    'service_port': 443, 'replication_port': 444,
+    'servers': [{'ip': '10.0.0.1', 'service_port': 443, 'replication_port': 444}]
+}
+
+HVDB = {
+    'db_type': 'postgresql', 'address': 'db.example.com', 'port': 5432, 'user': 'isva', 'password': 'secret',
+    'db_name': 'isva', 'secure': True, 'failover_servers': [{'address': 'db1.example.com', 'port': 5432, 'order': 1}]
+}
+
+
+def _shared_volumes_files(tmpdir):
+    return [{'path': 'fixpacks', 'name': 'fixpack_{}.fixpack'.format(i), 'dest': os.path.join(tmpdir, 'fixpack_{}'.format(i))}
+            for i in range(FILE_COUNT)]
+
+
+def _import_files(tmpdir):
+    files = []
+    for i in range(FILE_COUNT):
+        src = os.path.join(tmpdir, 'support_{}.zip'.format(i))
+        with open(src, 'wb') as f:
+            f.write('support file {}'.format(i).encode())
+        files.append({'path': 'support', 'src': src})
+    return files
+
+
+def _file_downloads_files(tmpdir):
+    return [{'path': 'isam/downloads_{}.zip'.format(i), 'dest': os.path.join(tmpdir, 'downloads_{}.zip'.format(i))}
+            for i in range(FILE_COUNT)]
+
+
+def _add_pending_change(plugin):
+    plugin.send_request('/isam/dsc/config', method='PUT', payload=json.dumps({'worker_threads': 64}))
+
+
+# (module, state, args, budget, setup): the maximum number of requests sent by the module for a state. The setup
+# runs unrecorded before the module: converge runs the module once so that the appliance is already in the wanted
+# state, pending_change leaves a change to deploy.
+BUDGETS = [
+    ('isva_facts', 'gathered', lambda tmpdir: {}, 10, None),
+    ('isva_facts', 'gathered_cached', lambda tmpdir: {'cache': True}, 2, 'converge'),
+    ('isva_service_agreements', 'replaced', lambda tmpdir: {'state': 'replaced', 'accepted': True}, 2, None),
+    ('isva_service_agreements', 'replaced_unchanged', lambda tmpdir: {'state': 'replaced', 'accepted': True}, 1, 'converge'),
+    ('isva_setup_complete', 'replaced', lambda tmpdir: {'state': 'replaced', 'configured': True}, 2, None),
+    ('isva_setup_complete', 'replaced_unchanged', lambda tmpdir: {'state': 'replaced', 'configured': True}, 1, 'converge'),
+    ('isva_docker_stop', 'stopped', lambda tmpdir: {'state': 'stopped'}, 1, None),
+    ('isva_pending_changes', 'gathered', lambda tmpdir: {'state': 'gathered'}, 1, None),
+    ('isva_pending_changes', 'deployed', lambda tmpdir: {'state': 'deployed'}, 3, 'pending_change'),
+    ('isva_pending_changes', 'rollbacked', lambda tmpdir: {'state': 'rollbacked'}, 3, 'pending_change'),
+    ('isva_deploy_wait', 'ready', lambda tmpdir: {}, 2, None),
+    ('isva_dsc_config', 'gathered', lambda tmpdir: {'state': 'gathered'}, 1, None),
+    ('isva_dsc_config', 'replaced', lambda tmpdir: {'state': 'replaced', 'dsc': DSC}, 2, None),
+    ('isva_dsc_config', 'replaced_unchanged', lambda tmpdir: {'state': 'replaced', 'dsc': DSC}, 1, 'converge'),
+    ('isva_database_config', 'gathered', lambda tmpdir: {'state': 'gathered'}, 1, None),
+    ('isva_database_config', 'replaced', lambda tmpdir: {'state': 'replaced', 'hvdb': HVDB}, 2, None),
+    ('isva_database_config', 'replaced_unchanged', lambda tmpdir: {'state': 'replaced', 'hvdb': HVDB}, 1, 'converge'),
+    ('isva_docker_publish', 'published', lambda tmpdir: {'state': 'published', 'force': True}, 1, None),
+    ('isva_docker_publish', 'published_unchanged', lambda tmpdir: {'state': 'published', 'fingerprint': 'v1'}, 2, 'converge'),
+    ('isva_shared_volumes_fetch', 'fetch', lambda tmpdir: {'files': _shared_volumes_files(tmpdir)}, 1 + FILE_COUNT, None),
+    ('isva_shared_volumes_fetch', 'fetch_unchanged', lambda tmpdir: {'files': _shared_volumes_files(tmpdir)}, 1, 'converge'),
+    ('isva_shared_volumes_import', 'import', lambda tmpdir: {'files': _import_files(tmpdir)}, 1 + FILE_COUNT, None),
+    ('isva_shared_volumes_import', 'import_unchanged', lambda tmpdir: {'files': _import_files(tmpdir)}, 1, 'converge'),
+    ('isva_file_downloads_fetch', 'fetch', lambda tmpdir: {'files': _file_downloads_files(tmpdir)}, 1 + FILE_COUNT, None),
+    ('isva_file_downloads_fetch', 'fetch_unchanged',
+     lambda tmpdir: {'files': _file_downloads_files(tmpdir), 'compare': 'metadata'}, 1, 'converge'),
+] + [(module, 'gathered', lambda tmpdir: {}, 1, None) for module in FACTS_MODULES]
+
+
+@pytest.fixture(autouse=True)
+def local_state(tmp_path):
+    with patch(MODULE_UTILS + '.isva_utils.DIGEST_CACHE_FILE', str(tmp_path / 'digests.json')), \
+            patch(MODULE_UTILS + '.isva_utils.FACTS_CACHE_FILE', str(tmp_path / 'facts.json')), \
+            patch(MODULE_UTILS + '.isva_docker_publish.PUBLISH_STATE_FILE', str(tmp_path / 'publish.json')):
+        yield
+
+
+@pytest.fixture
+def plugin():
+    with MockAppliance(file_count=FILE_COUNT) as appliance:
+        yield connect(appliance)
+
+
+def assert_within_budget(connection, budget):
+    assert connection.request_count <= budget, 'The module sent {} requests, its budget is {}: {}'.format(
+        connection.request_count, budget, connection.calls)
+
+
+def _module_names():
+    return sorted(info.name for info in pkgutil.iter_modules(modules.__path__) if info.name not in UNBUDGETED_MODULES)
+
+
+def test_every_module_has_a_budget():
+    assert sorted(set(budget[0] for budget in BUDGETS)) == _module_names()
+
+
+def test_every_module_is_benchmarked():
+    assert sorted(set(case[0] for case in MODULE_CASES)) == _module_names()
+
+
+@pytest.mark.parametrize('module, state, args, budget, setup', BUDGETS, ids=['{}-{}'.format(*b) for b in BUDGETS])
+def test_module_within_request_budget(module, state, args, budget, setup, plugin, tmp_path):
+    args = args(str(tmp_path))
+    if setup == 'converge':
+        run_module(module, args, plugin, tmpdir=str(tmp_path))
+    elif setup == 'pending_change':
+        _add_pending_change(plugin)
+
+    connection = RecordingConnection(plugin)
+    run_module(module, args, connection, tmpdir=str(tmp_path))
+
+    assert_within_budget(connection, budget)
+
+
+def test_budget_counts_batched_requests(plugin, tmp_path):
+    connection = RecordingConnection(plugin)
+    run_module('isva_shared_volumes_fetch', {'files': _shared_volumes_files(str(tmp_path)), 'parallelism': FILE_COUNT}, connection,
+               tmpdir=str(tmp_path))
+
+    assert [call['method'] for call in connection.calls] == ['send_requests', 'download_files']
+    assert connection.request_count == 1 + FILE_COUNT
+    with pytest.raises(AssertionError, match='sent 4 requests, its budget is 3'):
+        assert_within_budget(connection, 3)
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2022, Cédric Servais <cedric.servais@outlook.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+
+__metaclass__ = type
+
+import hashlib
+import json
+import time
+
+import pytest
+
+from ansible_collections.community.isva.tests.utils.mock_appliance import MockAppliance, connect
+
+@pytest.fixture
+def appliance():
+    with MockAppliance(file_count=3, file_size=100 * 1024) as appliance:
+        yield appliance
+
+
+def test_lists_and_exports_shared_volume_files(appliance, tmp_path):
+    plugin = connect(appliance)
+
+    listing = plugin.send_request('/shared_volume/fixpacks?recursive=False')
+    assert listing['code'] == 200
+    assert [entry['name'] for entry in listing['contents']] == ['fixpack_0.fixpack', 'fixpack_1.fixpack', 'fixpack_2.fixpack']
+
+    dest = tmp_path / 'fixpack_0.fixpack'
+    dest.write_bytes(appliance.state.volumes['fixpacks']['fixpack_0.fixpack'].content[:1000])
+    response = plugin.download_file('/shared_volume/fixpacks/fixpack_0.fixpack?type=File&export', str(dest), headers={}, resume=True)
+
+    assert response['resumed'] is True
+    assert response['size'] == 100 * 1024
+    assert response['sha256'] == listing['contents'][0]['sha256']
+    assert appliance.stats()['bytes_sent'] >= 100 * 1024 - 1000
+
+
+def test_uploads_shared_volume_file(appliance, tmp_path):
+    plugin = connect(appliance)
+    src = tmp_path / 'support.zip'
+    src.write_bytes(b'\x00support\r\nfile\xff')
+
+    response = plugin.upload_file('/shared_volume/support/support.zip', str(src), fields={'force': 'false'})
+    assert response['code'] == 200
+    assert plugin.upload_file('/shared_volume/support/support.zip', str(src), fields={'force': 'false'})['code'] == 400
+
+    entry = plugin.send_request('/shared_volume/support?recursive=False')['contents'][0]
+    assert entry['sha256'] == hashlib.sha256(b'\x00support\r\nfile\xff').hexdigest()
+
+
+def test_lists_and_downloads_file_downloads(appliance, tmp_path):
+    plugin = connect(appliance)
+
+    listing = plugin.send_request('/isam/downloads?recursive=True')['contents']
+    assert listing[0]['name'] == 'isam'
+    assert [entry['name'] for entry in listing[0]['children']] == ['downloads_0.zip', 'downloads_1.zip', 'downloads_2.zip']
+    assert plugin.send_request('/isam/downloads?recursive=False')['contents'][0]['children'] == []
+    assert plugin.send_request('/isam/downloads/missing?recursive=True')['code'] == 404
+
+    response = plugin.download_file('/isam/downloads/isam/downloads_1.zip', str(tmp_path / 'downloads_1.zip'), headers={})
+    assert response['code'] == 200
+    assert response['size'] == listing[0]['children'][1]['size']
+
+
+def test_config_changes_are_pending_until_deployed():
+    with MockAppliance(deploy_time=0.2, lmi_restart=True) as appliance:
+        plugin = connect(appliance)
+
+        assert plugin.send_request('/isam/dsc/config', method='PUT', payload=json.dumps({'worker_threads': 32}))['code'] == 204
+        assert plugin.send_request('/isam/cluster/v2', method='PUT', payload=json.dumps({'hvdb_port': 5432}))['code'] == 200
+        assert plugin.send_request('/isam/dsc/config')['contents']['worker_threads'] == 32
+        assert len(plugin.send_request('/isam/pending_changes')['contents']['changes']) == 2
+
+        start_time = plugin.send_request('/lmi')['contents'][0]['start_time']
+        assert plugin.send_request('/isam/pending_changes', method='PUT')['code'] == 200
+        assert plugin.send_request('/isam/pending_changes/count')['contents'] == {'count': 2}
+
+        time.sleep(0.3)
+        assert plugin.send_request('/isam/pending_changes/count')['contents'] == {'count': 0}
+        assert plugin.send_request('/lmi')['contents'][0]['start_time'] > start_time
+
+
+def test_publish_creates_snapshot(appliance):
+    plugin = connect(appliance)
+
+    response = plugin.send_request('/docker/publish', method='PUT')
+    assert response['code'] == 201
+
+    snapshots = plugin.send_request('/shared_volume/snapshots?recursive=False')['contents']
+    assert [entry['name'] for entry in snapshots] == [response['contents']['filename']]
+
+
+def test_injects_failures_and_counts_requests():
+    with MockAppliance(failures={'/isam/dsc': 503}, failure_rate=1.0, seed=1) as appliance:
+        plugin = connect(appliance)
+
+        assert plugin.send_request('/isam/dsc/config') == {'code': 503, 'contents': {'message': 'Injected failure for /isam/dsc/config'}}
+        assert plugin.send_request('/lmi')['code'] == 500
+
+        stats = appliance.stats()
+        assert stats['total'] == 2
+        assert stats['failures'] == 2
+        assert stats['requests'] == {'GET /isam/dsc/config': 1, 'GET /lmi': 1}
+
+        appliance.reset_stats()
+        assert appliance.stats()['total'] == 0
+
+
+def test_serves_requests_concurrently():
+    with MockAppliance(latency=0.2, latencies={'/lmi': 0.0}) as appliance:
+        plugin = connect(appliance, max_concurrent_requests=4)
+
+        start = time.time()
+        responses = plugin.send_requests([{'path': '/isam/pending_changes/count'} for _ in range(4)])
+        elapsed = time.time() - start
+
+        assert all(response['code'] == 200 for response in responses)
+        assert elapsed < 0.6
+        assert appliance.stats()['max_concurrent_requests'] == 4
@@ -0,0 +1,644 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2022, Cédric Servais <cedric.servais@outlook.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+""" A local stand-in for the LMI of an ISVA appliance, to measure the latency and the number of requests of the
+modules without a real appliance.
+
+Only the endpoints used by the collection are implemented, with an in-memory state:
+  /lmi, /isam/pending_changes, /shared_volume, /isam/downloads, /isam/dsc/config, /isam/cluster/v2, /docker/publish,
+  /docker/stop, /setup_service_agreements/accepted, /setup_complete
+and the read-only endpoints of the facts modules, answered with the content of FACTS_ENDPOINTS.
+
+The response latency, the size of the files and of the listings and the failures are configurable. The requests
+received are counted, the counters are served as JSON by GET /__mock__/stats and reset by POST /__mock__/reset.
+
+Run it with:
+    python tests/utils/mock_appliance.py --port 8080 --latency 0.05 --files 100 --file-size 1048576
+
+and point the httpapi connection to it, e.g. with the host variables:
+    ansible_connection: httpapi
+    ansible_network_os: community.isva.isva
+    ansible_host: 127.0.0.1
+    ansible_httpapi_port: 8080
+    ansible_httpapi_use_ssl: false
+"""
+
+from __future__ import (absolute_import, division, print_function)
+
+__metaclass__ = type
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import ssl
+import threading
+import time
+from collections import Counter
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from urllib.error import HTTPError
+from urllib.parse import parse_qs, urlsplit
+
+from ansible.module_utils.six import BytesIO
+from ansible.module_utils.urls import open_url
+
+SHARED_VOLUME_PATHS = ['fixpacks', 'snapshots', 'support']
+MOCK_PREFIX = '/__mock__'
+CHUNK_SIZE = 64 * 1024
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+DEFAULT_DSC_CONFIG = {
+    'worker_threads': 64,
+    'max_session_lifetime': 3600,
+    'client_grace': 600,
+    'connection_idle_timeout': 0,
+    'service_port': 443,
+    'replication_port': 444,
+    'servers': []
+}
+
+DEFAULT_CLUSTER_CONFIG = {
+    'primary_master': '127.0.0.1',
+    'hvdb_embedded': True,
+    'hvdb_db_type': 'postgresql',
+    'hvdb_address': '',
+    'hvdb_port': 0,
+    'hvdb_failover_servers': []
+}
+
+# The read-only endpoints queried by the facts modules, with their content.
+FACTS_ENDPOINTS = {
+    '/core/sys/versions': {'firmware_version': '10.0.3.1', 'firmware_label': 'isva_10.0.3.1', 'deployment_model': 'Docker',
+                           'product_name': 'isva', 'product_description': 'IBM Security Verify Access'},
+    '/licenses': [],
+    '/extensions': [{'id': 'extension_1', 'name': 'Extension', 'desc': 'A mocked extension', 'date': '2022-06-01T22:02:52Z'}],
+    '/fixpacks': [],
+    '/fixpacks/fipsmode': [],
+    '/admin_cfg': {'minHeapSize': 512, 'maxHeapSize': 2048, 'sessionTimeout': 30, 'sessionInactiveTimeout': 30},
+    '/adv_params': {'tuningParameters': [{'key': 'wga_rte.embedded.ldap.ssl.port', 'value': '636', 'comment': ''}]},
+    '/isam/applang/v1': {'id': 'en'},
+    '/isam/capabilities/v1': [{'id': 'wga', 'name': 'Web Gateway', 'enabled': True, 'description': 'Web Gateway'}],
+}
+
+
+def _timestamp(seconds=None):
+    return time.strftime(TIMESTAMP_FORMAT, time.gmtime(seconds))
+
+
+def generate_content(name, size):
+    """ Return size bytes of content, different for each name so that the files don't share the same sha256.
+    """
+    seed = hashlib.sha256(name.encode('utf-8')).digest()
+    return (seed * (size // len(seed) + 1))[:size]
+
+
+class MockFile(object):
+    def __init__(self, content, modified=None):
+        self.content = content
+        self.modified = modified or _timestamp()
+        self.sha256 = hashlib.sha256(content).hexdigest()
+
+    def to_entry(self, name, sha256=True):
+        entry = {'name': name, 'type': 'File', 'size': len(self.content), 'modified': self.modified}
+        if sha256:
+            entry['sha256'] = self.sha256
+        return entry
+
+
+class MockApplianceState(object):
+    """ The configuration, the pending changes and the files of the mocked appliance.
+    """
+
+    def __init__(self, file_count=10, file_size=1024, deploy_time=0.0, lmi_restart=False):
+        self.lock = threading.Lock()
+        self.deploy_time = deploy_time
+        self.lmi_restart = lmi_restart
+        self.started = time.time()
+        self.start_time = _timestamp(self.started)
+        self.deployed_at = None
+        self.deploying = 0
+        self.changes = []
+        self.service_agreements_accepted = False
+        self.setup_complete = False
+        self.dsc_config = json.loads(json.dumps(DEFAULT_DSC_CONFIG))
+        self.cluster_config = json.loads(json.dumps(DEFAULT_CLUSTER_CONFIG))
+        self.volumes = dict((path, {}) for path in SHARED_VOLUME_PATHS)
+        self.downloads = {}
+
+        for i in range(file_count):
+            name = 'fixpack_{}.fixpack'.format(i)
+            self.volumes['fixpacks'][name] = MockFile(generate_content(name, file_size))
+            name = 'isam/downloads_{}.zip'.format(i)
+            self.downloads[name] = MockFile(generate_content(name, file_size))
+
+    def add_change(self, policy, user='admin'):
+        self.changes.append({'id': len(self.changes) + 1, 'policy': policy, 'user': user, 'date': _timestamp()})
+
+    def _settle_deploy(self):
+        if self.deploying and time.time() - self.deployed_at >= self.deploy_time:
+            self.deploying = 0
+            if self.lmi_restart:
+                self.started = max(time.time(), self.started + 1)
+                self.start_time = _timestamp(self.started)
+
+    def pending_count(self):
+        """ The deployed changes are still reported as pending while the deploy is running.
+        """
+        self._settle_deploy()
+        return self.deploying or len(self.changes)
+
+    def lmi_start_time(self):
+        self._settle_deploy()
+        return self.start_time
+
+    def download_listing(self, prefix, recursive):
+        """ The files and directories of the file downloads below prefix, in the format of the appliance, None when
+        prefix doesn't exist.
+        """
+        tree = {}
+        for path, mock_file in self.downloads.items():
+            parts = path.split('/')
+            node = tree
+            for part in parts[:-1]:
+                node = node.setdefault(part, {})
+            node[parts[-1]] = mock_file
+
+        for part in prefix.split('/') if prefix else []:
+            tree = tree.get(part)
+            if not isinstance(tree, dict):
+                return None
+        return self._download_entries(tree, recursive)
+
+    def _download_entries(self, node, recursive):
+        entries = []
+        for name, child in sorted(node.items()):
+            if isinstance(child, MockFile):
+                entries.append(child.to_entry(name, sha256=False))
+            else:
+                entries.append({'name': name, 'type': 'Directory',
+                                'children': self._download_entries(child, recursive) if recursive else []})
+        return entries
+
+    def volume_listing(self, path, recursive):
+        if path:
+            return [f.to_entry(name) for name, f in sorted(self.volumes[path].items())]
+        return [{'name': name, 'type': 'Directory',
+                 'children': [f.to_entry(n) for n, f in sorted(files.items())] if recursive else []}
+                for name, files in sorted(self.volumes.items())]
+
+
+class MockApplianceHandler(BaseHTTPRequestHandler):
+    server_version = 'MockISVA/1.0'
+    disable_nagle_algorithm = True  # The headers and the body are written separately.
+
+    def log_message(self, format, *args):
+        if self.server.appliance.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+    def _handle(self, method):
+        appliance = self.server.appliance
+        url = urlsplit(self.path)
+        path = url.path.rstrip('/') or '/'
+        query = parse_qs(url.query, keep_blank_values=True)
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+        if path.startswith(MOCK_PREFIX):
+            return self._handle_mock(method, path)
+
+        appliance.request_started(method, path, len(body))
+        try:
+            time.sleep(appliance.latency_for(path))
+            failure = appliance.failure_for(path)
+            if failure:
+                return self._send_json(failure, {'message': 'Injected failure for {}'.format(path)})
+            self._route(method, path, query, body)
+        finally:
+            appliance.request_finished()
+
+    def _handle_mock(self, method, path):
+        appliance = self.server.appliance
+        if method == 'GET' and path == MOCK_PREFIX + '/stats':
+            return self._send_json(200, appliance.stats())
+        if method == 'POST' and path == MOCK_PREFIX + '/reset':
+            appliance.reset_stats()
+            return self._send_json(204)
+        return self._send_json(404, {'message': 'Unknown mock endpoint {}'.format(path)})
+
+    def _route(self, method, path, query, body):
+        """ Serve the request from the state, the lock is only held while reading or updating it, the responses are
+        sent outside of it so that the requests are served concurrently.
+        """
+        state = self.server.appliance.state
+        with state.lock:
+            code, contents = self._respond(method, path, query, body, state)
+
+        if isinstance(contents, bytes):
+            return self._send_file(contents)
+        return self._send_json(code, contents)
+
+    def _respond(self, method, path, query, body, state):
+        if path == '/lmi' and method == 'GET':
+            return 200, [{'start_time': state.lmi_start_time()}]
+
+        if path == '/isam/pending_changes':
+            return self._pending_changes(method, state)
+        if path == '/isam/pending_changes/count' and method == 'GET':
+            return 200, {'count': state.pending_count()}
+
+        if path == '/isam/dsc/config':
+            return self._config(method, body, state, 'dsc_config', 'DSC configuration', 204)
+        if path == '/isam/cluster/v2':
+            return self._config(method, body, state, 'cluster_config', 'Cluster configuration', 200)
+
+        if path in FACTS_ENDPOINTS and method == 'GET':
+            return 200, FACTS_ENDPOINTS[path]
+
+        if path == '/setup_service_agreements/accepted':
+            return self._setting(method, state, 'service_agreements_accepted', 'accepted')
+        if path == '/setup_complete':
+            return self._setting(method, state, 'setup_complete', 'configured')
+
+        if path == '/docker/stop' and method == 'PUT':
+            return 204, None
+
+        if path == '/docker/publish' and method == 'PUT':
+            name = 'isva_{}_published.snapshot'.format(time.strftime('%Y-%m-%d_%H%M%S', time.gmtime()))
+            while name in state.volumes['snapshots']:  # Several publishes within a second.
+                name = name.replace('.snapshot', '_1.snapshot')
+            state.volumes['snapshots'][name] = MockFile(generate_content(name, self.server.appliance.file_size))
+            return 201, {'filename': name}
+
+        if path == '/shared_volume' or path.startswith('/shared_volume/'):
+            return self._shared_volume(method, path[len('/shared_volume/'):], query, body, state)
+
+        if path == '/isam/downloads' or path.startswith('/isam/downloads/'):
+            return self._downloads(method, path[len('/isam/downloads/'):], query, state)
+
+        return 404, {'message': 'Unknown endpoint {} {}'.format(method, path)}
+
+    def _pending_changes(self, method, state):
+        if method == 'GET':
+            return 200, {'changes': list(state.changes)}
+        if method == 'PUT':
+            state.deploying, state.deployed_at, state.changes = len(state.changes), time.time(), []
+            return 200, {'message': 'The changes have been deployed'}
+        if method == 'DELETE':
+            state.changes = []
+            return 200, {'message': 'The changes have been rolled back'}
+        return 405, {'message': 'Method not allowed'}
+
+    def _config(self, method, body, state, attribute, policy, update_code):
+        if method == 'GET':
+            return 200, dict(getattr(state, attribute))
+        if method in ('PUT', 'POST'):
+            try:
+                payload = json.loads(body.decode('utf-8'))
+            except ValueError:
+                return 400, {'message': 'Invalid JSON payload'}
+            getattr(state, attribute).update(payload)
+            state.add_change(policy)
+            return update_code, None
+        return 405, {'message': 'Method not allowed'}
+
+    def _setting(self, method, state, attribute, key):
+        """ The settings of the first steps, which can only be turned on.
+        """
+        if method == 'GET':
+            return 200, {key: getattr(state, attribute)}
+        if method == 'PUT':
+            setattr(state, attribute, True)
+            return 200, {key: True}
+        return 405, {'message': 'Method not allowed'}
+
+    def _shared_volume(self, method, path, query, body, state):
+        parts = path.split('/') if path else []
+        if parts and parts[0] not in state.volumes:
+            return 404, {'message': 'Unknown shared volume path {}'.format(parts[0])}
+
+        if len(parts) <= 1:
+            if method != 'GET':
+                return 405, {'message': 'Method not allowed'}
+            recursive = query.get('recursive', ['True'])[0].lower() == 'true'
+            return 200, state.volume_listing(parts[0] if parts else None, recursive)
+
+        directory, name = parts[0], '/'.join(parts[1:])
+        if method == 'GET' and 'export' in query:
+            if name not in state.volumes[directory]:
+                return 404, {'message': 'File not found {}'.format(path)}
+            return 200, state.volumes[directory][name].content
+        if method == 'POST':
+            content, fields = self._parse_upload(body)
+            if content is None:
+                return 400, {'message': 'The file is missing'}
+            if name in state.volumes[directory] and fields.get('force') != 'true':
+                return 400, {'message': 'The file {} already exists'.format(path)}
+            state.volumes[directory][name] = MockFile(content)
+            return 200, {'message': 'The file has been uploaded'}
+        if method == 'DELETE':
+            if state.volumes[directory].pop(name, None) is None:
+                return 404, {'message': 'File not found {}'.format(path)}
+            return 200, {'message': 'The file has been deleted'}
+        return 405, {'message': 'Method not allowed'}
+
+    def _downloads(self, method, path, query, state):
+        if method != 'GET':
+            return 405, {'message': 'Method not allowed'}
+        if path in state.downloads:
+            return 200, state.downloads[path].content
+
+        listing = state.download_listing(path, query.get('recursive', ['True'])[0].lower() == 'true')
+        if listing is None:
+            return 404, {'message': 'File not found {}'.format(path)}
+        return 200, listing
+
+    def _parse_upload(self, body):
+        content_type = self.headers.get('Content-Type', '')
+        message = BytesParser(policy=HTTP).parsebytes(b'Content-Type: ' + content_type.encode('latin-1') + b'\r\n\r\n' + body)
+        content, fields = None, {}
+        if message.is_multipart():
+            for part in message.iter_parts():
+                name = part.get_param('name', header='content-disposition')
+                payload = part.get_payload(decode=True)
+                if name == 'file':
+                    content = payload
+                elif name:
+                    fields[name] = payload.decode('utf-8')
+        return content, fields
+
+    def _send_json(self, code, contents=None):
+        body = json.dumps(contents).encode('utf-8') if contents is not None else b''
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self._write(body)
+
+    def _send_file(self, content):
+        """ Send a file, honouring the open ended byte ranges sent to resume a download.
+        """
+        size = len(content)
+        match = re.match(r'^bytes=(\d+)-$', self.headers.get('Range') or '')
+        start = int(match.group(1)) if match else 0
+        if start and start >= size:
+            return self._send_json(416, {'message': 'Range not satisfiable'})
+
+        self.send_response(206 if start else 200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(size - start))
+        if start:
+            self.send_header('Content-Range', 'bytes {}-{}/{}'.format(start, size - 1, size))
+        self.end_headers()
+        for offset in range(start, size, CHUNK_SIZE):
+            self._write(content[offset:offset + CHUNK_SIZE])
+
+    def _write(self, data):
+        self.wfile.write(data)
+        self.server.appliance.bytes_sent(len(data))
+
+
+class MockAppliance(object):
+    """ The mocked appliance, served by a threaded HTTP server on host:port, port 0 picks a free port.
+
+    latency is the number of seconds every response is delayed by, latencies overrides it for the paths starting
+    with one of its keys. failure_rate is the probability of any request to fail with a 500 error, failures maps path
+    prefixes to the status code returned by every request to them. file_count and file_size give the number and the
+    size of the files of the shared volume and of the file downloads, and of the snapshots created by the publishes.
+    deploy_time is the number of seconds the deployed changes stay pending. The deploys only restart the LMI, with
+    another start time, when lmi_restart is set, most of the changes don't require it.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, latencies=None, failure_rate=0.0, failures=None,
+                 file_count=10, file_size=1024, deploy_time=0.0, lmi_restart=False, seed=None, certfile=None, keyfile=None,
+                 verbose=False):
+        self.latency = latency
+        self.latencies = latencies or {}
+        self.failure_rate = failure_rate
+        self.failures = failures or {}
+        self.file_size = file_size
+        self.verbose = verbose
+        self.state = MockApplianceState(file_count, file_size, deploy_time, lmi_restart)
+        self._random = random.Random(seed)
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+
+        self.server = ThreadingHTTPServer((host, port), MockApplianceHandler)
+        self.server.daemon_threads = True
+        self.server.appliance = self
+        self.scheme = 'http'
+        if certfile:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile, keyfile)
+            self.server.socket = context.wrap_socket(self.server.socket, server_side=True)
+            self.scheme = 'https'
+        self._thread = None
+
+    @property
+    def host(self):
+        return self.server.server_address[0]
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    @property
+    def url(self):
+        return '{}://{}:{}'.format(self.scheme, self.host, self.port)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, kwargs={'poll_interval': 0.05}, name='mock-appliance')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def latency_for(self, path):
+        matches = [prefix for prefix in self.latencies if path.startswith(prefix)]
+        return self.latencies[max(matches, key=len)] if matches else self.latency
+
+    def failure_for(self, path):
+        """ The status code of the failure injected for the request, None when it succeeds.
+        """
+        matches = [prefix for prefix in self.failures if path.startswith(prefix)]
+        code = self.failures[max(matches, key=len)] if matches else None
+        with self._stats_lock:
+            if code is None and self.failure_rate and self._random.random() < self.failure_rate:
+                code = 500
+            if code:
+                self._failures += 1
+        return code
+
+    def request_started(self, method, path, size):
+        with self._stats_lock:
+            self._requests['{} {}'.format(method, path)] += 1
+            self._bytes_received += size
+            self._in_flight += 1
+            self._max_in_flight = max(self._max_in_flight, self._in_flight)
+
+    def request_finished(self):
+        with self._stats_lock:
+            self._in_flight -= 1
+
+    def bytes_sent(self, size):
+        with self._stats_lock:
+            self._bytes_sent += size
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._requests = Counter()
+            self._failures = 0
+            self._bytes_sent = 0
+            self._bytes_received = 0
+            self._in_flight = 0
+            self._max_in_flight = 0
+
+    def stats(self):
+        """ The requests received since the last reset, counted by method and path (without the query string).
+        """
+        with self._stats_lock:
+            return {
+                'total': sum(self._requests.values()),
+                'requests': dict(self._requests),
+                'failures': self._failures,
+                'bytes_sent': self._bytes_sent,
+                'bytes_received': self._bytes_received,
+                'max_concurrent_requests': self._max_in_flight
+            }
+
+
+class MockApplianceConnection(object):
+    """ Stand-in for the httpapi connection plugin of ansible.netcommon, it sends the requests of the isva httpapi
+    plugin to a mocked appliance the same way the persistent connection does, without ansible-connection.
+    """
+
+    def __init__(self, appliance, **options):
+        self._url = appliance.url
+        self._auth = None
+        self._network_os = 'community.isva.isva'
+        self._options = dict(host=appliance.host, port=appliance.port, remote_user='admin', password='admin',
+                             persistent_command_timeout=30, validate_certs=False, use_proxy=False, http_agent=None,
+                             client_cert=None, client_key=None, ca_path=None)
+        self._options.update(options)
+        self.httpapi = None
+        self.messages = []
+
+    def get_option(self, name):
+        return self._options.get(name)
+
+    def _log_messages(self, message):
+        self.messages.append(message)
+
+    def queue_message(self, level, message):
+        self.messages.append(message)
+
+    def send(self, path, data, **kwargs):
+        url_kwargs = dict(headers={}, timeout=self.get_option('persistent_command_timeout'),
+                          validate_certs=self.get_option('validate_certs'), use_proxy=self.get_option('use_proxy'))
+        url_kwargs.update(kwargs)
+        if self._auth:
+            url_kwargs['headers'] = dict(url_kwargs['headers'], **self._auth)
+        else:
+            url_kwargs.update(force_basic_auth=True, url_username=self.get_option('remote_user'),
+                              url_password=self.get_option('password'))
+
+        try:
+            response = open_url(self._url + path, data=data, **url_kwargs)
+        except HTTPError as e:
+            handled = self.httpapi.handle_httperror(e)
+            if handled is True:
+                return self.send(path, data, **kwargs)
+            if handled is False:
+                raise
+            response = handled
+
+        response_buffer = BytesIO(response.read())
+        self._auth = self.httpapi.update_auth(response, response_buffer) or self._auth
+        response_buffer.seek(0)
+        return response, response_buffer
+
+
+def connect(appliance, **options):
+    """ Return the isva httpapi plugin connected to the mocked appliance, options holds the options of the plugin,
+    e.g. cache_ttl or max_concurrent_requests.
+    """
+    from ansible_collections.community.isva.plugins.httpapi.isva import HttpApi
+
+    class MockApplianceHttpApi(HttpApi):
+        def get_option(self, name):  # The module side Connection proxies the options of the connection as well.
+            return plugin_options[name] if name in plugin_options else self.connection.get_option(name)
+
+    plugin_options = dict(session_auth=False, cache_ttl=0, cache_max_entries=128, max_concurrent_requests=4)
+    plugin_options.update(options)
+    connection = MockApplianceConnection(appliance)
+    connection.httpapi = MockApplianceHttpApi(connection)
+    return connection.httpapi
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a mocked ISVA appliance.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds every response is delayed by')
+    parser.add_argument('--path-latency', action='append', default=[], metavar='PREFIX=SECONDS',
+                        help='the latency of the paths starting with PREFIX')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='probability of a request to fail')
+    parser.add_argument('--fail', action='append', default=[], metavar='PREFIX=CODE',
+                        help='fail every request to the paths starting with PREFIX with CODE')
+    parser.add_argument('--files', type=int, default=10, help='number of files of the shared volume and downloads')
+    parser.add_argument('--file-size', type=int, default=1024, help='size of the files in bytes')
+    parser.add_argument('--deploy-time', type=float, default=0.0, help='seconds the deployed changes stay pending')
+    parser.add_argument('--lmi-restart', action='store_true', help='restart the LMI on every deploy')
+    parser.add_argument('--seed', type=int, help='seed of the failure injection')
+    parser.add_argument('--certfile', help='serve HTTPS with this certificate')
+    parser.add_argument('--keyfile')
+    parser.add_argument('--verbose', action='store_true', help='log the requests')
+    args = parser.parse_args()
+
+    def _mapping(values, convert):
+        return dict((prefix, convert(value)) for prefix, value in (item.rsplit('=', 1) for item in values))
+
+    appliance = MockAppliance(
+        host=args.host, port=args.port, latency=args.latency, latencies=_mapping(args.path_latency, float),
+        failure_rate=args.failure_rate, failures=_mapping(args.fail, int), file_count=args.files,
+        file_size=args.file_size, deploy_time=args.deploy_time, lmi_restart=args.lmi_restart, seed=args.seed, certfile=args.certfile,
+        keyfile=args.keyfile, verbose=args.verbose
+    )
+    print('Mocked ISVA appliance listening on {}'.format(appliance.url), flush=True)
+    try:
+        appliance.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        appliance.server.server_close()
+
+
+if __name__ == '__main__':
+    main()
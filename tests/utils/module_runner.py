@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2022, Cédric Servais <cedric.servais@outlook.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+""" Run the exec_module function of the modules of the collection in the current process, over a connection to
+the isva httpapi plugin which records the calls sent by the module_utils, e.g. the plugin connected to a mocked
+appliance by tests/utils/mock_appliance.py.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+
+__metaclass__ = type
+
+import importlib
+import pkgutil
+import tempfile
+from contextlib import contextmanager
+
+from unittest.mock import patch
+
+from ansible.module_utils.common.arg_spec import ArgumentSpecValidator
+
+from ansible_collections.community.isva.plugins import module_utils
+from ansible_collections.community.isva.plugins.action.isva_batch import BatchModule
+
+MODULES_PACKAGE = 'ansible_collections.community.isva.plugins.modules'
+
+# The methods of the plugin sending requests to the appliance, with the number of requests sent by a call.
+RECORDED_METHODS = {
+    'send_request': lambda kwargs: [kwargs.get('path')],
+    'send_requests': lambda kwargs: [request.get('path') for request in kwargs.get('batch', [])],
+    'upload_file': lambda kwargs: [kwargs.get('path')],
+    'download_file': lambda kwargs: [kwargs.get('path')],
+    'download_files': lambda kwargs: [download.get('path') for download in kwargs.get('batch', [])],
+}
+
+_RECORDED_ARGUMENTS = {
+    'send_request': ('path', 'method', 'payload', 'headers'),
+    'send_requests': ('batch',),
+    'upload_file': ('path', 'src', 'filename', 'fields', 'headers'),
+    'download_file': ('path', 'dest', 'headers', 'resume'),
+    'download_files': ('batch', 'parallelism'),
+}
+
+
+class RecordingConnection(object):
+    """ Stand-in for the Connection used by the module_utils, the calls are forwarded to the plugin and recorded
+    with the paths they requested.
+    """
+
+    def __init__(self, plugin):
+        self._plugin = plugin
+        self.calls = []
+
+    def __getattr__(self, name):
+        attribute = getattr(self._plugin, name)
+        if name not in RECORDED_METHODS:
+            return attribute
+
+        def record(*args, **kwargs):
+            kwargs.update(zip(_RECORDED_ARGUMENTS[name], args))
+            self.calls.append({'method': name, 'paths': RECORDED_METHODS[name](kwargs)})
+            return attribute(**kwargs)
+
+        return record
+
+    @property
+    def request_count(self):
+        """ The number of requests sent, a batch counts for as many requests as it holds.
+        """
+        return sum(len(call['paths']) for call in self.calls)
+
+    def reset(self):
+        self.calls = []
+
+
+@contextmanager
+def connected(connection):
+    """ Route the Connection of every module_utils, and of the modules importing it, to connection.
+    """
+    names = ['{}.{}'.format(module_utils.__name__, info.name) for info in pkgutil.iter_modules(module_utils.__path__)]
+    names.append('{}.isva_pending_changes'.format(MODULES_PACKAGE))
+
+    patchers = []
+    for name in names:
+        if hasattr(importlib.import_module(name), 'Connection'):
+            patchers.append(patch('{}.Connection'.format(name), side_effect=lambda socket_path: connection))
+    for patcher in patchers:
+        patcher.start()
+    try:
+        yield connection
+    finally:
+        for patcher in reversed(patchers):
+            patcher.stop()
+
+
+def run_module(name, args, connection, check_mode=False, diff=False, tmpdir=None):
+    """ Validate args against the argument spec of the module then run its exec_module function over connection.
+
+    Returns:
+        dict: The result of exec_module.
+    """
+    module = importlib.import_module('{}.{}'.format(MODULES_PACKAGE, name))
+    spec = module.ArgumentSpec()
+    validation = ArgumentSpecValidator(
+        spec.argument_spec,
+        mutually_exclusive=getattr(spec, 'mutually_exclusive', None),
+        required_one_of=getattr(spec, 'required_one_of', None),
+        required_if=getattr(spec, 'required_if', None),
+        required_together=getattr(spec, 'required_together', None)
+    ).validate(args)
+    if validation.error_messages:
+        raise ValueError(', '.join(validation.error_messages))
+
+    with connected(connection):
+        return module.exec_module(BatchModule(validation.validated_parameters, check_mode, diff, 'mock_socket', 0,
+                                              tmpdir or tempfile.gettempdir()))